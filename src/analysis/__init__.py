@@ -0,0 +1 @@
+# Cálculos de consumo sobre as séries de throughput
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Motor de integração de consumo de dados (GB) a partir do throughput
+
+O consumo de cada intervalo entre dois registros consecutivos é a velocidade
+do registro atual multiplicada pela duração do intervalo, sempre entre
+registros do mesmo dispositivo. Intervalos maiores que o gap máximo separam
+segmentos: não contam consumo e são contados como gaps.
+"""
+
+import numpy as np
+import pandas as pd
+import sys
+import os
+from datetime import date
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'config'))
+from influx_config import get_device_display_name
+
+# bits por segundo * segundos -> GB (8 bits por byte, 1024^3 bytes por GB)
+BITS_PER_GB = 8 * (1024 ** 3)
+
+NS_PER_DAY = 86_400 * 10 ** 9
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+DAILY_COLUMNS = ['date', 'device', 'device_name', 'download_gb', 'upload_gb',
+                 'total_gb', 'gaps', 'valid_intervals', 'records']
+
+def _epoch_ns(timestamps):
+    """Converte uma série de timestamps em inteiros (nanossegundos desde epoch)"""
+    return pd.DatetimeIndex(timestamps).as_unit('ns').asi8
+
+def _device_codes(devices):
+    """Código inteiro de cada linha (categorias do device ou factorize)"""
+    if isinstance(devices.dtype, pd.CategoricalDtype):
+        return devices.cat.codes.to_numpy()
+    return pd.factorize(devices)[0]
+
+def _device_time_order(time_ns, codes):
+    """Índices que ordenam as linhas por (dispositivo, horário), de forma estável"""
+    code_diff = np.diff(codes)
+    # Já ordenado (ex: um único dispositivo em ordem de horário): evita o lexsort
+    if ((code_diff > 0) | ((code_diff == 0) & (np.diff(time_ns) >= 0))).all():
+        return np.arange(len(codes))
+    return np.lexsort((time_ns, codes))
+
+def _gap_flags(time_ns, max_gap_minutes):
+    """True nos intervalos (entre linhas consecutivas) maiores que o gap máximo"""
+    return (np.diff(time_ns) / 1e9 / 60) > max_gap_minutes
+
+def segment_gaps(df, max_gap_minutes=5):
+    """
+    Numera os trechos contínuos de cada dispositivo
+
+    Um segmento começa no primeiro registro de cada dispositivo e a cada
+    intervalo maior que o gap máximo entre registros do mesmo dispositivo.
+    As diferenças de tempo são calculadas uma vez, na ordem (dispositivo,
+    horário), sem misturar registros de antenas diferentes.
+
+    Args:
+        df: DataFrame com timestamp e device (em qualquer ordem)
+        max_gap_minutes: Gap máximo em minutos
+
+    Returns:
+        Array int64 com o segmento de cada linha, na ordem de df
+    """
+    n = len(df)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+
+    time_ns = _epoch_ns(df['timestamp'])
+    codes = _device_codes(df['device'])
+    order = _device_time_order(time_ns, codes)
+    codes = codes[order]
+
+    starts = np.ones(n, dtype=bool)
+    starts[1:] = (codes[1:] != codes[:-1]) | _gap_flags(time_ns[order], max_gap_minutes)
+
+    segments = np.empty(n, dtype=np.int64)
+    segments[order] = np.cumsum(starts) - 1
+    return segments
+
+def add_segments(df, max_gap_minutes=5):
+    """Grava em df (sem copiar) a coluna segment calculada por segment_gaps"""
+    if not df.empty:
+        df['segment'] = segment_gaps(df, max_gap_minutes)
+    return df
+
+def append_segments(last_rows, tail, max_gap_minutes=5, next_segment=0):
+    """
+    Segmentos de linhas novas anexadas a dados já segmentados
+
+    Args:
+        last_rows: Último registro de cada dispositivo nos dados atuais (com segment)
+        tail: Registros novos, todos posteriores ao último do mesmo dispositivo
+        max_gap_minutes: Gap máximo em minutos
+        next_segment: Primeiro número livre para segmentos novos
+
+    Returns:
+        Array int64 com o segmento de cada linha de tail: quem continua o
+        trecho do último registro herda o segmento dele
+    """
+    frame = pd.concat([last_rows[['timestamp', 'device']], tail[['timestamp', 'device']]], ignore_index=True)
+    segments = segment_gaps(frame, max_gap_minutes)
+
+    previous = segments[:len(last_rows)]
+    mapping = np.arange(segments.max() + 1, dtype=np.int64) + next_segment
+    mapping[previous] = last_rows['segment'].to_numpy(dtype=np.int64)
+    return mapping[segments[len(last_rows):]]
+
+def compute_intervals(df, max_gap_minutes=5, group_codes=None):
+    """
+    Calcula o consumo de cada intervalo entre registros consecutivos do mesmo dispositivo
+
+    As linhas são percorridas na ordem (dispositivo, horário), qualquer que
+    seja a ordem de df. Se df tiver a coluna segment (segment_gaps), os gaps
+    vêm dela e o gap máximo não é usado.
+
+    Args:
+        df: DataFrame com timestamp, device, downlink_bps e uplink_bps
+        max_gap_minutes: Gap máximo em minutos
+        group_codes: Array opcional com o grupo de cada linha de df; intervalos
+            entre linhas de grupos diferentes são ignorados
+
+    Returns:
+        Dict de arrays com um elemento por intervalo (len(df) - 1), na ordem
+        (dispositivo, horário): download_gb, upload_gb, gap, valid e in_group;
+        order traz os índices das linhas de df nessa ordem
+    """
+    time_ns = _epoch_ns(df['timestamp'])
+    codes = _device_codes(df['device'])
+    order = _device_time_order(time_ns, codes)
+    time_ns = time_ns[order]
+    codes = codes[order]
+    time_diff_seconds = np.diff(time_ns) / 1e9
+
+    in_group = codes[1:] == codes[:-1]
+    if group_codes is not None:
+        group_codes = np.asarray(group_codes)[order]
+        in_group &= group_codes[1:] == group_codes[:-1]
+
+    if 'segment' in df:
+        segments = df['segment'].to_numpy()[order]
+        same_segment = segments[1:] == segments[:-1]
+    else:
+        same_segment = ~_gap_flags(time_ns, max_gap_minutes)
+
+    gap = in_group & ~same_segment
+    valid = in_group & same_segment
+
+    # Usa a velocidade do registro atual para o intervalo até o próximo
+    seconds = np.where(valid, time_diff_seconds, 0.0)
+    downlink = df['downlink_bps'].to_numpy(dtype=np.float64)[order[:-1]]
+    uplink = df['uplink_bps'].to_numpy(dtype=np.float64)[order[:-1]]
+
+    return {
+        'download_gb': downlink * seconds / BITS_PER_GB,
+        'upload_gb': uplink * seconds / BITS_PER_GB,
+        'gap': gap,
+        'valid': valid,
+        'in_group': in_group,
+        'order': order
+    }
+
+def usage_delta(df, max_gap_minutes=5):
+    """
+    Soma o consumo dos intervalos entre as linhas de df
+
+    Usado para atualizar totais de forma incremental: os intervalos de linhas
+    anexadas são somados e os de linhas que saíram da janela são subtraídos.
+
+    Returns:
+        Tupla (download_gb, upload_gb, gaps)
+    """
+    if len(df) < 2:
+        return 0.0, 0.0, 0
+
+    intervals = compute_intervals(df, max_gap_minutes)
+    return (
+        float(intervals['download_gb'].sum()),
+        float(intervals['upload_gb'].sum()),
+        int(intervals['gap'].sum())
+    )
+
+def integrate_usage(df, max_gap_minutes=5):
+    """
+    Calcula o consumo total do DataFrame, por dispositivo
+
+    Args:
+        df: DataFrame com timestamp, device, downlink_bps e uplink_bps
+            (e segment, se já segmentado)
+        max_gap_minutes: Gap máximo em minutos
+
+    Returns:
+        Tupla (download_gb, upload_gb, gaps, registros)
+    """
+    if df.empty:
+        return 0, 0, 0, 0
+
+    intervals = compute_intervals(df, max_gap_minutes)
+
+    return (
+        float(intervals['download_gb'].sum()),
+        float(intervals['upload_gb'].sum()),
+        int(intervals['gap'].sum()),
+        len(df)
+    )
+
+def integrate_daily_usage(df, max_gap_minutes=5):
+    """
+    Calcula o consumo diário por dispositivo em uma única passada
+
+    Args:
+        df: DataFrame com timestamp, device, downlink_bps e uplink_bps
+            (e segment, se já segmentado)
+        max_gap_minutes: Gap máximo em minutos
+
+    Returns:
+        DataFrame com date, device, device_name, download_gb, upload_gb,
+        total_gb, gaps, valid_intervals e records por dispositivo e dia
+    """
+    if df.empty:
+        return pd.DataFrame(columns=DAILY_COLUMNS)
+
+    # Dia UTC de cada linha; intervalos que atravessam a meia-noite são ignorados
+    days = _epoch_ns(df['timestamp']) // NS_PER_DAY
+    intervals = compute_intervals(df, max_gap_minutes, group_codes=days)
+
+    # Na ordem (dispositivo, horário) cada (dispositivo, dia) é contíguo
+    order = intervals['order']
+    days = days[order]
+    codes = _device_codes(df['device'])[order]
+    group_starts = np.ones(len(order), dtype=bool)
+    group_starts[1:] = (codes[1:] != codes[:-1]) | (days[1:] != days[:-1])
+    group_codes = np.cumsum(group_starts) - 1
+
+    # Soma cada intervalo no grupo da linha em que ele começa
+    n_groups = group_codes[-1] + 1
+    interval_groups = group_codes[:-1]
+    download = np.bincount(interval_groups, weights=intervals['download_gb'], minlength=n_groups)
+    upload = np.bincount(interval_groups, weights=intervals['upload_gb'], minlength=n_groups)
+    gaps = np.bincount(interval_groups, weights=intervals['gap'], minlength=n_groups)
+    valid_intervals = np.bincount(interval_groups, weights=intervals['valid'], minlength=n_groups)
+    records = np.bincount(group_codes, minlength=n_groups)
+
+    first_rows = order[group_starts]
+    daily = pd.DataFrame({
+        'date': [date.fromordinal(EPOCH_ORDINAL + int(day)) for day in days[group_starts]],
+        'device': df['device'].iloc[first_rows].to_numpy(dtype=object),
+        'download_gb': download,
+        'upload_gb': upload,
+        'gaps': gaps.astype(int),
+        'valid_intervals': valid_intervals.astype(int),
+        'records': records
+    })
+
+    # Dias com menos de 2 registros não têm intervalos para integrar
+    daily = daily[daily['records'] >= 2].copy()
+    if daily.empty:
+        return pd.DataFrame(columns=DAILY_COLUMNS)
+
+    names = {device: get_device_display_name(device) for device in daily['device'].unique()}
+    daily['device_name'] = daily['device'].map(names)
+    daily['total_gb'] = (daily['download_gb'] + daily['upload_gb']).round(3)
+    daily['download_gb'] = daily['download_gb'].round(3)
+    daily['upload_gb'] = daily['upload_gb'].round(3)
+
+    return daily[DAILY_COLUMNS].sort_values(['date', 'device']).reset_index(drop=True)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Redução de pontos das séries de throughput para gráficos
+
+Só afeta o que é desenhado: o consumo em GB continua sendo integrado sobre
+os dados na resolução original.
+"""
+
+import numpy as np
+import pandas as pd
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'config'))
+from influx_config import CHART_CONFIG
+from consumption import _epoch_ns
+
+def aggregate_windows(df, every_seconds, fn="mean"):
+    """
+    Agrega o throughput em janelas fixas por dispositivo (equivalente local
+    do aggregateWindow do InfluxDB)
+
+    Args:
+        df: DataFrame com timestamp, device, downlink_bps e uplink_bps
+        every_seconds: Tamanho da janela em segundos
+        fn: Agregação por janela ("mean" ou "max")
+
+    Returns:
+        DataFrame com timestamp (início da janela), device (e segment, se df
+        tiver) e throughput em bps e Mbps
+    """
+    if df.empty:
+        return df
+
+    windows = df['timestamp'].dt.floor(f"{int(every_seconds)}s")
+    # Com segmentos, janelas de trechos diferentes não se misturam e o gráfico mantém os gaps
+    keys = ['device', 'segment', windows] if 'segment' in df else ['device', windows]
+    chart = (df.groupby(keys, sort=False, observed=True)[['downlink_bps', 'uplink_bps']]
+               .agg(fn)
+               .reset_index()
+               .sort_values('timestamp', kind='mergesort')
+               .reset_index(drop=True))
+    chart['downlink_mbps'] = chart['downlink_bps'] / 1_000_000
+    chart['uplink_mbps'] = chart['uplink_bps'] / 1_000_000
+    return chart
+
+def lttb_indices(x, y, n_out):
+    """
+    Seleciona pontos pelo Largest-Triangle-Three-Buckets
+
+    O primeiro e o último ponto são mantidos; dos demais, cada bucket contribui
+    com o ponto que forma o maior triângulo com o ponto escolhido no bucket
+    anterior e a média do bucket seguinte, o que preserva picos e vales.
+
+    Args:
+        x: Array numérico crescente (ex: timestamps em ns)
+        y: Array de valores
+        n_out: Quantidade de pontos desejada
+
+    Returns:
+        Array de índices selecionados, em ordem crescente
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Limites dos n_out - 2 buckets internos (sem o primeiro e o último ponto)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+
+    # Médias de cada bucket de uma vez (reduceat), usadas como terceiro vértice
+    bucket_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / np.diff(edges)
+    bucket_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / np.diff(edges)
+    next_x = np.append(bucket_x[1:], x[-1])
+    next_y = np.append(bucket_y[1:], y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        bx = x[start:stop]
+        by = y[start:stop]
+        # Dobro da área do triângulo (a, b, média do próximo bucket)
+        area = np.abs((x[a] - next_x[i]) * (by - y[a]) - (x[a] - bx) * (next_y[i] - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
+
+def break_segments(x, y, segments):
+    """
+    Interrompe a linha do gráfico entre segmentos (gaps de dados)
+
+    Um ponto com valor NaN é inserido antes do primeiro ponto de cada segmento
+    novo; o Plotly não liga pontos separados por NaN.
+
+    Returns:
+        Tupla (x, y) em arrays
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    segments = np.asarray(segments)
+
+    breaks = np.flatnonzero(segments[1:] != segments[:-1]) + 1
+    if len(breaks) == 0:
+        return x, y
+    return np.insert(x, breaks, x[breaks]), np.insert(y, breaks, np.nan)
+
+def lttb(x, y, n_out=None, segments=None):
+    """
+    Reduz uma série para n_out pontos (LTTB) para desenhar
+
+    Args:
+        x: Série ou array de timestamps (ou números)
+        y: Série ou array de valores
+        n_out: Quantidade de pontos (padrão: CHART_CONFIG["max_points"])
+        segments: Segmento de cada ponto (coluna segment), opcional; a linha
+            é interrompida entre segmentos
+
+    Returns:
+        Tupla (x, y) reduzida, do mesmo tipo da entrada (arrays, com segments)
+    """
+    n_out = n_out or CHART_CONFIG["max_points"]
+    if len(x) <= n_out:
+        indices = None
+    else:
+        if pd.api.types.is_datetime64_any_dtype(x):
+            x_numeric = _epoch_ns(x)
+        else:
+            x_numeric = np.asarray(x)
+        indices = lttb_indices(x_numeric, np.asarray(y, dtype=np.float64), n_out)
+
+    if segments is not None:
+        if indices is None:
+            return break_segments(x, y, segments)
+        return break_segments(np.asarray(x)[indices], np.asarray(y)[indices], np.asarray(segments)[indices])
+
+    if indices is None:
+        return x, y
+    if hasattr(x, 'iloc'):
+        return x.iloc[indices], y.iloc[indices]
+    return np.asarray(x)[indices], np.asarray(y)[indices]
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Registro dos dispositivos detectados, compartilhado pelas sessões do Streamlit
+
+As leituras não usam lock: o registro guarda snapshots imutáveis que são
+substituídos inteiros a cada atualização (copy-on-write). Uma sessão que
+detecta dispositivos não altera o dict que outra sessão está lendo.
+"""
+
+import json
+import os
+import threading
+from types import MappingProxyType
+
+def load_name_overrides(path):
+    """
+    Lê os nomes definidos pelo operador (JSON {"id do dispositivo": "nome"})
+
+    Returns:
+        Dict id -> nome; vazio se o arquivo não existir ou for inválido
+    """
+    if not path or not os.path.exists(path):
+        return {}
+
+    try:
+        with open(path, encoding="utf-8") as f:
+            overrides = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Nomes de dispositivos ignorados ({path}): {e}")
+        return {}
+
+    if not isinstance(overrides, dict):
+        print(f"⚠️ Nomes de dispositivos ignorados ({path}): esperado um objeto JSON")
+        return {}
+    return {str(device_id): str(name) for device_id, name in overrides.items()}
+
+def default_display_name(device_id):
+    """Nome gerado a partir do ID (ex: "bit1015star" -> "Bit Star 1015")"""
+    return f"Bit Star {device_id.replace('bit', '').replace('star', '')}"
+
+class DeviceRegistry:
+    """
+    Dispositivos detectados e nomes de exibição
+
+    devices e display_name só leem o snapshot atual; update e a primeira
+    consulta de um nome novo montam um dict novo sob o lock e o publicam com
+    uma única atribuição.
+    """
+
+    def __init__(self, overrides=None):
+        self._lock = threading.Lock()
+        self._overrides = MappingProxyType(dict(overrides or {}))
+        self._devices = MappingProxyType({})
+        self._names = MappingProxyType(dict(self._overrides))
+
+    @property
+    def overrides(self):
+        """Nomes definidos pelo operador (carregados na inicialização)"""
+        return self._overrides
+
+    def snapshot(self):
+        """Mapeamento somente leitura id -> informações dos dispositivos detectados"""
+        return self._devices
+
+    def devices(self):
+        """IDs dos dispositivos detectados na última atualização"""
+        return tuple(self._devices)
+
+    def display_name(self, device_id):
+        """Nome de exibição (do operador ou gerado pelo ID), calculado uma vez por dispositivo"""
+        name = self._names.get(device_id)
+        if name is not None:
+            return name
+
+        name = default_display_name(device_id)
+        with self._lock:
+            if device_id not in self._names:
+                names = dict(self._names)
+                names[device_id] = name
+                self._names = MappingProxyType(names)
+        return name
+
+    def update(self, devices_found):
+        """
+        Substitui a lista de dispositivos pelos encontrados no InfluxDB
+
+        Args:
+            devices_found: Lista de IDs de dispositivos encontrados
+        """
+        devices = {}
+        for device_id in devices_found:
+            devices[device_id] = MappingProxyType({
+                "name": self.display_name(device_id),
+                "measurement": "starlink_data",
+                "tags": MappingProxyType({"device": device_id})
+            })
+
+        with self._lock:
+            self._devices = MappingProxyType(devices)
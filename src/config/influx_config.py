@@ -4,7 +4,8 @@ Configuração para conexão com InfluxDB
 """
 
 import os
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from device_registry import DeviceRegistry, load_name_overrides
 
 # Configurações do InfluxDB
 INFLUX_CONFIG = {
@@ -12,21 +13,91 @@ INFLUX_CONFIG = {
     "org": "Bit Electronics",
     "bucket": "starlink_data",
     "token": os.environ.get("INFLUXDB_TOKEN", "_wGCTqWEmLq825Sp7L7ze709IAMpYY6CO2An_im5xMr7oQcPQmgIY4eykVQHh_Rh5N2dzhluHPrANL1_4seL1Q=="),  # Token deve estar nas variáveis de ambiente
+    # Pool HTTP compartilhado por todas as sessões do processo
+    "connection_pool_maxsize": int(os.environ.get("INFLUXDB_POOL_SIZE", "8")),
+    "timeout_ms": int(os.environ.get("INFLUXDB_TIMEOUT_MS", "60000")),
+    "enable_gzip": os.environ.get("INFLUXDB_GZIP", "true").lower() not in ("0", "false", "no"),
+    "tcp_keepalive": True,
+    # Linhas convertidas por lote na leitura em streaming dos resultados
+    "stream_batch_rows": int(os.environ.get("STARLINK_STREAM_BATCH_ROWS", "50000")),
+    # Extrai o throughput do status_json no servidor (pacote json do Flux)
+    "server_side_json": os.environ.get("STARLINK_SERVER_SIDE_JSON", "true").lower() not in ("0", "false", "no"),
+    # Após um erro do Flux na extração, usa o parser Python por este tempo (s) e tenta de novo
+    "server_side_json_retry_seconds": int(os.environ.get("STARLINK_SERVER_SIDE_JSON_RETRY", "600")),
+    # Decodificador do status_json quando a extração é feita no Python
+    "json_decoder": os.environ.get("STARLINK_JSON_DECODER", "auto"),
 }
 
-# Configurações dos dispositivos Bit Star (será preenchido dinamicamente)
-BIT_STAR_DEVICES = {}
+# Cache de dados entre reruns do Streamlit
+CACHE_CONFIG = {
+    "ttl_seconds": int(os.environ.get("STARLINK_CACHE_TTL", "600")),  # Validade dos dados de períodos fechados
+    "max_memory_mb": int(os.environ.get("STARLINK_CACHE_MAX_MB", "512")),  # Limite de memória (LRU)
+    "connection_ttl_seconds": 60,  # Validade do teste de conexão
+    "devices_ttl_seconds": 300,  # Validade da lista de dispositivos
+}
+
+# Gráficos de throughput: resolução pedida ao InfluxDB (aggregateWindow)
+CHART_CONFIG = {
+    "pixel_width": int(os.environ.get("STARLINK_CHART_WIDTH", "1200")),  # Largura de referência do gráfico
+    "aggregate": os.environ.get("STARLINK_CHART_AGGREGATE", "mean"),  # "mean" ou "max" por janela
+    "max_points": int(os.environ.get("STARLINK_CHART_POINTS", "2000")),  # Pontos por série após o LTTB
+}
+
+# Janelas aceitas em segundos, para que o eixo do tempo fique em valores redondos
+CHART_BUCKETS_SECONDS = [1, 5, 10, 15, 30, 60, 120, 300, 600, 900, 1800,
+                         3600, 7200, 10800, 21600, 43200, 86400]
+
+# Relatórios PDF: renderização dos gráficos e fila de geração em segundo plano
+REPORT_CONFIG = {
+    "chart_backend": os.environ.get("STARLINK_REPORT_CHARTS", "auto"),  # auto (mais rápido instalado), matplotlib ou kaleido
+    "render_tabs": int(os.environ.get("STARLINK_REPORT_RENDER_TABS", "5")),  # Gráficos renderizados em paralelo (5 por relatório)
+    "render_timeout_seconds": 90,  # Limite por gráfico (e para abrir o navegador do kaleido)
+    "throughput_chart_width": 800,  # Largura (px) do gráfico de throughput do relatório
+    "job_workers": int(os.environ.get("STARLINK_REPORT_WORKERS", "2")),  # Relatórios gerados ao mesmo tempo
+    "job_max_reports": int(os.environ.get("STARLINK_REPORT_CACHE", "16")),  # PDFs prontos guardados por hash das entradas
+}
+
+# Divisão das consultas em blocos dispositivo x fatia de tempo executados em paralelo
+FANOUT_CONFIG = {
+    "max_workers": int(os.environ.get("STARLINK_FANOUT_WORKERS", "4")),  # Não passar de INFLUXDB_POOL_SIZE
+    "slice_hours": float(os.environ.get("STARLINK_FANOUT_SLICE_HOURS", "24")),
+    "retries": int(os.environ.get("STARLINK_FANOUT_RETRIES", "2")),  # Novas tentativas por bloco
+    "retry_backoff_seconds": 1.0,  # Espera antes da 1ª nova tentativa (dobra a cada uma)
+}
+
+# Cache em disco (Parquet) dos dias já encerrados
+PARQUET_CONFIG = {
+    "enabled": os.environ.get("STARLINK_PARQUET_CACHE", "true").lower() not in ("0", "false", "no"),
+    "base_dir": os.environ.get("STARLINK_PARQUET_DIR", os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'parquet')),
+    "max_size_mb": int(os.environ.get("STARLINK_PARQUET_MAX_MB", "2048")),  # Limite em disco (remove os menos usados)
+    # Dia só é definitivo se buscado este tempo (h) após o fim: cobre envios atrasados e backfill
+    "settle_hours": float(os.environ.get("STARLINK_PARQUET_SETTLE_HOURS", "24")),
+    # Validade (min) de um dia buscado antes de definitivo; depois é buscado de novo
+    "provisional_ttl_minutes": float(os.environ.get("STARLINK_PARQUET_PROVISIONAL_TTL", "60")),
+}
+
+# Consumo diário materializado dos dias encerrados
+ROLLUP_CONFIG = {
+    "enabled": os.environ.get("STARLINK_ROLLUPS", "true").lower() not in ("0", "false", "no"),
+    "db_path": os.environ.get("STARLINK_ROLLUP_DB", os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'rollups.sqlite')),
+}
+
+# Tempo após a meia-noite (UTC) para considerar o dia anterior encerrado
+CLOSED_DAY_GRACE_MINUTES = 15
+
+# Nomes de exibição definidos pelo operador (JSON {"id do dispositivo": "nome"}),
+# lidos uma vez na inicialização
+DEVICE_NAMES_FILE = os.environ.get("STARLINK_DEVICE_NAMES", os.path.join(os.path.dirname(__file__), 'device_names.json'))
+
+# Dispositivos Bit Star detectados (preenchido dinamicamente, compartilhado pelas sessões)
+DEVICE_REGISTRY = DeviceRegistry(load_name_overrides(DEVICE_NAMES_FILE))
 
 def get_device_display_name(device_id):
     """
     Retorna nome de exibição para um dispositivo.
-    Se não estiver na lista, usa o ID como nome.
+    Usa o nome definido pelo operador ou gera um a partir do ID.
     """
-    if device_id in BIT_STAR_DEVICES:
-        return BIT_STAR_DEVICES[device_id]["name"]
-    else:
-        # Gera nome baseado no ID do dispositivo
-        return f"Bit Star {device_id.replace('bit', '').replace('star', '')}"
+    return DEVICE_REGISTRY.display_name(device_id)
 
 def update_device_list(devices_found):
     """
@@ -35,18 +106,7 @@ def update_device_list(devices_found):
     Args:
         devices_found: Lista de IDs de dispositivos encontrados
     """
-    global BIT_STAR_DEVICES
-    
-    # Limpa lista atual
-    BIT_STAR_DEVICES = {}
-    
-    # Adiciona dispositivos encontrados
-    for device_id in devices_found:
-        BIT_STAR_DEVICES[device_id] = {
-            "name": get_device_display_name(device_id),
-            "measurement": "starlink_data",
-            "tags": {"device": device_id}
-        }
+    DEVICE_REGISTRY.update(devices_found)
 
 # Períodos pré-definidos
 TIME_PERIODS = {
@@ -61,27 +121,91 @@ TIME_PERIODS = {
     "Personalizado": {"start": "custom", "label": "Período personalizado"}
 }
 
-def get_flux_query(devices, time_range, measurement="starlink_data"):
+# Unidades aceitas em períodos relativos (ex: "-24h", "-7d")
+RELATIVE_UNITS = {"s": "seconds", "m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+
+def _parse_timestamp(value):
+    """Converte um timestamp RFC3339 (com ou sem 'Z') em datetime UTC"""
+    parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+def parse_time_range(time_range, now=None):
     """
-    Gera query Flux para buscar dados do InfluxDB
+    Resolve o período da interface em datas absolutas
     
     Args:
-        devices: Lista de dispositivos para buscar
-        time_range: Período de tempo (ex: "-24h", "-7d")
-        measurement: Nome da medição no InfluxDB
+        time_range: Período relativo (ex: "-24h") ou personalizado ("<início>Z:<fim>Z")
+        now: Instante de referência para períodos relativos (padrão: agora, UTC)
     
     Returns:
-        String com query Flux
+        Tupla (start, stop, relativo) com datetimes UTC; stop é None quando o
+        período não tem fim (relativo ou só com início)
     """
+    now = now or datetime.now(timezone.utc)
     
-    # Converte lista de dispositivos em filtro mais flexível
-    device_conditions = []
-    for device in devices:
-        device_conditions.append(f'r.device == "{device}"')
-        device_conditions.append(f'r.device_name == "{device}"')
+    if time_range.startswith('-') and time_range[-1:] in RELATIVE_UNITS:
+        amount = float(time_range[1:-1])
+        delta = timedelta(**{RELATIVE_UNITS[time_range[-1]]: amount})
+        return now - delta, None, True
+    
+    if 'Z:' in time_range:
+        start_time, end_time = time_range.split('Z:', 1)
+        return _parse_timestamp(start_time), _parse_timestamp(end_time), False
+    
+    return _parse_timestamp(time_range), None, False
+
+def format_flux_time(timestamp):
+    """Formata um datetime com fuso para uso em range() do Flux (UTC)"""
+    return timestamp.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+def get_last_closed_day(now=None):
+    """Último dia (UTC) que não recebe mais dados"""
+    now = now or datetime.now(timezone.utc)
+    return (now - timedelta(minutes=CLOSED_DAY_GRACE_MINUTES)).date() - timedelta(days=1)
+
+def normalize_time_range(time_range):
+    """
+    Normaliza o período para uso como chave de cache
+    
+    Períodos relativos são mantidos como texto (dependem do instante da
+    consulta); períodos absolutos viram ISO 8601 em UTC.
+    """
+    try:
+        start, stop, relative = parse_time_range(time_range)
+    except ValueError:
+        return time_range
+    
+    if relative:
+        return time_range
+    return f"{start.isoformat()}/{stop.isoformat() if stop else ''}"
+
+def is_open_time_range(time_range, now=None):
+    """
+    Indica se o fim do período ainda está se movendo (novos dados podem chegar)
+    
+    Returns:
+        True para períodos relativos, sem fim ou com fim no futuro
+    """
+    now = now or datetime.now(timezone.utc)
+    try:
+        start, stop, relative = parse_time_range(time_range, now)
+    except ValueError:
+        return True
+    
+    return relative or stop is None or stop > now
+
+def get_range_clause(time_range):
+    """
+    Converte o período usado pela interface na cláusula de range do Flux
     
-    device_filter = " or ".join(device_conditions)
+    Args:
+        time_range: Período relativo (ex: "-24h") ou personalizado ("<início>Z:<fim>Z")
     
+    Returns:
+        String com os argumentos de range(), ex: 'start: -24h'
+    """
     # Determina se é um período personalizado (contém ':') ou predefinido
     if ':' in time_range and 'Z' in time_range:
         # Período personalizado com datas específicas
@@ -91,66 +215,139 @@ def get_flux_query(devices, time_range, measurement="starlink_data"):
             if len(parts) == 2:
                 start_time = parts[0] + 'Z'  # Adiciona o Z de volta
                 end_time = parts[1]
-                range_clause = f'start: {start_time}, stop: {end_time}'
-            else:
-                range_clause = f'start: {time_range}'
-        else:
-            range_clause = f'start: {time_range}'
-    else:
-        # Período predefinido
-        range_clause = f'start: {time_range}'
+                return f'start: {start_time}, stop: {end_time}'
     
-    # Query para buscar dados do status_json que contém throughput
-    query = f'''from(bucket: "{INFLUX_CONFIG['bucket']}")
+    # Período predefinido (ou data única de início)
+    return f'start: {time_range}'
+
+def get_device_filter(devices):
+    """Gera o predicado Flux que seleciona os dispositivos pela tag device ou device_name"""
+    device_conditions = []
+    for device in devices:
+        device_conditions.append(f'r.device == "{device}"')
+        device_conditions.append(f'r.device_name == "{device}"')
+    
+    return " or ".join(device_conditions)
+
+def _throughput_pipeline(device_filter, range_clause, measurement):
+    """
+    Trecho Flux que extrai downlink/uplink do status_json no servidor
+    
+    O JSON é decodificado no servidor: saem só _time, device e os dois valores
+    numéricos, além de _start/_stop, usados pelo aggregateWindow. Aceita o
+    formato plano e o aninhado em dishGetStatus; registros sem os campos
+    voltam como NaN. Requer import "json".
+    """
+    return f'''from(bucket: "{INFLUX_CONFIG['bucket']}")
 |> range({range_clause})
 |> filter(fn: (r) => r._measurement == "{measurement}" or r._measurement == "starlink_raw")
 |> filter(fn: (r) => {device_filter})
 |> filter(fn: (r) => r._field == "status_json")
-|> keep(columns: ["_time", "_field", "_value", "device", "device_name", "device_ip"])
-|> sort(columns: ["_time"])'''
+|> map(fn: (r) => {{
+    status = json.parse(data: bytes(v: r._value))
+    downlink = if exists status.downlinkThroughputBps then float(v: status.downlinkThroughputBps)
+        else if exists status.dishGetStatus.downlinkThroughputBps then float(v: status.dishGetStatus.downlinkThroughputBps)
+        else float(v: "NaN")
+    uplink = if exists status.uplinkThroughputBps then float(v: status.uplinkThroughputBps)
+        else if exists status.dishGetStatus.uplinkThroughputBps then float(v: status.dishGetStatus.uplinkThroughputBps)
+        else float(v: "NaN")
+    return {{_start: r._start, _stop: r._stop, _time: r._time, device: r.device, device_name: r.device_name,
+        downlink_bps: downlink, uplink_bps: uplink}}
+}})'''
+
+def get_chart_bucket_seconds(time_range, pixel_width=None, now=None):
+    """
+    Calcula a janela de agregação para um gráfico de throughput
     
-    return query
+    Args:
+        time_range: Período de tempo do gráfico
+        pixel_width: Largura do gráfico em pixels (padrão: CHART_CONFIG)
+        now: Instante de referência para períodos relativos
+    
+    Returns:
+        Janela em segundos, a menor de CHART_BUCKETS_SECONDS que deixa no
+        máximo um ponto por pixel
+    """
+    now = now or datetime.now(timezone.utc)
+    start, stop, _ = parse_time_range(time_range, now)
+    window_seconds = ((stop or now) - start).total_seconds()
+    target = window_seconds / (pixel_width or CHART_CONFIG["pixel_width"])
+    
+    for bucket in CHART_BUCKETS_SECONDS:
+        if bucket >= target:
+            return bucket
+    return int(-(-target // 86400) * 86400)
 
-def get_daily_consumption_query(devices, time_range, measurement="starlink_data"):
+def get_chart_query(devices, time_range, every_seconds, fn="mean", measurement="starlink_data"):
     """
-    Gera query Flux para consumo diário
+    Gera query Flux com o throughput agregado por janela (aggregateWindow)
     
     Args:
         devices: Lista de dispositivos
         time_range: Período de tempo
-        measurement: Nome da medição
+        every_seconds: Tamanho da janela em segundos
+        fn: Agregação por janela ("mean" ou "max")
+        measurement: Nome da medição no InfluxDB
     
     Returns:
-        String com query Flux para consumo diário
+        String com query Flux; colunas _time (início da janela), device,
+        downlink_bps e uplink_bps
     """
+    if fn not in ("mean", "max"):
+        raise ValueError(f"Agregação não suportada: {fn}")
     
-    # Converte lista de dispositivos em filtro mais flexível
-    device_conditions = []
-    for device in devices:
-        device_conditions.append(f'r.device == "{device}"')
-        device_conditions.append(f'r.device_name == "{device}"')
+    device_filter = get_device_filter(devices)
+    range_clause = get_range_clause(time_range)
+    every = f"{int(every_seconds)}s"
     
-    device_filter = " or ".join(device_conditions)
+    # Cada coluna é agregada sem os NaN (campo ausente) e as duas séries são
+    # unidas por janela e dispositivo
+    return f'''import "json"
+import "math"
+
+data = {_throughput_pipeline(device_filter, range_clause, measurement)}
+|> map(fn: (r) => ({{r with device: if exists r.device then r.device else r.device_name}}))
+|> group(columns: ["device"])
+
+downlink = data
+|> filter(fn: (r) => not math.isNaN(f: r.downlink_bps))
+|> aggregateWindow(every: {every}, fn: {fn}, column: "downlink_bps", timeSrc: "_start", createEmpty: false)
+
+uplink = data
+|> filter(fn: (r) => not math.isNaN(f: r.uplink_bps))
+|> aggregateWindow(every: {every}, fn: {fn}, column: "uplink_bps", timeSrc: "_start", createEmpty: false)
+
+join(tables: {{downlink: downlink, uplink: uplink}}, on: ["_time", "device"])
+|> keep(columns: ["_time", "device", "downlink_bps", "uplink_bps"])
+|> group()
+|> sort(columns: ["_time"])'''
+
+def get_flux_query(devices, time_range, measurement="starlink_data", extract_throughput=False):
+    """
+    Gera query Flux para buscar dados do InfluxDB
     
-    # Determina se é um período personalizado (contém ':') ou predefinido
-    if ':' in time_range and 'Z' in time_range:
-        # Período personalizado com datas específicas
-        # Procura pelo padrão 'Z:' para separar start e stop corretamente
-        if 'Z:' in time_range:
-            parts = time_range.split('Z:', 1)
-            if len(parts) == 2:
-                start_time = parts[0] + 'Z'  # Adiciona o Z de volta
-                end_time = parts[1]
-                range_clause = f'start: {start_time}, stop: {end_time}'
-            else:
-                range_clause = f'start: {time_range}'
-        else:
-            range_clause = f'start: {time_range}'
-    else:
-        # Período predefinido
-        range_clause = f'start: {time_range}'
-    
-    # Query simplificada para buscar dados do status_json
+    Args:
+        devices: Lista de dispositivos para buscar
+        time_range: Período de tempo (ex: "-24h", "-7d")
+        measurement: Nome da medição no InfluxDB
+        extract_throughput: Se True, extrai downlink/uplink do status_json no
+            próprio InfluxDB (pacote json) e retorna apenas colunas numéricas
+    
+    Returns:
+        String com query Flux
+    """
+    
+    device_filter = get_device_filter(devices)
+    range_clause = get_range_clause(time_range)
+    
+    if extract_throughput:
+        return f'''import "json"
+
+{_throughput_pipeline(device_filter, range_clause, measurement)}
+|> keep(columns: ["_time", "device", "device_name", "downlink_bps", "uplink_bps"])
+|> sort(columns: ["_time"])'''
+    
+    # Query para buscar dados do status_json que contém throughput
     query = f'''from(bucket: "{INFLUX_CONFIG['bucket']}")
 |> range({range_clause})
 |> filter(fn: (r) => r._measurement == "{measurement}" or r._measurement == "starlink_raw")
@@ -160,3 +357,52 @@ def get_daily_consumption_query(devices, time_range, measurement="starlink_data"
 |> sort(columns: ["_time"])'''
     
     return query
+
+def get_device_tag_values_query(range_clause, tag="device", package="schema"):
+    """
+    Gera query que lista os dispositivos pelos metadados das séries (tagValues)
+    
+    Lê só o índice de séries do InfluxDB, sem percorrer os pontos do período.
+    
+    Args:
+        range_clause: Argumentos de período (get_range_clause), ex: 'start: -7d'
+        tag: "device" ou "device_name" (séries sem a tag device)
+        package: "schema" ou "v1" (InfluxDB mais antigo)
+    
+    Returns:
+        String com query Flux; uma linha por valor, na coluna _value
+    """
+    predicate = '(r._measurement == "starlink_data" or r._measurement == "starlink_raw")'
+    if tag != "device":
+        # Tag ausente vale "" no predicado do storage
+        predicate += ' and r.device == ""'
+    
+    return f'''import "influxdata/influxdb/{package}"
+
+{package}.tagValues(bucket: "{INFLUX_CONFIG['bucket']}", tag: "{tag}", predicate: (r) => {predicate}, {range_clause})'''
+
+def get_device_index_query(range_clause):
+    """
+    Gera query com o primeiro e o último registro de cada série de dispositivo
+    
+    first() e last() logo após range/filter são executados no storage, então
+    só duas linhas por série trafegam.
+    
+    Args:
+        range_clause: Argumentos de período (get_range_clause)
+    
+    Returns:
+        String com query Flux; colunas _time, edge ("first" ou "last"),
+        device, device_name e device_ip
+    """
+    return f'''data = from(bucket: "{INFLUX_CONFIG['bucket']}")
+|> range({range_clause})
+|> filter(fn: (r) => r._measurement == "starlink_data" or r._measurement == "starlink_raw")
+|> filter(fn: (r) => r._field == "status_json")
+
+first_seen = data |> first() |> set(key: "edge", value: "first")
+last_seen = data |> last() |> set(key: "edge", value: "last")
+
+union(tables: [first_seen, last_seen])
+|> keep(columns: ["_time", "edge", "device", "device_name", "device_ip"])
+|> group()'''
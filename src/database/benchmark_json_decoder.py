@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos decodificadores de status_json
+
+Gera documentos no formato do dishGetStatus (aninhado e plano), confere que
+todos os backends extraem os mesmos valores e mede registros por segundo.
+
+Uso:
+    python src/database/benchmark_json_decoder.py [--records 20000]
+"""
+
+import argparse
+import json
+import random
+import time
+from json_decoder import BACKENDS, BEST_FULL_BACKEND
+
+def make_status(rng, nested=True):
+    """Documento com o tamanho e a estrutura de um status real da antena"""
+    status = {
+        "deviceInfo": {
+            "id": f"ut01000000-00000000-{rng.randrange(16 ** 6):06x}",
+            "hardwareVersion": "rev3_proto2",
+            "softwareVersion": "2024.05.0.mr12345",
+            "countryCode": "BR",
+            "utcOffsetS": -10800,
+            "bootcount": rng.randrange(1000),
+            "generationNumber": "1715000000",
+            "dishCohoused": False,
+            "boardRev": 7,
+        },
+        "deviceState": {"uptimeS": str(rng.randrange(10 ** 7))},
+        "obstructionStats": {
+            "fractionObstructed": rng.random() / 10,
+            "validS": 43200.0,
+            "currentlyObstructed": False,
+            "avgProlongedObstructionDurationS": rng.random() * 10,
+            "avgProlongedObstructionIntervalS": float("1e4"),
+            "timeObstructed": rng.random(),
+        },
+        "alerts": {
+            "motorsStuck": False, "thermalThrottle": False, "thermalShutdown": False,
+            "mastNotNearVertical": False, "unexpectedLocation": False,
+            "slowEthernetSpeeds": False, "roaming": False, "powerSupplyThermalThrottle": False,
+        },
+        "downlinkThroughputBps": rng.uniform(0, 3e8),
+        "uplinkThroughputBps": rng.uniform(0, 3e7),
+        "popPingLatencyMs": rng.uniform(20, 80),
+        "popPingDropRate": rng.random() / 100,
+        "boresightAzimuthDeg": rng.uniform(-180, 180),
+        "boresightElevationDeg": rng.uniform(60, 90),
+        "gpsStats": {"gpsValid": True, "gpsSats": rng.randrange(4, 16), "inhibitGps": False},
+        "ethSpeedMbps": 1000,
+        "mobilityClass": "MOBILITY_CLASS_STATIONARY",
+        "isSnrAboveNoiseFloor": True,
+        "readyStates": {"cady": True, "scp": True, "l1l2": True, "xphy": True, "aap": True, "rf": True},
+        "classOfService": "UT_CLASS_OF_SERVICE_CONSUMER",
+        "softwareUpdateState": "IDLE",
+        "isCellDisabled": False,
+        "swupdateRebootReady": False,
+        "disablementCode": "OKAY",
+        "hasActuators": "HAS_ACTUATORS_YES",
+        "alignmentStats": {
+            "tiltAngleDeg": rng.uniform(0, 10),
+            "boresightAzimuthDeg": rng.uniform(-180, 180),
+            "boresightElevationDeg": rng.uniform(60, 90),
+            "attitudeEstimationState": "FILTER_CONVERGED",
+            "attitudeUncertaintyDeg": rng.random(),
+            "desiredBoresightAzimuthDeg": rng.uniform(-180, 180),
+            "desiredBoresightElevationDeg": rng.uniform(60, 90),
+        },
+        "history": {"popPingLatencyMs": [rng.uniform(20, 80) for _ in range(60)]},
+    }
+    return {"dishGetStatus": status} if nested else status
+
+def benchmark(payloads, decode, repeat=3):
+    """Melhor tempo de repeat execuções, em registros por segundo"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for payload in payloads:
+            decode(payload)
+        best = min(best, time.perf_counter() - started)
+    return len(payloads) / best
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos decodificadores de status_json")
+    parser.add_argument("--records", type=int, default=20000, help="Documentos por rodada (padrão: 20000)")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    payloads = [json.dumps(make_status(rng, nested=i % 4 != 0)) for i in range(args.records)]
+    average_size = sum(len(payload) for payload in payloads) / len(payloads)
+
+    print(f"📄 {len(payloads)} documentos, {average_size:.0f} bytes em média")
+    print(f"🔧 Parser completo usado como fallback do prescan: {BEST_FULL_BACKEND}")
+
+    reference = [BACKENDS["json"](payload) for payload in payloads]
+    results = {}
+    for name, decode in BACKENDS.items():
+        if [decode(payload) for payload in payloads] != reference:
+            print(f"❌ {name}: valores diferentes do json padrão")
+            continue
+        results[name] = benchmark(payloads, decode)
+
+    baseline = results["json"]
+    for name, rate in sorted(results.items(), key=lambda item: -item[1]):
+        print(f"  {name:<10} {rate:>12,.0f} registros/s  ({rate / baseline:.1f}x json)")
+
+if __name__ == "__main__":
+    main()
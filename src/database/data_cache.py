@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+Cache de dados do InfluxDB entre reruns do Streamlit
+"""
+
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import streamlit as st
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'config'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'analysis'))
+from influx_config import CACHE_CONFIG, CHART_CONFIG, normalize_time_range, is_open_time_range, parse_time_range, format_flux_time, get_chart_bucket_seconds
+from influx_client import StarlinkDataResult, get_shared_client
+from flux_stream import concat_throughput
+from consumption import add_segments, append_segments, integrate_daily_usage, usage_delta
+from downsampling import aggregate_windows
+
+def _estimate_size(value):
+    """Estima o tamanho em bytes de um valor armazenado no cache"""
+    df = getattr(value, 'df', value)
+    if hasattr(df, 'memory_usage'):
+        return int(df.memory_usage(deep=True).sum())
+    return sys.getsizeof(value)
+
+class TTLCache:
+    """
+    Cache LRU com expiração por tempo e limite de memória.
+
+    Seguro para uso por várias threads (sessões do Streamlit).
+    """
+
+    def __init__(self, ttl_seconds, max_memory_mb):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_memory_mb * 1024 * 1024
+        self._entries = OrderedDict()  # key -> (expira_em, tamanho, valor)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Retorna o valor da chave ou None se ausente/expirado"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, size, value = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+
+            # Marca como usado recentemente
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl_seconds=None):
+        """Armazena o valor, removendo os menos usados se passar do limite de memória"""
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return
+
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (time.monotonic() + ttl, size, value)
+            self._total_bytes += size
+
+            while self._total_bytes > self.max_bytes and self._entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+
+    def invalidate(self, predicate=None):
+        """Remove as entradas cuja chave satisfaz o predicado (todas se None)"""
+        with self._lock:
+            for key in list(self._entries):
+                if predicate is None or predicate(key):
+                    self._remove(key)
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._total_bytes -= size
+
+    @property
+    def total_bytes(self):
+        return self._total_bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+class TailWindow:
+    """
+    Janela de dados com fim em aberto (ex: "-1h") mantida entre reruns.
+
+    Guarda os dados (já segmentados por dispositivo) e o último _time visto
+    por dispositivo; cada atualização busca cada dispositivo só a partir do
+    seu último visto, intercala as linhas novas pelo horário, descarta as que
+    saíram da janela e ajusta consumo, tabela diária e gráficos já agregados
+    só com as linhas que mudaram.
+    """
+
+    def __init__(self, client, devices, time_range, max_gap_minutes):
+        self.client = client
+        self.devices = list(devices)
+        self.time_range = time_range
+        self.max_gap_minutes = max_gap_minutes
+        self.last_seen = {}
+        self.data = None
+        self.lock = threading.Lock()
+
+    @property
+    def df(self):
+        return self.data.df if self.data is not None else pd.DataFrame()
+
+    def refresh(self):
+        """Atualiza a janela e retorna o StarlinkDataResult correspondente"""
+        with self.lock:
+            start, stop, _ = parse_time_range(self.time_range)
+            start = pd.Timestamp(start)
+
+            if self.data is None:
+                self._full_load()
+            else:
+                self._append_tail(start, stop)
+
+            self._drop_expired(start)
+            return self.data
+
+    def _full_load(self):
+        raw = self.client.fetch_throughput(self.devices, self.time_range)
+        self._rebuild(raw)
+
+    def _rebuild(self, raw):
+        """Recalcula tudo a partir dos dados brutos em memória (sem nova query)"""
+        self.last_seen = raw.groupby('device', observed=True)['timestamp'].max().to_dict() if not raw.empty else {}
+        df = add_segments(raw, self.max_gap_minutes)
+        self.data = StarlinkDataResult(self.client, df, self.time_range, self.max_gap_minutes)
+
+    def _fetch_tail(self, start, stop):
+        """
+        Registros novos, cada dispositivo buscado a partir do seu último _time visto
+
+        Dispositivos com o mesmo ponto de partida vão na mesma query; um
+        dispositivo ainda sem dados é buscado desde o início da janela sem
+        fazer os demais buscarem a janela inteira.
+        """
+        by_start = {}
+        for device in self.devices:
+            fetch_start = max(self.last_seen.get(device, start), start)
+            by_start.setdefault(fetch_start, []).append(device)
+
+        frames = []
+        for fetch_start, devices in by_start.items():
+            tail_range = format_flux_time(fetch_start)
+            if stop is not None:
+                tail_range = f"{tail_range}:{format_flux_time(stop)}"
+            frames.append(self.client.fetch_throughput(devices, tail_range))
+
+        tail = concat_throughput(frames)
+        if tail.empty or len(frames) == 1:
+            return tail
+        return tail.sort_values('timestamp', kind='mergesort').reset_index(drop=True)
+
+    def _append_tail(self, start, stop):
+        tail = self._fetch_tail(start, stop)
+        if tail.empty:
+            return
+
+        # range(start:) é inclusivo: mantém só o que é mais novo que o último visto
+        seen = tail['device'].astype(object).map(self.last_seen).fillna(start)
+        tail = tail[tail['timestamp'] > seen].reset_index(drop=True)
+        if tail.empty:
+            return
+
+        df = self.data.df
+        if df.empty or tail['timestamp'].iloc[0] < df['timestamp'].iloc[0]:
+            # Registros anteriores aos dados em cache: recalcula em memória
+            merged = concat_throughput([df.drop(columns='segment', errors='ignore'), tail])
+            self._rebuild(merged.sort_values('timestamp', kind='mergesort').reset_index(drop=True))
+            return
+
+        # Último registro de cada dispositivo: os trechos continuam a partir dele
+        # (cada dispositivo só recebe registros posteriores ao seu último)
+        last_rows = df.groupby('device', observed=True).tail(1)
+        next_segment = int(df['segment'].max()) + 1
+        tail['segment'] = append_segments(last_rows, tail, self.max_gap_minutes, next_segment)
+        self.last_seen.update(tail.groupby('device', observed=True)['timestamp'].max().to_dict())
+
+        # Consumo: soma só os intervalos novos (último registro de cada dispositivo + anexados)
+        download_gb, upload_gb, gaps, records = self.data.usage
+        delta = usage_delta(concat_throughput([last_rows, tail]), self.max_gap_minutes)
+        usage = (download_gb + delta[0], upload_gb + delta[1], gaps + delta[2], records + len(tail))
+
+        df = _merge_by_time(df, tail)
+        daily = self._update_daily(df, tail)
+        charts = self._update_charts(df, changed_from=tail['timestamp'].iloc[0])
+        self.data = StarlinkDataResult(self.client, df, self.time_range, self.max_gap_minutes, usage, daily, charts)
+
+    def _drop_expired(self, start):
+        df = self.data.df
+        if df.empty or df['timestamp'].iloc[0] >= start:
+            return
+
+        expired = int((df['timestamp'] < start).sum())
+        remaining = df.iloc[expired:].reset_index(drop=True)
+
+        # Consumo: subtrai os intervalos que começavam nas linhas descartadas
+        # (até o primeiro registro que fica de cada dispositivo)
+        download_gb, upload_gb, gaps, records = self.data.usage
+        first_remaining = remaining.groupby('device', observed=True).head(1)
+        delta = usage_delta(concat_throughput([df.iloc[:expired], first_remaining]), self.max_gap_minutes)
+        usage = (download_gb - delta[0], upload_gb - delta[1], gaps - delta[2], records - expired)
+
+        daily = self._update_daily(remaining, df.iloc[:expired])
+        charts = self._update_charts(remaining, window_start=start)
+        self.data = StarlinkDataResult(self.client, remaining, self.time_range, self.max_gap_minutes, usage, daily, charts)
+
+    def _update_daily(self, df, changed):
+        """
+        Recalcula o consumo diário só dos pares (dispositivo, dia) das linhas em changed
+
+        Args:
+            df: Dados da janela já atualizados, ordenados por timestamp
+            changed: Linhas anexadas ou descartadas
+        """
+        daily = self.data.daily
+        changed_days = changed['timestamp'].dt.date
+        keys = set(zip(changed['device'].astype(str), changed_days))
+
+        # df ordenado: só o trecho dos dias afetados é examinado
+        first_day = pd.Timestamp(changed_days.min(), tz='UTC')
+        last_day = pd.Timestamp(changed_days.max(), tz='UTC') + pd.Timedelta(days=1)
+        span = df.iloc[df['timestamp'].searchsorted(first_day):df['timestamp'].searchsorted(last_day)]
+        span_keys = pd.Series(list(zip(span['device'].astype(str), span['timestamp'].dt.date)), index=span.index)
+        updated = integrate_daily_usage(span[span_keys.isin(keys)], self.max_gap_minutes)
+
+        if not daily.empty:
+            daily_keys = pd.Series(list(zip(daily['device'].astype(str), daily['date'])), index=daily.index)
+            daily = daily[~daily_keys.isin(keys)]
+        if daily.empty:
+            return updated
+        if updated.empty:
+            return daily.reset_index(drop=True)
+
+        daily = pd.concat([daily, updated], ignore_index=True)
+        return daily.sort_values(['date', 'device']).reset_index(drop=True)
+
+    def _update_charts(self, df, changed_from=None, window_start=None):
+        """
+        Ajusta os gráficos agregados de self.data para df sem nova query
+
+        Só as janelas afetadas são reagregadas localmente: a partir da janela de
+        changed_from (linhas anexadas) e a janela parcial de window_start
+        (linhas descartadas); as que terminam antes de window_start saem. df
+        deve estar ordenado por timestamp.
+
+        Returns:
+            Dict largura -> DataFrame para o StarlinkDataResult novo
+        """
+        charts = {}
+        for pixel_width, chart in self.data._charts.items():
+            # Com poucos pontos o gráfico é o próprio df (sem agregação) e sai barato
+            if not (_chart_aggregated(self.data.df, pixel_width) and _chart_aggregated(df, pixel_width)):
+                continue
+            try:
+                every_seconds = get_chart_bucket_seconds(self.time_range, pixel_width)
+            except ValueError:
+                continue
+            freq = f"{int(every_seconds)}s"
+
+            # Linhas de df das janelas reagregadas: [0, head_end) e [tail_start, fim)
+            keep = pd.Series(True, index=chart.index)
+            head_end, tail_start = 0, len(df)
+            if window_start is not None:
+                first_window = pd.Timestamp(window_start).floor(freq)
+                keep &= chart['timestamp'] > first_window
+                head_end = df['timestamp'].searchsorted(first_window + pd.Timedelta(seconds=every_seconds))
+            if changed_from is not None:
+                last_window = pd.Timestamp(changed_from).floor(freq)
+                keep &= chart['timestamp'] < last_window
+                tail_start = max(head_end, df['timestamp'].searchsorted(last_window))
+
+            rows = pd.concat([df.iloc[:head_end], df.iloc[tail_start:]])
+            if 'segment' not in chart:
+                rows = rows.drop(columns='segment', errors='ignore')
+            updated = aggregate_windows(rows, every_seconds, CHART_CONFIG["aggregate"])
+            charts[pixel_width] = (pd.concat([chart[keep], updated], ignore_index=True)
+                                     .sort_values('timestamp', kind='mergesort')
+                                     .reset_index(drop=True))
+        return charts
+
+def _merge_by_time(df, tail):
+    """
+    Intercala tail em df pelo timestamp (ambos ordenados)
+
+    Com vários dispositivos os horários se intercalam; as linhas de df não
+    são reordenadas e, no mesmo horário, as de tail ficam depois.
+    """
+    merged = concat_throughput([df, tail])
+    if tail['timestamp'].iloc[0] >= df['timestamp'].iloc[-1]:
+        return merged
+
+    positions = df['timestamp'].searchsorted(tail['timestamp'], side='right')
+    order = np.insert(np.arange(len(df)), positions, np.arange(len(df), len(merged)))
+    return merged.take(order).reset_index(drop=True)
+
+def _chart_aggregated(df, pixel_width):
+    """Mesmo critério de get_chart_data: o gráfico só é agregado com mais de um ponto por pixel e dispositivo"""
+    return len(df) > pixel_width * df['device'].nunique()
+
+class CachedStarlinkClient:
+    """
+    Camada de cache em volta do StarlinkInfluxClient.
+
+    Os dados são indexados por (dispositivos, período normalizado, gap máximo).
+    Períodos cujo fim ainda se move (ex: "-1h") nunca são servidos do cache
+    como estão: a TailWindow busca só os registros novos a cada rerun.
+    Teste de conexão e lista de dispositivos têm validade própria.
+    """
+
+    def __init__(self, client, ttl_seconds=None, max_memory_mb=None):
+        self.client = client
+        self.cache = TTLCache(
+            ttl_seconds if ttl_seconds is not None else CACHE_CONFIG["ttl_seconds"],
+            max_memory_mb if max_memory_mb is not None else CACHE_CONFIG["max_memory_mb"]
+        )
+
+    def __getattr__(self, name):
+        # Demais métodos vão direto para o cliente
+        return getattr(self.client, name)
+
+    @staticmethod
+    def _data_key(devices, time_range, max_gap_minutes):
+        return ("data", tuple(sorted(devices)), normalize_time_range(time_range), max_gap_minutes)
+
+    def test_connection(self):
+        """Testa conexão com InfluxDB, reaproveitando o último resultado positivo"""
+        key = ("connection",)
+        if self.cache.get(key):
+            return True
+
+        connected = self.client.test_connection()
+        if connected:
+            self.cache.set(key, True, CACHE_CONFIG["connection_ttl_seconds"])
+        return connected
+
+    def get_available_devices(self, days_back=7, custom_time_range=None):
+        """Retorna dispositivos disponíveis (lista guardada por alguns minutos)"""
+        time_key = normalize_time_range(custom_time_range) if custom_time_range else days_back
+        key = ("devices", time_key)
+        devices = self.cache.get(key)
+        if devices is not None:
+            return list(devices)
+
+        devices = self.client.get_available_devices(days_back, custom_time_range)
+        if devices:
+            self.cache.set(key, tuple(devices), CACHE_CONFIG["devices_ttl_seconds"])
+        return devices
+
+    def get_device_index(self, days_back=7, custom_time_range=None):
+        """Primeiro/último registro e IP por dispositivo (guardado por alguns minutos)"""
+        time_key = normalize_time_range(custom_time_range) if custom_time_range else days_back
+        key = ("device_index", time_key)
+        index = self.cache.get(key)
+        if index is not None:
+            return dict(index)
+
+        index = self.client.get_device_index(days_back, custom_time_range)
+        if index:
+            self.cache.set(key, index, CACHE_CONFIG["devices_ttl_seconds"])
+        return index
+
+    def load_data(self, devices, time_range, max_gap_minutes=5):
+        """
+        Igual a StarlinkInfluxClient.load_data, mas reaproveita o resultado
+        (incluindo as tabelas derivadas já calculadas) de reruns anteriores
+        """
+        if is_open_time_range(time_range):
+            return self._load_tail_window(devices, time_range, max_gap_minutes)
+        
+        key = self._data_key(devices, time_range, max_gap_minutes)
+        data = self.cache.get(key)
+        if data is None:
+            data = self.client.load_data(devices, time_range, max_gap_minutes)
+            if not data.empty:
+                self.cache.set(key, data)
+        return data
+
+    def _load_tail_window(self, devices, time_range, max_gap_minutes):
+        """Atualiza (ou cria) a janela incremental de um período com fim em aberto"""
+        key = ("window",) + self._data_key(devices, time_range, max_gap_minutes)[1:]
+        window = self.cache.get(key)
+        if window is None:
+            window = TailWindow(self.client, devices, time_range, max_gap_minutes)
+
+        try:
+            data = window.refresh()
+        except Exception as e:
+            st.error(f"❌ Erro ao buscar dados: {str(e)}")
+            self.cache.invalidate(lambda cached_key: cached_key == key)
+            return StarlinkDataResult(self.client, pd.DataFrame(), time_range, max_gap_minutes)
+
+        # Regrava para atualizar o tamanho estimado e a validade
+        if not data.empty:
+            self.cache.set(key, window)
+        return data
+
+    def get_starlink_data(self, devices, time_range, max_gap_minutes=5):
+        """Igual a StarlinkInfluxClient.get_starlink_data, com cache"""
+        return self.load_data(devices, time_range, max_gap_minutes).df
+
+    def invalidate(self, devices=None):
+        """
+        Descarta dados em cache
+
+        Args:
+            devices: Se informado, descarta só as entradas que incluem algum destes dispositivos
+        """
+        if devices is None:
+            self.cache.invalidate()
+            return
+
+        devices = set(devices)
+        self.cache.invalidate(lambda key: key[0] in ("data", "window") and devices.intersection(key[1]))
+
+# Cache único do processo, compartilhado por todas as sessões
+_shared_cached_client = None
+_shared_cached_client_lock = threading.Lock()
+
+def get_shared_cached_client():
+    """Retorna o CachedStarlinkClient do processo em volta do cliente compartilhado"""
+    global _shared_cached_client
+    
+    with _shared_cached_client_lock:
+        if _shared_cached_client is None:
+            _shared_cached_client = CachedStarlinkClient(get_shared_client())
+        return _shared_cached_client
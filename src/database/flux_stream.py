@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Leitura em streaming dos resultados CSV do InfluxDB
+
+As linhas chegam uma a uma de query_csv e são gravadas direto em buffers
+NumPy tipados, convertidos em lotes de tamanho limitado. Não são criados
+FluxRecord nem listas de dicts, então o pico de memória fica próximo do
+tamanho do DataFrame final.
+
+Os DataFrames de throughput usam um esquema compacto: device categórico,
+throughput em float32 e timestamp datetime64[ns, UTC] (inteiro de 64 bits
+em nanossegundos). As colunas em Mbps não são guardadas; with_mbps as
+calcula quando a página precisa.
+"""
+
+import sys
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from influxdb_client.domain.dialect import Dialect
+
+# Sem anotações: cada tabela começa por uma linha de cabeçalho
+CSV_DIALECT = Dialect(header=True, delimiter=",", comment_prefix="#", annotations=[],
+                      date_time_format="RFC3339Nano")
+
+THROUGHPUT_COLUMNS = ['timestamp', 'device', 'downlink_bps', 'uplink_bps']
+THROUGHPUT_DTYPE = np.float32
+
+class ThroughputRecord:
+    """Um registro de throughput (sem __dict__, para iterar registros um a um)"""
+    __slots__ = ('time', 'device', 'downlink_bps', 'uplink_bps')
+
+    def __init__(self, time, device, downlink_bps, uplink_bps):
+        self.time = time
+        self.device = device
+        self.downlink_bps = downlink_bps
+        self.uplink_bps = uplink_bps
+
+class ThroughputColumns:
+    """
+    Colunas timestamp, device, downlink_bps e uplink_bps preenchidas registro a registro
+
+    Cada lote de batch_rows registros é convertido de uma vez (timestamps em
+    epoch ns, device em códigos) e guardado; o buffer do lote é reaproveitado.
+    """
+
+    def __init__(self, batch_rows):
+        self.batch_rows = batch_rows
+        self._times = []
+        self._devices = np.empty(batch_rows, dtype=object)
+        self._downlink = np.empty(batch_rows, dtype=THROUGHPUT_DTYPE)
+        self._uplink = np.empty(batch_rows, dtype=THROUGHPUT_DTYPE)
+        self._size = 0
+        self._chunks = []
+
+    def extend(self, records):
+        for record in records:
+            i = self._size
+            self._times.append(record.time)
+            self._devices[i] = record.device
+            self._downlink[i] = record.downlink_bps
+            self._uplink[i] = record.uplink_bps
+            self._size += 1
+
+            if self._size == self.batch_rows:
+                self._flush()
+        return self
+
+    def _flush(self):
+        n = self._size
+        if not n:
+            return
+
+        times = pd.to_datetime(self._times, utc=True, format='ISO8601').as_unit('ns').asi8
+        devices = pd.Categorical(self._devices[:n])
+        self._chunks.append((times, devices, self._downlink[:n].copy(), self._uplink[:n].copy()))
+        self._times = []
+        self._size = 0
+
+    def to_frame(self):
+        """DataFrame compacto no formato de fetch_throughput (sem ordenar)"""
+        self._flush()
+        if not self._chunks:
+            return empty_throughput()
+
+        times, devices, downlink, uplink = zip(*self._chunks)
+        self._chunks = []
+
+        return pd.DataFrame({
+            'timestamp': pd.to_datetime(np.concatenate(times), utc=True),
+            'device': union_categoricals(list(devices), sort_categories=True),
+            'downlink_bps': np.concatenate(downlink),
+            'uplink_bps': np.concatenate(uplink)
+        })
+
+def empty_throughput():
+    """DataFrame vazio com as colunas e tipos do esquema compacto"""
+    return pd.DataFrame({
+        'timestamp': pd.to_datetime(np.empty(0, dtype=np.int64), utc=True),
+        'device': pd.Categorical([]),
+        'downlink_bps': np.empty(0, dtype=THROUGHPUT_DTYPE),
+        'uplink_bps': np.empty(0, dtype=THROUGHPUT_DTYPE)
+    })
+
+def compact_throughput(df):
+    """Converte um DataFrame de throughput para o esquema compacto"""
+    if df.empty:
+        return empty_throughput()
+
+    df = df[THROUGHPUT_COLUMNS].copy()
+    df['device'] = df['device'].astype('category')
+    df['downlink_bps'] = df['downlink_bps'].astype(THROUGHPUT_DTYPE)
+    df['uplink_bps'] = df['uplink_bps'].astype(THROUGHPUT_DTYPE)
+    return df
+
+def concat_throughput(frames):
+    """
+    Junta DataFrames compactos mantendo device categórico
+
+    pd.concat de categóricos com categorias diferentes volta a object; as
+    categorias são unificadas antes.
+    """
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return empty_throughput()
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+
+    categories = sorted(set().union(*(frame['device'].astype('category').cat.categories for frame in frames)))
+    frames = [frame.assign(device=frame['device'].astype('category').cat.set_categories(categories))
+              for frame in frames]
+    return pd.concat(frames, ignore_index=True)
+
+def with_mbps(df):
+    """Cópia rasa de df com downlink_mbps e uplink_mbps calculados na hora"""
+    if 'downlink_mbps' in df:
+        return df
+    if df.empty and 'downlink_bps' not in df:
+        df = empty_throughput()
+
+    return df.assign(downlink_mbps=df['downlink_bps'].to_numpy(dtype=np.float64) / 1_000_000,
+                     uplink_mbps=df['uplink_bps'].to_numpy(dtype=np.float64) / 1_000_000)
+
+def _iter_rows(rows):
+    """
+    Percorre as linhas de dados do CSV
+
+    Yields:
+        Tupla (colunas, linha), onde colunas mapeia nome -> índice da tabela atual
+    """
+    columns = None
+    for row in rows:
+        if not row or not any(row) or row[0].startswith('#'):
+            continue
+        if '_time' in row and 'table' in row:
+            columns = {name: i for i, name in enumerate(row)}
+            continue
+        if columns is not None:
+            yield columns, row
+
+def _to_float(text):
+    """Converte o texto do CSV; vazio ou NaN viram NaN"""
+    return float(text) if text else float('nan')
+
+def _device_getter(columns):
+    device_index = columns.get('device')
+    name_index = columns.get('device_name')
+
+    def get_device(row):
+        device = row[device_index] if device_index is not None else ''
+        if not device:
+            device = row[name_index] if name_index is not None and row[name_index] else 'unknown'
+        return sys.intern(device)
+    return get_device
+
+def iter_extracted_records(rows):
+    """
+    Percorre o resultado de get_flux_query(..., extract_throughput=True)
+
+    Args:
+        rows: Iterador de linhas de query_csv (com CSV_DIALECT)
+
+    Yields:
+        ThroughputRecord com o timestamp ainda em texto RFC3339
+    """
+    current = None
+
+    for columns, row in _iter_rows(rows):
+        if columns is not current:
+            current = columns
+            time_index = columns['_time']
+            downlink_index = columns['downlink_bps']
+            uplink_index = columns['uplink_bps']
+            get_device = _device_getter(columns)
+
+        downlink = _to_float(row[downlink_index])
+        uplink = _to_float(row[uplink_index])
+
+        # NaN indica que o JSON não tinha o campo
+        downlink_missing = downlink != downlink
+        uplink_missing = uplink != uplink
+        if downlink_missing and uplink_missing:
+            continue
+
+        yield ThroughputRecord(row[time_index], get_device(row),
+                               0.0 if downlink_missing else downlink,
+                               0.0 if uplink_missing else uplink)
+
+def iter_json_records(rows, extract):
+    """
+    Percorre o resultado bruto de get_flux_query extraindo o throughput do status_json
+
+    Args:
+        rows: Iterador de linhas de query_csv (com CSV_DIALECT)
+        extract: Função que recebe o JSON e devolve o dict de throughput
+
+    Yields:
+        ThroughputRecord com o timestamp ainda em texto RFC3339
+    """
+    current = None
+
+    for columns, row in _iter_rows(rows):
+        if columns is not current:
+            current = columns
+            time_index = columns['_time']
+            field_index = columns['_field']
+            value_index = columns['_value']
+            get_device = _device_getter(columns)
+
+        # Só processa se for status_json
+        value = row[value_index]
+        if row[field_index] != "status_json" or not value:
+            continue
+
+        throughput = extract(value)
+        if throughput:
+            yield ThroughputRecord(row[time_index], get_device(row),
+                                   throughput.get('downlinkThroughputBps', 0),
+                                   throughput.get('uplinkThroughputBps', 0))
+
+def read_extracted_throughput(rows, batch_rows):
+    """DataFrame compacto a partir de iter_extracted_records, em lotes de batch_rows"""
+    return ThroughputColumns(batch_rows).extend(iter_extracted_records(rows)).to_frame()
+
+def read_json_throughput(rows, extract, batch_rows):
+    """DataFrame compacto a partir de iter_json_records, em lotes de batch_rows"""
+    return ThroughputColumns(batch_rows).extend(iter_json_records(rows, extract)).to_frame()
@@ -5,22 +5,113 @@ Cliente para conexão e consultas no InfluxDB
 
 import pandas as pd
 import streamlit as st
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from functools import cached_property
+import atexit
+import logging
+import socket
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from influxdb_client import InfluxDBClient
 from influxdb_client.client.write_api import SYNCHRONOUS
 from influxdb_client.client.query_api import QueryApi
+from influxdb_client.rest import ApiException
+from urllib3.connection import HTTPConnection
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'config'))
-from influx_config import INFLUX_CONFIG, BIT_STAR_DEVICES, get_flux_query, get_daily_consumption_query, update_device_list, get_device_display_name
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'analysis'))
+from influx_config import INFLUX_CONFIG, CHART_CONFIG, FANOUT_CONFIG, PARQUET_CONFIG, ROLLUP_CONFIG, get_flux_query, get_range_clause, get_device_tag_values_query, get_device_index_query, update_device_list, get_device_display_name, parse_time_range, get_last_closed_day, format_flux_time, get_chart_query, get_chart_bucket_seconds
+from consumption import integrate_usage, integrate_daily_usage, add_segments, DAILY_COLUMNS
+from parquet_store import ParquetThroughputStore, PARQUET_AVAILABLE
+from rollup_store import DailyRollupStore
+from downsampling import aggregate_windows
+from json_decoder import get_json_decoder
+from flux_stream import CSV_DIALECT, read_extracted_throughput, read_json_throughput, concat_throughput, with_mbps
+
+logger = logging.getLogger(__name__)
+
+class StarlinkDataResult:
+    """
+    Resultado de uma renderização: o DataFrame carregado uma vez e as tabelas
+    derivadas (uso total, consumo diário e resumo), calculadas sob demanda e
+    memorizadas para que cada uma rode no máximo uma vez por página.
+    """
+    
+    def __init__(self, client, df, time_range, max_gap_minutes=5, usage=None, daily=None, charts=None):
+        self.client = client
+        self.df = df
+        self.time_range = time_range
+        self.max_gap_minutes = max_gap_minutes
+        
+        # Gráficos por largura; a janela incremental repassa os já agregados
+        self._charts = dict(charts) if charts else {}
+        
+        # Tabelas já calculadas (ex: atualização incremental) dispensam o recálculo
+        if usage is not None:
+            self.__dict__['usage'] = usage
+        if daily is not None:
+            self.__dict__['daily'] = daily
+    
+    @property
+    def empty(self):
+        return self.df.empty
+    
+    @property
+    def mbps(self):
+        """df com as colunas em Mbps, calculadas a cada acesso (não ficam em cache)"""
+        return with_mbps(self.df)
+    
+    @cached_property
+    def usage(self):
+        """Tupla (download_gb, upload_gb, gaps, registros)"""
+        return integrate_usage(self.df, self.max_gap_minutes)
+    
+    @cached_property
+    def daily(self):
+        """DataFrame de consumo diário por dispositivo"""
+        return self.client.get_daily_consumption_from_df(self.df, self.max_gap_minutes, self.time_range)
+    
+    @cached_property
+    def summary(self):
+        """Dict com resumo por dispositivo"""
+        return self.client.get_device_summary_from_df(self.df)
+    
+    def chart(self, pixel_width=None):
+        """Throughput agregado por janela para um gráfico com pixel_width pixels"""
+        pixel_width = pixel_width or CHART_CONFIG["pixel_width"]
+        if pixel_width not in self._charts:
+            devices = list(self.df['device'].unique()) if not self.df.empty else []
+            self._charts[pixel_width] = self.client.get_chart_data(devices, self.time_range, pixel_width, df=self.df)
+        return self._charts[pixel_width]
 
 class StarlinkInfluxClient:
     def __init__(self):
         """Inicializa cliente InfluxDB"""
         self.client = None
         self.query_api = None
+        self.server_side_json = INFLUX_CONFIG["server_side_json"]
+        # Extração no servidor suspensa até este instante (time.monotonic) após erro do Flux
+        self._server_json_retry_at = 0.0
+        # Próximo aviso de falha do gráfico agregado (time.monotonic); a falha se repete a cada rerun
+        self._chart_warning_at = 0.0
+        self.decode_status_json = get_json_decoder(INFLUX_CONFIG["json_decoder"])
+        # Dias encerrados são lidos do disco quando o pyarrow está disponível
+        self.store = ParquetThroughputStore() if PARQUET_CONFIG["enabled"] and PARQUET_AVAILABLE else None
+        self.rollups = self._open_rollups()
         self.connect()
     
+    def _open_rollups(self):
+        """Abre o banco de rollups diários; sem ele o consumo é sempre recalculado"""
+        if not ROLLUP_CONFIG["enabled"]:
+            return None
+        try:
+            return DailyRollupStore()
+        except (sqlite3.Error, OSError):
+            return None
+    
     def connect(self):
         """Conecta ao InfluxDB"""
         try:
@@ -31,14 +122,30 @@ class StarlinkInfluxClient:
             self.client = InfluxDBClient(
                 url=INFLUX_CONFIG["url"],
                 token=INFLUX_CONFIG["token"],
-                org=INFLUX_CONFIG["org"]
+                org=INFLUX_CONFIG["org"],
+                timeout=INFLUX_CONFIG["timeout_ms"],
+                enable_gzip=INFLUX_CONFIG["enable_gzip"],
+                connection_pool_maxsize=INFLUX_CONFIG["connection_pool_maxsize"]
             )
+            if INFLUX_CONFIG["tcp_keepalive"]:
+                self._enable_tcp_keepalive()
             self.query_api = self.client.query_api()
             return True
         except Exception as e:
             st.error(f"❌ Erro ao conectar no InfluxDB: {str(e)}")
             return False
     
+    def _enable_tcp_keepalive(self):
+        """Ativa TCP keep-alive nas conexões do pool HTTP (evita quedas por ociosidade)"""
+        try:
+            pool_manager = self.client.api_client.rest_client.pool_manager
+            pool_manager.connection_pool_kw['socket_options'] = (
+                HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+            )
+        except AttributeError:
+            # Versão do influxdb-client sem acesso ao pool: mantém o padrão
+            pass
+    
     def test_connection(self):
         """Testa conexão com InfluxDB"""
         try:
@@ -59,70 +166,19 @@ class StarlinkInfluxClient:
             return False
     
     def get_available_devices(self, days_back=7, custom_time_range=None):
-        """Retorna lista de dispositivos disponíveis e atualiza a lista global"""
+        """
+        Retorna lista de dispositivos disponíveis e atualiza a lista global
+        
+        Usa os metadados das séries (schema.tagValues, ou v1.tagValues em
+        versões antigas); a varredura dos pontos só é feita se nenhum dos dois
+        estiver disponível.
+        """
         try:
-            # Se um período personalizado foi fornecido, usa ele; senão usa days_back
-            if custom_time_range:
-                if ':' in custom_time_range and 'Z' in custom_time_range:
-                    # Procura pelo padrão 'Z:' para separar start e stop corretamente
-                    if 'Z:' in custom_time_range:
-                        parts = custom_time_range.split('Z:', 1)
-                        if len(parts) == 2:
-                            start_time = parts[0] + 'Z'  # Adiciona o Z de volta
-                            end_time = parts[1]
-                            range_clause = f'start: {start_time}, stop: {end_time}'
-                        else:
-                            range_clause = f'start: {custom_time_range}'
-                    else:
-                        range_clause = f'start: {custom_time_range}'
-                else:
-                    range_clause = f'start: {custom_time_range}'
-            else:
-                range_clause = f'start: -{days_back}d'
+            range_clause = self._device_range_clause(days_back, custom_time_range)
             
-            # Query mais flexível para buscar dispositivos
-            query = f'''
-            from(bucket: "{INFLUX_CONFIG['bucket']}")
-            |> range({range_clause})
-            |> filter(fn: (r) => r._measurement == "starlink_data" or r._measurement == "starlink_raw")
-            |> filter(fn: (r) => exists r.device or exists r.device_name)
-            |> keep(columns: ["device", "device_name", "device_ip"])
-            |> distinct()
-            |> sort(columns: ["device"])
-            '''
-            
-            result = self.query_api.query(query)
-            devices = []
-            device_info = {}
-            
-            for table in result:
-                for record in table.records:
-                    # Tenta diferentes campos para identificar o dispositivo
-                    device_id = None
-                    device_name = None
-                    device_ip = None
-                    
-                    # Verifica campos disponíveis
-                    if "device" in record.values and record.values["device"]:
-                        device_id = record.values["device"].strip()
-                    elif "device_name" in record.values and record.values["device_name"]:
-                        device_id = record.values["device_name"].strip()
-                    
-                    if "device_name" in record.values and record.values["device_name"]:
-                        device_name = record.values["device_name"].strip()
-                    
-                    if "device_ip" in record.values and record.values["device_ip"]:
-                        device_ip = record.values["device_ip"].strip()
-                    
-                    if device_id:
-                        devices.append(device_id)
-                        device_info[device_id] = {
-                            "name": device_name or device_id,
-                            "ip": device_ip
-                        }
-            
-            # Remove duplicatas e ordena
-            devices = sorted(list(set(devices)))
+            devices = self._tag_value_devices(range_clause)
+            if devices is None:
+                devices = self._scan_devices(range_clause)
             
             # Atualiza a lista global de dispositivos
             if devices:
@@ -130,42 +186,131 @@ class StarlinkInfluxClient:
                 st.info(f"📱 {len(devices)} dispositivo(s) encontrado(s)")
             else:
                 st.warning("⚠️ Nenhum dispositivo encontrado nos últimos 30 dias")
-                
-                # Query de diagnóstico adicional
-                st.info("🔍 Executando diagnóstico...")
-                diag_query = f'''
-                from(bucket: "{INFLUX_CONFIG['bucket']}")
-                |> range(start: -{days_back}d)
-                |> limit(n: 10)
-                |> keep(columns: ["_time", "_measurement", "_field", "_value"])
-                '''
-                
-                try:
-                    diag_result = self.query_api.query(diag_query)
-                    diag_data = []
-                    for table in diag_result:
-                        for record in table.records:
-                            diag_data.append({
-                                "time": record.get_time(),
-                                "measurement": record.get_measurement(),
-                                "field": record.get_field(),
-                                "value": record.get_value()
-                            })
-                    
-                    if diag_data:
-                        st.write("**Dados encontrados no bucket:**")
-                        diag_df = pd.DataFrame(diag_data)
-                        st.dataframe(diag_df)
-                    else:
-                        st.error("❌ Nenhum dado encontrado no bucket")
-                except Exception as e:
-                    st.error(f"❌ Erro no diagnóstico: {str(e)}")
             
             return devices
         except Exception as e:
             st.error(f"❌ Erro ao buscar dispositivos: {str(e)}")
             return []
     
+    @staticmethod
+    def _device_range_clause(days_back, custom_time_range):
+        # Se um período personalizado foi fornecido, usa ele; senão usa days_back
+        if custom_time_range:
+            return get_range_clause(custom_time_range)
+        return f'start: -{days_back}d'
+    
+    def _tag_value_devices(self, range_clause):
+        """
+        Lista os dispositivos pelos valores das tags device e device_name
+        
+        Returns:
+            Lista ordenada de dispositivos, ou None se tagValues não for suportado
+        """
+        for package in ("schema", "v1"):
+            try:
+                devices = set()
+                for tag in ("device", "device_name"):
+                    result = self.query_api.query(get_device_tag_values_query(range_clause, tag, package))
+                    for table in result:
+                        for record in table.records:
+                            value = (record.get_value() or "").strip()
+                            if value:
+                                devices.add(value)
+                return sorted(devices)
+            except Exception:
+                continue
+        return None
+    
+    def _scan_devices(self, range_clause):
+        """Lista os dispositivos percorrendo os pontos do período (fallback)"""
+        query = f'''
+        from(bucket: "{INFLUX_CONFIG['bucket']}")
+        |> range({range_clause})
+        |> filter(fn: (r) => r._measurement == "starlink_data" or r._measurement == "starlink_raw")
+        |> filter(fn: (r) => exists r.device or exists r.device_name)
+        |> keep(columns: ["device", "device_name", "device_ip"])
+        |> distinct()
+        |> sort(columns: ["device"])
+        '''
+        
+        result = self.query_api.query(query)
+        devices = set()
+        for table in result:
+            for record in table.records:
+                device_id = _record_device(record.values)
+                if device_id:
+                    devices.add(device_id)
+        
+        return sorted(devices)
+    
+    def get_device_index(self, days_back=7, custom_time_range=None):
+        """
+        Primeiro e último registro e IP de cada dispositivo no período
+        
+        Returns:
+            Dict device -> {"name", "ip", "first_seen", "last_seen"}
+        """
+        try:
+            range_clause = self._device_range_clause(days_back, custom_time_range)
+            result = self.query_api.query(get_device_index_query(range_clause))
+        except Exception as e:
+            st.error(f"❌ Erro ao buscar índice de dispositivos: {str(e)}")
+            return {}
+        
+        index = {}
+        for table in result:
+            for record in table.records:
+                device_id = _record_device(record.values)
+                if not device_id:
+                    continue
+                
+                seen = record.get_time()
+                entry = index.setdefault(device_id, {
+                    "name": (record.values.get("device_name") or device_id).strip(),
+                    "ip": None,
+                    "first_seen": seen,
+                    "last_seen": seen
+                })
+                entry["first_seen"] = min(entry["first_seen"], seen)
+                
+                # IP do registro mais recente
+                if seen >= entry["last_seen"] or entry["ip"] is None:
+                    entry["last_seen"] = max(entry["last_seen"], seen)
+                    entry["ip"] = (record.values.get("device_ip") or "").strip() or entry["ip"]
+        
+        return index
+    
+    def run_device_diagnostic(self, days_back=7):
+        """Mostra os primeiros registros do bucket (só quando pedido pelo usuário)"""
+        st.info("🔍 Executando diagnóstico...")
+        diag_query = f'''
+        from(bucket: "{INFLUX_CONFIG['bucket']}")
+        |> range(start: -{days_back}d)
+        |> limit(n: 10)
+        |> keep(columns: ["_time", "_measurement", "_field", "_value"])
+        '''
+        
+        try:
+            diag_result = self.query_api.query(diag_query)
+            diag_data = []
+            for table in diag_result:
+                for record in table.records:
+                    diag_data.append({
+                        "time": record.get_time(),
+                        "measurement": record.get_measurement(),
+                        "field": record.get_field(),
+                        "value": record.get_value()
+                    })
+            
+            if diag_data:
+                st.write("**Dados encontrados no bucket:**")
+                diag_df = pd.DataFrame(diag_data)
+                st.dataframe(diag_df)
+            else:
+                st.error("❌ Nenhum dado encontrado no bucket")
+        except Exception as e:
+            st.error(f"❌ Erro no diagnóstico: {str(e)}")
+    
     def execute_custom_query(self, query):
         """
         Executa uma query Flux customizada
@@ -177,22 +322,10 @@ class StarlinkInfluxClient:
             Lista de DataFrames com os resultados
         """
         try:
-            result = self.query_api.query(query)
+            # Uma tabela por vez, já com colunas tipadas (sem FluxRecord)
             dataframes = []
-            
-            for table in result:
-                records = []
-                for record in table.records:
-                    records.append({
-                        '_time': record.get_time(),
-                        '_field': record.get_field(),
-                        '_value': record.get_value(),
-                        '_measurement': record.get_measurement(),
-                        **record.values
-                    })
-                
-                if records:
-                    df = pd.DataFrame(records)
+            for df in self.query_api.query_data_frame_stream(query):
+                if not df.empty:
                     dataframes.append(df)
             
             return dataframes
@@ -210,109 +343,212 @@ class StarlinkInfluxClient:
             max_gap_minutes: Gap máximo em minutos
         
         Returns:
-            DataFrame com dados processados
+            DataFrame com dados processados; a coluna segment numera os trechos
+            contínuos de cada dispositivo (nenhum registro é descartado)
         """
         try:
-            if not devices:
-                return pd.DataFrame()
+            df = self.fetch_throughput(devices, time_range)
             
-            # Gera query Flux
-            query = get_flux_query(devices, time_range)
-            
-            # Executa query
-            result = self.query_api.query(query)
-            
-            # Processa resultados extraindo throughput do JSON
-            data = []
-            
-            for table in result:
-                for record in table.records:
-                    try:
-                        timestamp = record.get_time()
-                        field = record.get_field()
-                        value = record.get_value()
-                        device = record.values.get("device") or record.values.get("device_name", "unknown")
-                        
-                        # Só processa se for status_json
-                        if field == "status_json" and value:
-                            # Extrai throughput do JSON
-                            throughput_data = self._extract_throughput_from_json(value)
-                            
-                            if throughput_data:
-                                data.append({
-                                    'timestamp': timestamp,
-                                    'device': device,
-                                    'downlink_bps': throughput_data.get('downlinkThroughputBps', 0),
-                                    'uplink_bps': throughput_data.get('uplinkThroughputBps', 0),
-                                    'downlink_mbps': throughput_data.get('downlinkThroughputBps', 0) / 1_000_000,
-                                    'uplink_mbps': throughput_data.get('uplinkThroughputBps', 0) / 1_000_000
-                                })
-                            
-                    except Exception as e:
-                        continue
-            
-            if not data:
-                return pd.DataFrame()
-            
-            df = pd.DataFrame(data)
-            df = df.sort_values('timestamp')
-            
-            # Remove gaps grandes
-            if len(df) > 1:
-                df['time_diff'] = df['timestamp'].diff()
-                df['gap_minutes'] = df['time_diff'].dt.total_seconds() / 60
-                df = df[df['gap_minutes'] <= max_gap_minutes]
-                df = df.drop(['time_diff', 'gap_minutes'], axis=1)
-            
-            return df
+            # Gaps grandes separam segmentos por dispositivo
+            return add_segments(df, max_gap_minutes)
             
         except Exception as e:
             st.error(f"❌ Erro ao buscar dados: {str(e)}")
             return pd.DataFrame()
     
+    def fetch_throughput(self, devices, time_range):
+        """
+        Busca o throughput bruto (sem filtro de gaps), ordenado por timestamp
+        
+        Args:
+            devices: Lista de dispositivos
+            time_range: Período de tempo (ex: "-24h", "-7d" ou "<início>Z")
+        
+        Returns:
+            DataFrame com timestamp, device e throughput; erros de query são propagados
+        """
+        if not devices:
+            return pd.DataFrame()
+        
+        if self.store is not None:
+            return self.store.read_range(devices, time_range, self._query_throughput)
+        
+        return self._query_throughput(devices, time_range)
+    
+    def _query_throughput(self, devices, time_range):
+        """
+        Busca o throughput bruto direto no InfluxDB, ordenado por timestamp
+        
+        A consulta é dividida em blocos dispositivo x fatia de tempo executados
+        em paralelo, para que a latência dependa do tamanho do bloco e não do
+        volume total.
+        """
+        chunks = self._plan_chunks(devices, time_range)
+        if len(chunks) == 1:
+            return self._query_chunk(*chunks[0])
+        
+        frames = list(_get_fanout_executor().map(lambda chunk: self._query_chunk(*chunk), chunks))
+        df = concat_throughput(frames)
+        if df.empty:
+            return df
+        
+        return df.sort_values('timestamp', kind='mergesort').reset_index(drop=True)
+    
+    def _plan_chunks(self, devices, time_range):
+        """
+        Divide a consulta em blocos (dispositivos, período)
+        
+        Returns:
+            Lista de tuplas (devices, time_range); um único bloco com a consulta
+            original quando não há o que dividir
+        """
+        now = datetime.now(timezone.utc)
+        try:
+            start, stop, _ = parse_time_range(time_range, now)
+        except ValueError:
+            return [(devices, time_range)]
+        
+        slice_length = timedelta(hours=FANOUT_CONFIG["slice_hours"])
+        if len(devices) == 1 and (stop or now) - start <= slice_length:
+            return [(devices, time_range)]
+        
+        slices = []
+        slice_start = start
+        while slice_start + slice_length < (stop or now):
+            slices.append(f"{format_flux_time(slice_start)}:{format_flux_time(slice_start + slice_length)}")
+            slice_start += slice_length
+        # Última fatia mantém o fim original (em aberto se não houver)
+        slices.append(f"{format_flux_time(slice_start)}:{format_flux_time(stop)}" if stop else format_flux_time(slice_start))
+        
+        return [([device], slice_range) for device in devices for slice_range in slices]
+    
+    def _query_chunk(self, devices, time_range):
+        """Executa um bloco com novas tentativas; roda em threads, sem chamadas ao Streamlit"""
+        for attempt in range(FANOUT_CONFIG["retries"] + 1):
+            try:
+                return self._query_single(devices, time_range)
+            except Exception:
+                if attempt == FANOUT_CONFIG["retries"]:
+                    raise
+                time.sleep(FANOUT_CONFIG["retry_backoff_seconds"] * 2 ** attempt)
+    
+    def _query_single(self, devices, time_range):
+        """
+        Uma única query ao InfluxDB, ordenada por timestamp
+        
+        O resultado é lido em streaming (query_csv) direto para colunas tipadas,
+        em lotes de INFLUX_CONFIG["stream_batch_rows"] linhas.
+        """
+        batch_rows = INFLUX_CONFIG["stream_batch_rows"]
+        df = None
+        
+        # Tenta primeiro a extração no servidor (só colunas numéricas)
+        if self.use_server_side_json:
+            try:
+                query = get_flux_query(devices, time_range, extract_throughput=True)
+                df = read_extracted_throughput(self.query_api.query_csv(query, dialect=CSV_DIALECT), batch_rows)
+            except Exception as e:
+                # Falhas de rede seguem para as novas tentativas de _query_chunk
+                if not _is_server_json_error(e):
+                    raise
+                # Registros antigos ou servidor sem suporte: esta query usa o parser Python
+                self._suspend_server_side_json(e)
+                df = None
+        
+        if df is None:
+            query = get_flux_query(devices, time_range)
+            df = read_json_throughput(self.query_api.query_csv(query, dialect=CSV_DIALECT),
+                                      self._extract_throughput_from_json, batch_rows)
+        
+        if df.empty:
+            return df
+        
+        return df.sort_values('timestamp', kind='mergesort').reset_index(drop=True)
+    
+    @property
+    def use_server_side_json(self):
+        """Extração no servidor ativa (configurada e não suspensa por erro recente do Flux)"""
+        return self.server_side_json and time.monotonic() >= self._server_json_retry_at
+    
+    def _suspend_server_side_json(self, error):
+        """Usa o parser Python por INFLUX_CONFIG["server_side_json_retry_seconds"] após erro do Flux"""
+        retry_seconds = INFLUX_CONFIG["server_side_json_retry_seconds"]
+        detail = f"HTTP {error.status}: {error.message}" if isinstance(error, ApiException) else repr(error)
+        if self.use_server_side_json:
+            logger.warning("Extração do status_json no servidor falhou; usando o parser Python por %ss: %s",
+                           retry_seconds, detail)
+        self._server_json_retry_at = time.monotonic() + retry_seconds
+    
     def _extract_throughput_from_json(self, json_value):
         """
         Extrai valores de throughput do JSON do status_json
         
         Args:
-            json_value: String JSON contendo dados do Starlink
+            json_value: String JSON (ou dict) contendo dados do Starlink
         
         Returns:
             Dict com downlinkThroughputBps e uplinkThroughputBps
         """
+        return self.decode_status_json(json_value)
+    
+    def get_chart_data(self, devices, time_range, pixel_width=None, fn=None, df=None):
+        """
+        Busca o throughput agregado por janela para gráficos
+        
+        A janela é derivada da duração do período e da largura do gráfico, então
+        o número de pontos fica limitado a cerca de um por pixel, qualquer que
+        seja o período. O consumo em GB não usa estes dados.
+        
+        Args:
+            devices: Lista de dispositivos
+            time_range: Período de tempo
+            pixel_width: Largura do gráfico em pixels (padrão: CHART_CONFIG)
+            fn: Agregação por janela, "mean" ou "max" (padrão: CHART_CONFIG)
+            df: Dados já carregados; se forem poucos, são usados sem agregar, e
+                servem de fallback quando o servidor não faz a extração
+        
+        Returns:
+            DataFrame com timestamp, device e throughput em bps e Mbps
+        """
+        if not devices:
+            return pd.DataFrame()
+        
+        pixel_width = pixel_width or CHART_CONFIG["pixel_width"]
+        fn = fn or CHART_CONFIG["aggregate"]
+        
+        # Poucos pontos: não há o que reduzir
+        if df is not None and len(df) <= pixel_width * len(devices):
+            return with_mbps(df)
+        
         try:
-            import json
-            
-            # Se já é um dict, usa diretamente
-            if isinstance(json_value, dict):
-                data = json_value
-            else:
-                # Se é string, faz parse
-                data = json.loads(json_value)
-            
-            # Extrai throughput do JSON aninhado
-            throughput = {}
-            
-            # Procura por downlinkThroughputBps e uplinkThroughputBps no JSON
-            if 'downlinkThroughputBps' in data:
-                throughput['downlinkThroughputBps'] = float(data['downlinkThroughputBps'])
-            elif 'dishGetStatus' in data and 'downlinkThroughputBps' in data['dishGetStatus']:
-                throughput['downlinkThroughputBps'] = float(data['dishGetStatus']['downlinkThroughputBps'])
-            
-            if 'uplinkThroughputBps' in data:
-                throughput['uplinkThroughputBps'] = float(data['uplinkThroughputBps'])
-            elif 'dishGetStatus' in data and 'uplinkThroughputBps' in data['dishGetStatus']:
-                throughput['uplinkThroughputBps'] = float(data['dishGetStatus']['uplinkThroughputBps'])
-            
-            return throughput
-            
-        except Exception as e:
-            return {}
+            every_seconds = get_chart_bucket_seconds(time_range, pixel_width)
+        except ValueError:
+            return with_mbps(df) if df is not None else pd.DataFrame()
+        
+        if self.use_server_side_json:
+            try:
+                query = get_chart_query(devices, time_range, every_seconds, fn)
+                rows = self.query_api.query_csv(query, dialect=CSV_DIALECT)
+                return with_mbps(read_extracted_throughput(rows, INFLUX_CONFIG["stream_batch_rows"]))
+            except Exception as e:
+                if _is_server_json_error(e):
+                    self._suspend_server_side_json(e)
+                elif time.monotonic() >= self._chart_warning_at:
+                    logger.warning("Gráfico agregado no InfluxDB falhou, agregando localmente: %r", e)
+                    self._chart_warning_at = time.monotonic() + INFLUX_CONFIG["server_side_json_retry_seconds"]
+        
+        # Sem extração no servidor: agrega localmente os dados completos
+        if df is None:
+            df = self.get_starlink_data(devices, time_range)
+        return aggregate_windows(df, every_seconds, fn)
     
     def get_daily_consumption(self, devices, time_range, max_gap_minutes=5):
         """
         Calcula consumo diário de dados baseado na diferença de tempo entre timestamps
         
+        Dias encerrados vêm dos rollups; dados brutos só são buscados para dias
+        ainda sem rollup, para o dia atual e para dias parciais do período.
+        
         Args:
             devices: Lista de dispositivos
             time_range: Período de tempo
@@ -322,75 +558,85 @@ class StarlinkInfluxClient:
             DataFrame com consumo diário por dispositivo
         """
         try:
-            # Busca dados brutos
-            df = self.get_starlink_data(devices, time_range, max_gap_minutes)
-            
-            if df.empty:
-                return pd.DataFrame()
-            
-            # Adiciona coluna de data
-            df['date'] = df['timestamp'].dt.date
-            
-            daily_data = []
-            
-            for device in df['device'].unique():
-                device_df = df[df['device'] == device].copy()
-                
-                for date in device_df['date'].unique():
-                    day_df = device_df[device_df['date'] == date].sort_values('timestamp')
-                    
-                    if len(day_df) < 2:
-                        continue
-                    
-                    day_download = 0
-                    day_upload = 0
-                    gaps = 0
-                    valid_intervals = 0
-                    
-                    # Calcula consumo baseado na diferença de tempo entre registros consecutivos
-                    for i in range(len(day_df) - 1):
-                        current = day_df.iloc[i]
-                        next_row = day_df.iloc[i + 1]
-                        
-                        # Calcula diferença de tempo em minutos
-                        time_diff = next_row['timestamp'] - current['timestamp']
-                        time_diff_minutes = time_diff.total_seconds() / 60
-                        
-                        # Se gap > 5 minutos, considera que não houve continuação de uso
-                        if time_diff_minutes > max_gap_minutes:
-                            gaps += 1
-                            continue
-                        
-                        # Calcula consumo baseado na velocidade média durante o intervalo
-                        time_diff_seconds = time_diff.total_seconds()
-                        
-                        # Usa a velocidade do registro atual para calcular consumo
-                        # Fórmula: (velocidade_bps * tempo_segundos) / 8 bits_por_byte / 1024^3 para GB
-                        download_gb = (current['downlink_bps'] * time_diff_seconds) / 8 / (1024 ** 3)
-                        upload_gb = (current['uplink_bps'] * time_diff_seconds) / 8 / (1024 ** 3)
-                        
-                        day_download += download_gb
-                        day_upload += upload_gb
-                        valid_intervals += 1
-                    
-                    daily_data.append({
-                        'date': date,
-                        'device': device,
-                        'device_name': get_device_display_name(device),
-                        'download_gb': round(day_download, 3),
-                        'upload_gb': round(day_upload, 3),
-                        'total_gb': round(day_download + day_upload, 3),
-                        'gaps': gaps,
-                        'valid_intervals': valid_intervals,
-                        'records': len(day_df)
-                    })
-            
-            return pd.DataFrame(daily_data).sort_values(['date', 'device'])
+            closed_days = self._closed_days(time_range) if self.rollups is not None else []
+            if not closed_days:
+                df = self.get_starlink_data(devices, time_range, max_gap_minutes)
+                return self.get_daily_consumption_from_df(df, max_gap_minutes)
+            
+            # Preenche os dias encerrados que ainda não têm rollup
+            missing = self.rollups.missing_days(devices, closed_days, max_gap_minutes)
+            for run_start, run_stop in _day_runs(missing):
+                df = self.get_starlink_data(devices, f"{format_flux_time(run_start)}:{format_flux_time(run_stop)}", max_gap_minutes)
+                daily = integrate_daily_usage(df, max_gap_minutes)
+                run_days = [day for day in missing if run_start.date() <= day < run_stop.date()]
+                self.rollups.write(daily[daily['date'].isin(run_days)], devices, run_days, max_gap_minutes)
+            
+            frames = [self.rollups.read(devices, closed_days, max_gap_minutes)]
+            
+            # Trechos fora dos dias encerrados (início parcial e dia atual)
+            now = datetime.now(timezone.utc)
+            start, stop, _ = parse_time_range(time_range, now)
+            stop = stop or now
+            for part_start, part_stop in ((start, _day_start(closed_days[0])),
+                                          (_day_start(closed_days[-1] + timedelta(days=1)), stop)):
+                if part_start < part_stop:
+                    df = self.get_starlink_data(devices, f"{format_flux_time(part_start)}:{format_flux_time(part_stop)}", max_gap_minutes)
+                    frames.append(integrate_daily_usage(df, max_gap_minutes))
+            
+            return _combine_daily(frames)
             
         except Exception as e:
             st.error(f"❌ Erro ao calcular consumo diário: {str(e)}")
             return pd.DataFrame()
     
+    def get_daily_consumption_from_df(self, df, max_gap_minutes=5, time_range=None):
+        """
+        Calcula consumo diário a partir de dados já carregados, sem nova query
+        
+        Com time_range, os dias encerrados cobertos pelo período são lidos dos
+        rollups (e gravados na primeira vez); só os demais dias são integrados.
+        
+        Args:
+            df: DataFrame retornado por get_starlink_data
+            max_gap_minutes: Gap máximo em minutos (padrão: 5)
+            time_range: Período usado para carregar df (opcional)
+        
+        Returns:
+            DataFrame com consumo diário por dispositivo
+        """
+        if df.empty:
+            return pd.DataFrame()
+        
+        closed_days = self._closed_days(time_range) if self.rollups is not None and time_range else []
+        if not closed_days:
+            return integrate_daily_usage(df, max_gap_minutes)
+        
+        devices = list(df['device'].unique())
+        dates = df['timestamp'].dt.date
+        
+        missing = self.rollups.missing_days(devices, closed_days, max_gap_minutes)
+        if missing:
+            daily = integrate_daily_usage(df[dates.isin(missing)], max_gap_minutes)
+            self.rollups.write(daily, devices, missing, max_gap_minutes)
+        
+        return _combine_daily([
+            self.rollups.read(devices, closed_days, max_gap_minutes),
+            integrate_daily_usage(df[~dates.isin(closed_days)], max_gap_minutes)
+        ])
+    
+    def _closed_days(self, time_range):
+        """Dias encerrados cobertos do início ao fim pelo período"""
+        now = datetime.now(timezone.utc)
+        try:
+            start, stop, _ = parse_time_range(time_range, now)
+        except ValueError:
+            return []
+        stop = stop or now
+        
+        first_day = start.date() if start == _day_start(start.date()) else start.date() + timedelta(days=1)
+        last_day = min(stop.date() - timedelta(days=1), get_last_closed_day(now))
+        return [first_day + timedelta(days=i) for i in range((last_day - first_day).days + 1)]
+    
     def get_device_summary(self, devices, time_range):
         """
         Retorna resumo dos dispositivos
@@ -404,35 +650,144 @@ class StarlinkInfluxClient:
         """
         try:
             df = self.get_starlink_data(devices, time_range)
-            
-            if df.empty:
-                return {}
-            
-            summary = {}
-            
-            for device in df['device'].unique():
-                device_df = df[df['device'] == device]
-                
-                if not device_df.empty:
-                    summary[device] = {
-                        'name': get_device_display_name(device),
-                        'total_records': len(device_df),
-                        'records': len(device_df),
-                        'period_start': device_df['timestamp'].min(),
-                        'period_end': device_df['timestamp'].max(),
-                        'avg_download_mbps': device_df['downlink_mbps'].mean(),
-                        'avg_upload_mbps': device_df['uplink_mbps'].mean(),
-                        'max_download_mbps': device_df['downlink_mbps'].max(),
-                        'max_upload_mbps': device_df['uplink_mbps'].max()
-                    }
-            
-            return summary
+            return self.get_device_summary_from_df(df)
             
         except Exception as e:
             st.error(f"❌ Erro ao gerar resumo: {str(e)}")
             return {}
     
+    def get_device_summary_from_df(self, df):
+        """
+        Retorna resumo dos dispositivos a partir de dados já carregados
+        
+        Args:
+            df: DataFrame retornado por get_starlink_data
+        
+        Returns:
+            Dict com resumo por dispositivo
+        """
+        if df.empty:
+            return {}
+        
+        summary = {}
+        
+        # Um único groupby em vez de filtrar o DataFrame por dispositivo
+        for device, device_df in df.groupby('device', sort=False, observed=True):
+            downlink = device_df['downlink_bps'].to_numpy(dtype='float64')
+            uplink = device_df['uplink_bps'].to_numpy(dtype='float64')
+            summary[device] = {
+                'name': get_device_display_name(device),
+                'total_records': len(device_df),
+                'records': len(device_df),
+                'period_start': device_df['timestamp'].min(),
+                'period_end': device_df['timestamp'].max(),
+                'avg_download_mbps': downlink.mean() / 1_000_000,
+                'avg_upload_mbps': uplink.mean() / 1_000_000,
+                'max_download_mbps': downlink.max() / 1_000_000,
+                'max_upload_mbps': uplink.max() / 1_000_000
+            }
+        
+        return summary
+    
+    def load_data(self, devices, time_range, max_gap_minutes=5):
+        """
+        Busca os dados uma única vez e devolve um resultado com as tabelas derivadas
+        
+        Args:
+            devices: Lista de dispositivos
+            time_range: Período de tempo
+            max_gap_minutes: Gap máximo em minutos
+        
+        Returns:
+            StarlinkDataResult com o DataFrame carregado
+        """
+        df = self.get_starlink_data(devices, time_range, max_gap_minutes)
+        return StarlinkDataResult(self, df, time_range, max_gap_minutes)
+    
     def close(self):
         """Fecha conexão com InfluxDB"""
         if self.client:
             self.client.close()
+            self.client = None
+            self.query_api = None
+
+# Pool limitado de threads compartilhado pelas sessões para as consultas em blocos
+_fanout_executor = None
+_fanout_executor_lock = threading.Lock()
+
+def _get_fanout_executor():
+    global _fanout_executor
+    
+    with _fanout_executor_lock:
+        if _fanout_executor is None:
+            _fanout_executor = ThreadPoolExecutor(max_workers=FANOUT_CONFIG["max_workers"],
+                                                  thread_name_prefix="influx-fanout")
+        return _fanout_executor
+
+def _is_server_json_error(error):
+    """
+    Erro da própria extração no servidor, e não falha transitória de rede
+
+    Query rejeitada pelo Flux (400), json.parse falhando nos registros ou
+    resultado sem as colunas extraídas.
+    """
+    if isinstance(error, ApiException):
+        message = str(getattr(error, 'message', '') or error.body or '')
+        return error.status == 400 or 'json' in message.lower()
+    return isinstance(error, (KeyError, ValueError))
+
+def _record_device(values):
+    """Identificador do dispositivo de um registro: tag device ou, sem ela, device_name"""
+    for column in ("device", "device_name"):
+        if values.get(column) and values[column].strip():
+            return values[column].strip()
+    return None
+
+def _day_start(day):
+    """Meia-noite (UTC) do dia"""
+    return datetime.combine(day, datetime.min.time(), tzinfo=timezone.utc)
+
+def _day_runs(days):
+    """Agrupa dias em sequências contínuas, devolvendo (início, fim exclusivo) de cada uma"""
+    runs = []
+    for day in sorted(days):
+        if runs and runs[-1][1] == _day_start(day):
+            runs[-1][1] = _day_start(day + timedelta(days=1))
+        else:
+            runs.append([_day_start(day), _day_start(day + timedelta(days=1))])
+    return [tuple(run) for run in runs]
+
+def _combine_daily(frames):
+    """Junta tabelas de consumo diário na ordem de integrate_daily_usage"""
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=DAILY_COLUMNS)
+    return pd.concat(frames, ignore_index=True).sort_values(['date', 'device']).reset_index(drop=True)
+
+# Cliente único do processo: todas as sessões do Streamlit compartilham o
+# mesmo pool HTTP em vez de abrir um InfluxDBClient por navegador
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+def get_shared_client():
+    """Retorna o StarlinkInfluxClient compartilhado pelo processo, criando-o se preciso"""
+    global _shared_client
+    
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = StarlinkInfluxClient()
+        elif _shared_client.client is None:
+            # Conexão anterior falhou ou foi fechada: tenta de novo
+            _shared_client.connect()
+        return _shared_client
+
+def close_shared_client():
+    """Fecha o cliente compartilhado (chamado no encerramento do processo)"""
+    global _shared_client
+    
+    with _shared_client_lock:
+        if _shared_client is not None:
+            _shared_client.close()
+            _shared_client = None
+
+atexit.register(close_shared_client)
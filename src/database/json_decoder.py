@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Decodificação do status_json para os dois valores de throughput
+
+Usado quando a extração no InfluxDB não é possível (ex: registros
+starlink_raw). Backends disponíveis:
+- prescan: lê downlinkThroughputBps/uplinkThroughputBps direto do texto,
+  sem montar o dict; se a chave se repetir ou o valor não for numérico,
+  usa o melhor parser completo. Supõe, como os documentos da antena, que as
+  chaves só aparecem no nível principal ou em dishGetStatus
+- orjson / simdjson: parsers rápidos, usados se estiverem instalados
+- json: biblioteca padrão
+"""
+
+import json
+import re
+import threading
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+THROUGHPUT_KEYS = ('downlinkThroughputBps', 'uplinkThroughputBps')
+
+_KEY_TOKENS = tuple((key, f'"{key}"') for key in THROUGHPUT_KEYS)
+_NUMBER = re.compile(r'\s*:\s*(-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)\s*[,}]')
+
+def _pick_throughput(data):
+    """Lê as chaves de throughput no nível principal ou em dishGetStatus"""
+    throughput = {}
+    for key in THROUGHPUT_KEYS:
+        if key in data:
+            throughput[key] = float(data[key])
+        elif 'dishGetStatus' in data and key in data['dishGetStatus']:
+            throughput[key] = float(data['dishGetStatus'][key])
+    return throughput
+
+def _full_decoder(loads):
+    def decode(json_value):
+        try:
+            # Se já é um dict, usa diretamente
+            data = json_value if isinstance(json_value, dict) else loads(json_value)
+            return _pick_throughput(data)
+        except Exception:
+            return {}
+    return decode
+
+_simdjson_local = threading.local()
+
+def _simdjson_loads(json_value):
+    # O parser do simdjson é reaproveitado por thread (não é thread-safe)
+    parser = getattr(_simdjson_local, 'parser', None)
+    if parser is None:
+        parser = _simdjson_local.parser = simdjson.Parser()
+    if isinstance(json_value, str):
+        json_value = json_value.encode()
+    return parser.parse(json_value)
+
+def _prescan_decoder(fallback):
+    def decode(json_value):
+        if not isinstance(json_value, (str, bytes)):
+            return fallback(json_value)
+        text = json_value.decode() if isinstance(json_value, bytes) else json_value
+
+        throughput = {}
+        for key, token in _KEY_TOKENS:
+            start = text.find(token)
+            if start < 0:
+                continue
+            end = start + len(token)
+            match = _NUMBER.match(text, end)
+            # Valor não numérico ou chave repetida (plano + aninhado): parse completo
+            if match is None or text.find(token, end) >= 0:
+                return fallback(json_value)
+            throughput[key] = float(match.group(1))
+        return throughput
+    return decode
+
+BACKENDS = {'json': _full_decoder(json.loads)}
+if orjson is not None:
+    BACKENDS['orjson'] = _full_decoder(orjson.loads)
+if simdjson is not None:
+    BACKENDS['simdjson'] = _full_decoder(_simdjson_loads)
+
+# Parser completo mais rápido instalado
+BEST_FULL_BACKEND = next(name for name in ('orjson', 'simdjson', 'json') if name in BACKENDS)
+BACKENDS['prescan'] = _prescan_decoder(BACKENDS[BEST_FULL_BACKEND])
+
+def get_json_decoder(name="auto"):
+    """
+    Retorna a função decode(json_value) -> dict com os valores de throughput
+
+    Args:
+        name: "auto" (prescan), "prescan", "orjson", "simdjson" ou "json";
+            backends não instalados caem no melhor parser disponível
+
+    Returns:
+        Função que devolve {'downlinkThroughputBps': ..., 'uplinkThroughputBps': ...}
+        com as chaves encontradas, ou {} se o JSON for inválido
+    """
+    if name in (None, "", "auto"):
+        name = "prescan"
+    return BACKENDS.get(name, BACKENDS[BEST_FULL_BACKEND])
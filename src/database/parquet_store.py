@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Armazenamento local em Parquet do throughput por dispositivo e dia
+
+Dias já encerrados ficam gravados em disco (um arquivo por dispositivo e
+dia) e só os dias ausentes ou ainda abertos são buscados no servidor. Cada
+arquivo guarda quando foi buscado: dias buscados antes de passar o prazo
+de envios atrasados (PARQUET_CONFIG["settle_hours"]) são provisórios e
+voltam a ser buscados depois de PARQUET_CONFIG["provisional_ttl_minutes"].
+
+Uso pela linha de comando:
+    python src/database/parquet_store.py info
+    python src/database/parquet_store.py prewarm --days 30 [--devices bitstar1 bitstar2]
+    python src/database/parquet_store.py purge [--devices bitstar1] [--before 2025-01-01]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+import pandas as pd
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'config'))
+from influx_config import PARQUET_CONFIG, parse_time_range, get_last_closed_day, format_flux_time
+from flux_stream import THROUGHPUT_COLUMNS, compact_throughput, concat_throughput, empty_throughput
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+# Metadado do arquivo com o instante (ISO, UTC) em que o dia foi buscado
+FETCHED_AT_KEY = b"starlink_fetched_at"
+
+def _day_start(day):
+    return pd.Timestamp(datetime.combine(day, datetime.min.time()), tz='UTC')
+
+class ParquetThroughputStore:
+    """
+    Cache em disco do throughput, particionado por dispositivo e dia:
+    <base_dir>/device=<id>/<AAAA-MM-DD>.parquet
+
+    Dias sem dados também são gravados (arquivo vazio) para não serem
+    buscados de novo, mas só depois de settle_hours do fim do dia. O tamanho
+    total é limitado; os arquivos lidos há mais tempo são removidos primeiro.
+    """
+
+    def __init__(self, base_dir=None, max_size_mb=None, settle_hours=None, provisional_ttl_minutes=None):
+        self.base_dir = base_dir or PARQUET_CONFIG["base_dir"]
+        self.max_bytes = (max_size_mb if max_size_mb is not None else PARQUET_CONFIG["max_size_mb"]) * 1024 * 1024
+        self.settle = pd.Timedelta(hours=settle_hours if settle_hours is not None else PARQUET_CONFIG["settle_hours"])
+        self.provisional_ttl = pd.Timedelta(minutes=provisional_ttl_minutes if provisional_ttl_minutes is not None
+                                            else PARQUET_CONFIG["provisional_ttl_minutes"])
+        self._lock = threading.Lock()
+
+    def day_path(self, device, day):
+        return os.path.join(self.base_dir, f"device={device}", f"{day.isoformat()}.parquet")
+
+    def has_day(self, device, day):
+        return os.path.exists(self.day_path(device, day))
+
+    def is_final(self, day, fetched_at):
+        """Dia buscado depois do prazo de envios atrasados: não muda mais"""
+        return fetched_at >= _day_start(day + timedelta(days=1)) + self.settle
+
+    def read_day(self, device, day, now=None):
+        """
+        Lê um dia do disco
+
+        Returns:
+            DataFrame do dia; None se o arquivo é provisório e venceu (ou não
+            tem o instante da busca) e o dia deve ser buscado de novo. Levanta
+            FileNotFoundError se o arquivo não existe.
+        """
+        path = self.day_path(device, day)
+        table = pq.read_table(path)
+
+        fetched_at = (table.schema.metadata or {}).get(FETCHED_AT_KEY)
+        if fetched_at is None:
+            return None
+        fetched_at = pd.Timestamp(fetched_at.decode())
+        now = pd.Timestamp(now or datetime.now(timezone.utc))
+        if not self.is_final(day, fetched_at) and now - fetched_at >= self.provisional_ttl:
+            return None
+
+        df = compact_throughput(table.to_pandas())
+        # Marca como usado recentemente (critério de remoção)
+        os.utime(path, None)
+        return df
+
+    def write_day(self, device, day, df, fetched_at):
+        """
+        Grava os dados de um dispositivo em um dia encerrado (substituição atômica)
+
+        Args:
+            fetched_at: Instante (UTC) em que a consulta ao InfluxDB começou
+        """
+        path = self.day_path(device, day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        table = pa.Table.from_pandas(df[THROUGHPUT_COLUMNS].reset_index(drop=True), preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[FETCHED_AT_KEY] = pd.Timestamp(fetched_at).isoformat().encode()
+
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        pq.write_table(table.replace_schema_metadata(metadata), tmp_path)
+        os.replace(tmp_path, path)
+
+    def read_range(self, devices, time_range, fetch):
+        """
+        Lê o período combinando o disco com o InfluxDB
+
+        Args:
+            devices: Lista de dispositivos
+            time_range: Período de tempo (ex: "-30d" ou "<início>Z:<fim>Z")
+            fetch: Função fetch(devices, time_range) -> DataFrame que consulta o InfluxDB
+
+        Returns:
+            DataFrame bruto ordenado por timestamp
+        """
+        now = datetime.now(timezone.utc)
+        start, stop, _ = parse_time_range(time_range, now)
+        start = pd.Timestamp(start)
+        stop = pd.Timestamp(stop or now)
+
+        last_closed = get_last_closed_day(now)
+        first_day = start.date()
+        last_day = min(stop.date(), last_closed)
+
+        frames = []
+        if first_day <= last_day:
+            days = [first_day + timedelta(days=i) for i in range((last_day - first_day).days + 1)]
+            missing = {}
+            for day in days:
+                for device in devices:
+                    try:
+                        frame = self.read_day(device, day, now)
+                    except FileNotFoundError:
+                        # Ausente ou removido por evict/purge de outra sessão: busca de novo
+                        frame = None
+                    if frame is None:
+                        missing.setdefault(day, []).append(device)
+                    else:
+                        frames.append(frame)
+
+            frames.extend(self._fetch_missing_days(missing, fetch))
+            self.evict()
+
+        # Parte ainda aberta (hoje) vem direto do InfluxDB
+        open_start = max(start, _day_start(last_closed + timedelta(days=1)))
+        if open_start < stop:
+            frames.append(fetch(devices, f"{format_flux_time(open_start)}:{format_flux_time(stop)}"))
+
+        df = concat_throughput(frames)
+        if df.empty:
+            return df
+
+        df = df[(df['timestamp'] >= start) & (df['timestamp'] <= stop)]
+        return df.sort_values('timestamp', kind='mergesort').reset_index(drop=True)
+
+    def _fetch_missing_days(self, missing, fetch):
+        """
+        Busca no InfluxDB os dias encerrados que não estão em disco e os grava
+
+        Args:
+            missing: Dict dia -> dispositivos sem arquivo nesse dia
+            fetch: Função de consulta ao InfluxDB (ver read_range)
+
+        Returns:
+            Lista de DataFrames buscados (usados direto, sem reler o disco)
+        """
+        by_devices = {}
+        for day, missing_devices in missing.items():
+            by_devices.setdefault(tuple(missing_devices), []).append(day)
+
+        frames = []
+        for missing_devices, missing_days in by_devices.items():
+            # Uma query por sequência contínua de dias
+            for run in self._contiguous_runs(missing_days):
+                run_start = _day_start(run[0])
+                run_stop = _day_start(run[-1] + timedelta(days=1))
+                fetched_at = pd.Timestamp.now(tz='UTC')
+                df = fetch(list(missing_devices), f"{format_flux_time(run_start)}:{format_flux_time(run_stop)}")
+
+                if df.empty:
+                    df = empty_throughput()
+                frames.append(df)
+
+                df_days = df['timestamp'].dt.date
+                for device in missing_devices:
+                    device_mask = df['device'] == device
+                    for day in run:
+                        day_df = df[device_mask & (df_days == day)]
+                        # Dia vazio só vira marcador depois do prazo de envios atrasados
+                        if day_df.empty and not self.is_final(day, fetched_at):
+                            continue
+                        self.write_day(device, day, day_df, fetched_at)
+        return frames
+
+    @staticmethod
+    def _contiguous_runs(days):
+        runs = []
+        for day in sorted(days):
+            if runs and runs[-1][-1] + timedelta(days=1) == day:
+                runs[-1].append(day)
+            else:
+                runs.append([day])
+        return runs
+
+    def _files(self):
+        if not os.path.isdir(self.base_dir):
+            return []
+
+        files = []
+        for root, _, names in os.walk(self.base_dir):
+            for name in names:
+                if name.endswith('.parquet'):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def size_bytes(self):
+        return sum(size for _, size, _ in self._files())
+
+    def evict(self):
+        """Remove os arquivos usados há mais tempo até respeitar o limite de tamanho"""
+        with self._lock:
+            files = sorted(self._files())
+            total = sum(size for _, size, _ in files)
+            for _, size, path in files:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except FileNotFoundError:
+                    pass
+
+    def purge(self, devices=None, before=None):
+        """
+        Remove arquivos do cache
+
+        Args:
+            devices: Só destes dispositivos (todos se None)
+            before: Só dias anteriores a esta data (todos se None)
+
+        Returns:
+            Número de arquivos removidos
+        """
+        removed = 0
+        for _, _, path in self._files():
+            device = os.path.basename(os.path.dirname(path)).replace('device=', '', 1)
+            day = date.fromisoformat(os.path.basename(path)[:-len('.parquet')])
+            if devices and device not in devices:
+                continue
+            if before and day >= before:
+                continue
+            os.remove(path)
+            removed += 1
+        return removed
+
+def main():
+    parser = argparse.ArgumentParser(description="Cache Parquet de throughput Starlink")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    prewarm = subparsers.add_parser("prewarm", help="Baixa dias encerrados para o disco")
+    prewarm.add_argument("--days", type=int, default=30, help="Quantidade de dias (padrão: 30)")
+    prewarm.add_argument("--devices", nargs="*", help="Dispositivos (padrão: todos encontrados)")
+
+    purge = subparsers.add_parser("purge", help="Remove arquivos do cache")
+    purge.add_argument("--devices", nargs="*", help="Dispositivos (padrão: todos)")
+    purge.add_argument("--before", type=date.fromisoformat, help="Remove só dias anteriores (AAAA-MM-DD)")
+
+    subparsers.add_parser("info", help="Mostra o tamanho do cache")
+
+    args = parser.parse_args()
+    store = ParquetThroughputStore()
+
+    if args.command == "info":
+        files = store._files()
+        print(f"📁 {store.base_dir}: {len(files)} arquivo(s), {store.size_bytes() / 1024 / 1024:.1f} MB")
+    elif args.command == "purge":
+        removed = store.purge(args.devices, args.before)
+        print(f"🗑️ {removed} arquivo(s) removido(s)")
+    elif args.command == "prewarm":
+        if not PARQUET_AVAILABLE:
+            print("❌ pyarrow não instalado: pip install pyarrow")
+            return 1
+
+        from influx_client import StarlinkInfluxClient
+        client = StarlinkInfluxClient()
+        devices = args.devices or client.get_available_devices(args.days)
+        if not devices:
+            print("⚠️ Nenhum dispositivo encontrado")
+            return 1
+
+        started = time.perf_counter()
+        last_closed = get_last_closed_day()
+        first_day = last_closed - timedelta(days=args.days - 1)
+        time_range = f"{format_flux_time(_day_start(first_day))}:{format_flux_time(_day_start(last_closed + timedelta(days=1)))}"
+        df = store.read_range(devices, time_range, client._query_throughput)
+        client.close()
+
+        print(f"✅ {len(devices)} dispositivo(s), {args.days} dia(s), {len(df)} registros "
+              f"em {time.perf_counter() - started:.1f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
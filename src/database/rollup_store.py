@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Consumo diário materializado (rollups) dos dias encerrados
+
+Dias passados não mudam: o consumo de cada (dispositivo, dia, gap máximo) é
+calculado uma vez a partir dos dados brutos e gravado em SQLite. Só dias
+parciais (início do período) e o dia atual são recalculados a cada consulta.
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+from datetime import date
+import pandas as pd
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'config'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'analysis'))
+from influx_config import ROLLUP_CONFIG, get_device_display_name
+from consumption import DAILY_COLUMNS
+
+# Incrementar quando o cálculo do consumo mudar, invalidando os rollups gravados
+ROLLUP_VERSION = 2
+
+ROLLUP_VALUES = ['download_gb', 'upload_gb', 'total_gb', 'gaps', 'valid_intervals', 'records']
+
+class DailyRollupStore:
+    """
+    Tabela SQLite com uma linha por (dispositivo, dia, gap máximo)
+
+    Dias sem registros suficientes também são gravados (records < 2) para não
+    serem recalculados; eles são omitidos na leitura, como em integrate_daily_usage.
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or ROLLUP_CONFIG["db_path"]
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+
+        # Uma conexão compartilhada pelas sessões, serializada pelo lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS daily_rollups_v{ROLLUP_VERSION} (
+                device TEXT NOT NULL,
+                date TEXT NOT NULL,
+                max_gap REAL NOT NULL,
+                download_gb REAL NOT NULL,
+                upload_gb REAL NOT NULL,
+                total_gb REAL NOT NULL,
+                gaps INTEGER NOT NULL,
+                valid_intervals INTEGER NOT NULL,
+                records INTEGER NOT NULL,
+                PRIMARY KEY (device, date, max_gap)
+            )
+        """)
+        self._conn.commit()
+
+    @property
+    def _table(self):
+        return f"daily_rollups_v{ROLLUP_VERSION}"
+
+    def missing_days(self, devices, days, max_gap_minutes):
+        """
+        Retorna os dias que ainda não têm rollup para algum dos dispositivos
+
+        Returns:
+            Lista ordenada de datas
+        """
+        if not devices or not days:
+            return []
+
+        stored = self._stored_keys(devices, days, max_gap_minutes)
+        return [day for day in days if any((device, day.isoformat()) not in stored for device in devices)]
+
+    def _stored_keys(self, devices, days, max_gap_minutes):
+        placeholders = ','.join('?' * len(devices))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT device, date FROM {self._table} "
+                f"WHERE max_gap = ? AND date BETWEEN ? AND ? AND device IN ({placeholders})",
+                [float(max_gap_minutes), min(days).isoformat(), max(days).isoformat(), *devices]
+            ).fetchall()
+        return set(rows)
+
+    def read(self, devices, days, max_gap_minutes):
+        """
+        Lê os rollups dos dispositivos nos dias informados
+
+        Returns:
+            DataFrame com as colunas de integrate_daily_usage
+        """
+        if not devices or not days:
+            return pd.DataFrame(columns=DAILY_COLUMNS)
+
+        placeholders = ','.join('?' * len(devices))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT date, device, {', '.join(ROLLUP_VALUES)} FROM {self._table} "
+                f"WHERE max_gap = ? AND date BETWEEN ? AND ? AND device IN ({placeholders}) AND records >= 2",
+                [float(max_gap_minutes), min(days).isoformat(), max(days).isoformat(), *devices]
+            ).fetchall()
+
+        wanted = {day.isoformat() for day in days}
+        rows = [row for row in rows if row[0] in wanted]
+        if not rows:
+            return pd.DataFrame(columns=DAILY_COLUMNS)
+
+        daily = pd.DataFrame(rows, columns=['date', 'device', *ROLLUP_VALUES])
+        daily['date'] = [date.fromisoformat(day) for day in daily['date']]
+        names = {device: get_device_display_name(device) for device in daily['device'].unique()}
+        daily['device_name'] = daily['device'].map(names)
+        return daily[DAILY_COLUMNS]
+
+    def write(self, daily, devices, days, max_gap_minutes):
+        """
+        Grava o consumo calculado para dias encerrados
+
+        Args:
+            daily: Resultado de integrate_daily_usage restrito a esses dias
+            devices: Dispositivos consultados (os sem linha em daily ficam com zero)
+            days: Dias encerrados cobertos integralmente pelos dados
+            max_gap_minutes: Gap máximo usado no cálculo
+        """
+        if not devices or not days:
+            return
+
+        computed = {}
+        for row in daily.itertuples(index=False):
+            computed[(row.device, row.date)] = (row.download_gb, row.upload_gb, row.total_gb,
+                                                int(row.gaps), int(row.valid_intervals), int(row.records))
+
+        rows = []
+        for device in devices:
+            for day in days:
+                values = computed.get((device, day), (0.0, 0.0, 0.0, 0, 0, 0))
+                rows.append((device, day.isoformat(), float(max_gap_minutes), *values))
+
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {self._table} "
+                f"(device, date, max_gap, {', '.join(ROLLUP_VALUES)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def purge(self, devices=None):
+        """Remove rollups (de todos os dispositivos se devices for None)"""
+        with self._lock:
+            if devices:
+                placeholders = ','.join('?' * len(devices))
+                self._conn.execute(f"DELETE FROM {self._table} WHERE device IN ({placeholders})", list(devices))
+            else:
+                self._conn.execute(f"DELETE FROM {self._table}")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
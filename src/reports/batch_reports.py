@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Geração em lote dos relatórios PDF de um período de faturamento
+
+Gera um relatório por dispositivo e um da frota em uma execução:
+- os dados de todos os dispositivos são buscados uma vez (a busca já divide
+  em blocos paralelos e usa o cache Parquet) e separados com um groupby;
+- o consumo diário é calculado uma vez para a frota (lendo e gravando os
+  rollups) e compartilhado pelos relatórios de cada dispositivo;
+- os PDFs são renderizados em paralelo em processos separados, um por núcleo.
+
+Uso:
+    python src/reports/batch_reports.py --month 2025-01
+    python src/reports/batch_reports.py --start 2025-01-01 --end 2025-01-31 [--devices bit1015star ...]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta, timezone
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'config'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'database'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'analysis'))
+from influx_config import REPORT_CONFIG, format_flux_time, get_device_display_name
+
+def billing_period(month=None, start=None, end=None):
+    """
+    Período de faturamento em UTC
+
+    Args:
+        month: Mês "AAAA-MM" (tem prioridade sobre start/end)
+        start, end: Primeiro e último dia (inclusive)
+
+    Returns:
+        Tupla (início, fim exclusivo) em datetimes UTC
+    """
+    if month:
+        first_day = datetime.strptime(month, "%Y-%m").date()
+        last_day = (first_day.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    else:
+        first_day, last_day = start, end
+
+    start_time = datetime.combine(first_day, datetime.min.time(), tzinfo=timezone.utc)
+    stop_time = datetime.combine(last_day + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+    return start_time, stop_time
+
+def render_report(name, output_path, df, daily_df, file_info, total_usage, chart_df, chart_backend):
+    """
+    Gera um PDF (executado nos processos do pool)
+
+    Returns:
+        Tupla (nome, caminho, segundos)
+    """
+    from pdf_generator import generate_pdf_report
+
+    started = time.perf_counter()
+    generate_pdf_report(df, daily_df, file_info, total_usage, output_path, chart_df, chart_backend)
+    return name, output_path, time.perf_counter() - started
+
+def _usage_info(usage):
+    download_gb, upload_gb, gaps, _ = usage
+    return {'download_gb': download_gb, 'upload_gb': upload_gb, 'total_gb': download_gb + upload_gb, 'gaps': gaps}
+
+def build_tasks(data, period_label, output_dir, chart_backend=None, fleet=True):
+    """
+    Monta os argumentos de render_report para cada dispositivo e para a frota
+
+    Args:
+        data: StarlinkDataResult com todos os dispositivos do período
+
+    Returns:
+        Lista de tuplas de argumentos de render_report
+    """
+    from consumption import integrate_usage
+
+    df = data.mbps
+    daily_df = data.daily
+    chart_df = data.chart(REPORT_CONFIG["throughput_chart_width"])
+
+    # Um groupby por tabela; cada relatório recebe só as linhas do seu dispositivo
+    device_frames = dict(tuple(df.groupby('device', sort=True, observed=True)))
+    device_daily = dict(tuple(daily_df.groupby('device', sort=False))) if not daily_df.empty else {}
+    device_charts = dict(tuple(chart_df.groupby('device', sort=False, observed=True))) if not chart_df.empty else {}
+
+    tasks = []
+    for device, device_df in device_frames.items():
+        name = get_device_display_name(device)
+        file_info = {'filename': f"Dispositivo: {name}", 'period': period_label, 'total_records': len(device_df)}
+        usage = integrate_usage(device_df, data.max_gap_minutes)
+        tasks.append((name, os.path.join(output_dir, f"starlink_{device}.pdf"), device_df,
+                      device_daily.get(device, daily_df.iloc[:0]), file_info, _usage_info(usage),
+                      device_charts.get(device), chart_backend))
+
+    if fleet and len(device_frames) > 1:
+        names = [get_device_display_name(device) for device in device_frames]
+        file_info = {'filename': f"Frota: {', '.join(names)}", 'period': period_label, 'total_records': len(df)}
+        tasks.append(("Frota", os.path.join(output_dir, "starlink_frota.pdf"), df, daily_df, file_info,
+                      _usage_info(data.usage), chart_df, chart_backend))
+    return tasks
+
+def main():
+    parser = argparse.ArgumentParser(description="Relatórios PDF em lote por dispositivo e da frota")
+    period = parser.add_mutually_exclusive_group(required=True)
+    period.add_argument("--month", help="Mês de faturamento (AAAA-MM)")
+    period.add_argument("--start", type=date.fromisoformat, help="Primeiro dia (AAAA-MM-DD); exige --end")
+    parser.add_argument("--end", type=date.fromisoformat, help="Último dia, inclusive (AAAA-MM-DD)")
+    parser.add_argument("--devices", nargs="*", help="Dispositivos (padrão: todos com dados no período)")
+    parser.add_argument("--max-gap", type=float, default=5, help="Gap máximo em minutos (padrão: 5)")
+    parser.add_argument("--output-dir", help="Pasta dos PDFs (padrão: reports/<período>)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Processos de renderização (padrão: núcleos)")
+    parser.add_argument("--chart-backend", help="Backend dos gráficos: auto, matplotlib ou kaleido")
+    parser.add_argument("--no-fleet", action="store_true", help="Não gera o relatório da frota")
+    args = parser.parse_args()
+
+    if args.start and not args.end:
+        parser.error("--start exige --end")
+
+    start_time, stop_time = billing_period(args.month, args.start, args.end)
+    time_range = f"{format_flux_time(start_time)}:{format_flux_time(stop_time)}"
+    period_label = f"{start_time:%d/%m/%Y} - {stop_time - timedelta(days=1):%d/%m/%Y}"
+    output_dir = args.output_dir or os.path.join("reports", args.month or f"{args.start}_{args.end}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    from influx_client import StarlinkInfluxClient
+
+    timings = {}
+    started = time.perf_counter()
+
+    client = StarlinkInfluxClient()
+    devices = args.devices or client.get_available_devices(custom_time_range=time_range)
+    if not devices:
+        print("⚠️ Nenhum dispositivo encontrado no período")
+        return 1
+
+    print(f"📡 {len(devices)} dispositivo(s), período {period_label}")
+
+    # Busca única de todos os dispositivos
+    step = time.perf_counter()
+    data = client.load_data(devices, time_range, args.max_gap)
+    timings["Busca no InfluxDB"] = time.perf_counter() - step
+    if data.empty:
+        print("⚠️ Nenhum dado no período")
+        client.close()
+        return 1
+    print(f"📥 {len(data.df):,} registros em {timings['Busca no InfluxDB']:.1f}s")
+
+    # Consumo diário (rollups) e gráficos agregados calculados uma vez para todos os relatórios
+    step = time.perf_counter()
+    tasks = build_tasks(data, period_label, output_dir, args.chart_backend, fleet=not args.no_fleet)
+    timings["Consumo diário e gráficos"] = time.perf_counter() - step
+    client.close()
+
+    missing = sorted(set(devices) - set(data.df['device'].unique()))
+    if missing:
+        print(f"⚠️ Sem dados no período: {', '.join(missing)}")
+
+    # Processos novos (spawn): não herdam as threads e conexões do cliente
+    workers = max(1, min(args.workers, len(tasks)))
+    print(f"📄 Gerando {len(tasks)} relatório(s) em {workers} processo(s)...")
+
+    step = time.perf_counter()
+    render_seconds = 0.0
+    failed = 0
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = {executor.submit(render_report, *task): task[0] for task in tasks}
+        for done, future in enumerate(as_completed(futures), start=1):
+            try:
+                name, path, seconds = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"  [{done}/{len(tasks)}] ❌ {futures[future]}: {e}")
+                continue
+            render_seconds += seconds
+            print(f"  [{done}/{len(tasks)}] ✅ {name} ({seconds:.1f}s) -> {path}")
+    timings["Renderização dos PDFs"] = time.perf_counter() - step
+
+    total = time.perf_counter() - started
+    print("\n⏱️ Resumo")
+    for label, seconds in timings.items():
+        print(f"  {label:<28} {seconds:>7.1f}s")
+    print(f"  {'Soma das renderizações':<28} {render_seconds:>7.1f}s "
+          f"({render_seconds / max(timings['Renderização dos PDFs'], 1e-9):.1f}x em paralelo)")
+    print(f"  {'Total':<28} {total:>7.1f}s")
+    print(f"\n{'✅' if not failed else '⚠️'} {len(tasks) - failed}/{len(tasks)} relatório(s) em {output_dir}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
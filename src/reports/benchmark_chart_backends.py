@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos backends de gráficos do relatório PDF
+
+Desenha os cinco gráficos de um relatório (throughput, consumo diário,
+acumulado e duas distribuições) com dados sintéticos em cada backend
+instalado. A primeira rodada inclui o custo de inicialização (imports e, no
+kaleido, abrir o navegador); as seguintes mostram o custo por relatório.
+
+Uso:
+    python src/reports/benchmark_chart_backends.py [--days 7] [--interval 10] [--repeat 3]
+"""
+
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from pdf_generator import CHART_BACKENDS, get_chart_backend
+
+def make_report_data(days, interval_seconds, seed=42):
+    """Throughput de um dispositivo (com um gap) e a tabela diária correspondente"""
+    rng = np.random.default_rng(seed)
+    timestamps = pd.date_range(end=pd.Timestamp.now(tz="UTC").floor("D"), periods=days * 86400 // interval_seconds,
+                               freq=f"{interval_seconds}s")
+    # Gap de 2 horas no meio do período
+    middle = len(timestamps) // 2
+    timestamps = timestamps.delete(slice(middle, middle + 7200 // interval_seconds))
+
+    df = pd.DataFrame({
+        'timestamp': timestamps,
+        'device': pd.Categorical(['bit1015star'] * len(timestamps)),
+        'segment': (np.arange(len(timestamps)) >= middle).astype(np.int64),
+        'downlink_bps': rng.gamma(2.0, 25e6, len(timestamps)),
+        'uplink_bps': rng.gamma(2.0, 2.5e6, len(timestamps)),
+    })
+    df['downlink_mbps'] = df['downlink_bps'] / 1_000_000
+    df['uplink_mbps'] = df['uplink_bps'] / 1_000_000
+
+    daily_df = pd.DataFrame({'date': pd.date_range(timestamps[0].normalize(), periods=days, freq="D").date})
+    daily_df['download_gb'] = rng.uniform(5, 40, days)
+    daily_df['upload_gb'] = rng.uniform(0.5, 4, days)
+    daily_df['total_gb'] = daily_df['download_gb'] + daily_df['upload_gb']
+    return df, daily_df
+
+def report_charts(df, daily_df):
+    """Os mesmos pedidos de gráfico que generate_pdf_report faz"""
+    return {
+        'throughput': ('throughput', (df, "Throughput em Tempo Real")),
+        'daily': ('daily', (daily_df, "Consumo Diário de Dados")),
+        'cumulative': ('cumulative', (daily_df, "Consumo Acumulado")),
+        'download_distribution': ('distribution', (df, 'downlink_mbps', 'Distribuição Download (Mbps)', 'blue')),
+        'upload_distribution': ('distribution', (df, 'uplink_mbps', 'Distribuição Upload (Mbps)', 'red')),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos backends de gráficos do PDF")
+    parser.add_argument("--days", type=int, default=7, help="Dias de dados sintéticos (padrão: 7)")
+    parser.add_argument("--interval", type=int, default=10, help="Segundos entre registros (padrão: 10)")
+    parser.add_argument("--repeat", type=int, default=3, help="Relatórios após o primeiro; vale o mais rápido (padrão: 3)")
+    args = parser.parse_args()
+
+    df, daily_df = make_report_data(args.days, args.interval)
+    charts = report_charts(df, daily_df)
+    print(f"📊 {len(df):,} registros, {len(daily_df)} dias, {len(charts)} gráficos por relatório")
+    print(f"🔧 Backend escolhido no modo auto: {get_chart_backend('auto').name}")
+
+    for name, backend_class in CHART_BACKENDS.items():
+        if not backend_class.available():
+            print(f"  {name:<12} não instalado")
+            continue
+        backend = backend_class()
+
+        started = time.perf_counter()
+        pngs = backend.render(charts)
+        first = time.perf_counter() - started
+
+        failed = [chart for chart, png in pngs.items() if png is None]
+        if failed:
+            print(f"  {name:<12} falhou ({', '.join(failed)})")
+            continue
+
+        best = float("inf")
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            backend.render(charts)
+            best = min(best, time.perf_counter() - started)
+
+        size_kb = sum(len(png) for png in pngs.values()) / 1024
+        print(f"  {name:<12} primeiro relatório {first * 1000:>7.0f} ms   "
+              f"seguintes {best * 1000:>7.0f} ms   PNGs {size_kb:.0f} KB")
+
+if __name__ == "__main__":
+    main()
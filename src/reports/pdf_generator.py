@@ -3,106 +3,318 @@
 Gerador de Relatórios PDF para Análise de Dados Starlink
 """
 
+import asyncio
+import atexit
+import importlib.util
 import io
-import base64
+import threading
 from datetime import datetime
+from functools import cached_property
 from typing import Dict, List, Optional
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 from reportlab.lib.pagesizes import A4, letter
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image, PageBreak
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, LongTable, TableStyle, Image, PageBreak
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 import plotly.graph_objects as go
 import plotly.io as pio
-from plotly.utils import PlotlyJSONEncoder
-import json
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'config'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'analysis'))
+from influx_config import CHART_CONFIG, REPORT_CONFIG, get_chart_bucket_seconds, format_flux_time, get_device_display_name
+from downsampling import aggregate_windows, lttb
 
-class StarlinkPDFGenerator:
-    def __init__(self):
-        self.styles = getSampleStyleSheet()
-        self.setup_custom_styles()
+# Largura (px) do gráfico de throughput do relatório
+THROUGHPUT_CHART_WIDTH = REPORT_CONFIG["throughput_chart_width"]
+
+# Linhas por LongTable da tabela diária: blocos menores mantêm o layout do reportlab linear
+DAILY_TABLE_CHUNK_ROWS = 250
+
+DAILY_TABLE_HEADER = ['Data', 'Download (GB)', 'Upload (GB)', 'Total (GB)', 'Gaps', 'Registros']
+# Larguras fixas (pt): todos os blocos alinham e o reportlab não mede cada célula
+DAILY_TABLE_COL_WIDTHS = [75, 80, 80, 80, 50, 65]
+
+FLEET_TABLE_HEADER = ['Dispositivo', 'Download (GB)', 'Upload (GB)', 'Total (GB)', 'Gaps', 'Registros', 'Down médio', 'Down máx.']
+FLEET_TABLE_COL_WIDTHS = [90, 55, 55, 55, 35, 50, 55, 55]
+
+DAILY_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('FONTSIZE', (0, 1), (-1, -1), 8),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+
+class KaleidoRenderer:
+    """
+    Converte figuras Plotly em PNG com um navegador do kaleido mantido aberto
+    
+    pio.to_image abre um navegador a cada figura. Aqui um Kaleido com várias
+    abas roda em um loop asyncio em thread própria, é aberto na primeira
+    renderização e reaproveitado pelos relatórios seguintes; as figuras de um
+    relatório são enviadas juntas e renderizadas em paralelo, uma por aba.
+    
+    Cada navegador conta as renderizações em andamento. Depois de uma falha,
+    os relatórios seguintes abrem um navegador novo, e o antigo só é fechado
+    quando a última renderização que o usa termina.
+    """
+    
+    def __init__(self, tabs=None, timeout_seconds=None):
+        self.tabs = tabs or REPORT_CONFIG["render_tabs"]
+        self.timeout_seconds = timeout_seconds or REPORT_CONFIG["render_timeout_seconds"]
+        self._lock = threading.Lock()
+        self._browser = None  # (Kaleido, loop) usado pelas próximas renderizações
+        self._in_flight = {}  # (Kaleido, loop) -> renderizações em andamento
+        self._unavailable = False
+    
+    def _acquire(self):
+        """Navegador para uma renderização (aberto na primeira chamada); None se não for possível"""
+        with self._lock:
+            if self._browser is None:
+                if self._unavailable:
+                    return None
+                
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="kaleido-renderer", daemon=True).start()
+                try:
+                    kaleido = asyncio.run_coroutine_threadsafe(self._start(), loop).result(self.timeout_seconds)
+                except Exception as e:
+                    # Sem navegador (ex: Chrome ausente): cada figura passa por pio.to_image
+                    print(f"Kaleido persistente indisponível, usando pio.to_image: {e}")
+                    loop.call_soon_threadsafe(loop.stop)
+                    self._unavailable = True
+                    return None
+                self._browser = (kaleido, loop)
+            
+            browser = self._browser
+            self._in_flight[browser] = self._in_flight.get(browser, 0) + 1
+            return browser
+    
+    def _release(self, browser, failed):
+        """Fim de uma renderização; fecha o navegador substituído quando ninguém mais o usa"""
+        with self._lock:
+            self._in_flight[browser] -= 1
+            # Navegador possivelmente travado ou encerrado: a próxima renderização abre outro
+            if failed and self._browser is browser:
+                self._browser = None
+            if self._browser is not browser and not self._in_flight[browser]:
+                del self._in_flight[browser]
+                self._shutdown(browser)
+    
+    async def _start(self):
+        import kaleido
+        browser = kaleido.Kaleido(n=self.tabs)
+        await browser.open()
+        return browser
+    
+    def render(self, figures):
+        """
+        Renderiza as figuras em paralelo
         
-    def setup_custom_styles(self):
-        """Configura estilos personalizados para o PDF."""
-        # Título principal
-        self.styles.add(ParagraphStyle(
-            name='CustomTitle',
-            parent=self.styles['Title'],
-            fontSize=24,
-            spaceAfter=30,
-            alignment=TA_CENTER,
-            textColor=colors.darkblue
-        ))
+        Args:
+            figures: Lista de (figura, largura, altura)
         
-        # Subtítulo
-        self.styles.add(ParagraphStyle(
-            name='CustomHeading1',
-            parent=self.styles['Heading1'],
-            fontSize=16,
-            spaceAfter=12,
-            textColor=colors.darkblue
-        ))
+        Returns:
+            Lista de PNG (bytes) na mesma ordem; None para as que falharam
+        """
+        if not figures:
+            return []
+        browser = self._acquire()
+        if browser is None:
+            return [_to_png(fig, width, height) for fig, width, height in figures]
         
-        # Cabeçalho de seção
-        self.styles.add(ParagraphStyle(
-            name='CustomHeading2',
-            parent=self.styles['Heading2'],
-            fontSize=14,
-            spaceAfter=8,
-            textColor=colors.darkgreen
-        ))
-        
-        # Texto normal
-        self.styles.add(ParagraphStyle(
-            name='CustomNormal',
-            parent=self.styles['Normal'],
-            fontSize=10,
-            spaceAfter=6
-        ))
+        kaleido, loop = browser
+        pngs = []
+        try:
+            futures = [asyncio.run_coroutine_threadsafe(
+                           kaleido.calc_fig(fig.to_dict(), opts=dict(format="png", width=width, height=height)),
+                           loop)
+                       for fig, width, height in figures]
+            
+            for future in futures:
+                try:
+                    pngs.append(future.result(self.timeout_seconds))
+                except Exception as e:
+                    print(f"Erro ao converter gráfico: {e}")
+                    pngs.append(None)
+        finally:
+            self._release(browser, failed=len(pngs) < len(figures) or any(png is None for png in pngs))
+        return pngs
+    
+    def _shutdown(self, browser):
+        kaleido, loop = browser
+        try:
+            asyncio.run_coroutine_threadsafe(kaleido.close(), loop).result(self.timeout_seconds)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+    
+    def close(self):
+        """Fecha o navegador (ao fim das renderizações em andamento) e encerra o loop"""
+        with self._lock:
+            browser, self._browser = self._browser, None
+            if browser is not None and not self._in_flight.get(browser):
+                self._in_flight.pop(browser, None)
+                self._shutdown(browser)
+
+def _to_png(fig, width, height):
+    """Renderização avulsa com pio.to_image (sem navegador persistente)"""
+    try:
+        return pio.to_image(fig, format="png", width=width, height=height)
+    except Exception as e:
+        print(f"Erro ao converter gráfico: {e}")
+        return None
+
+# Renderizador único do processo, compartilhado pelos relatórios
+_chart_renderer = None
+_chart_renderer_lock = threading.Lock()
+
+def get_chart_renderer():
+    """Retorna o KaleidoRenderer do processo (o navegador abre na primeira renderização)"""
+    global _chart_renderer
+    
+    with _chart_renderer_lock:
+        if _chart_renderer is None:
+            _chart_renderer = KaleidoRenderer()
+            atexit.register(_chart_renderer.close)
+        return _chart_renderer
+
+# Tamanho (px) de cada tipo de gráfico do relatório; no PDF, 0,75 pt por px
+CHART_SIZES = {
+    'throughput': (THROUGHPUT_CHART_WIDTH, 400),
+    'daily': (800, 400),
+    'cumulative': (800, 400),
+    'distribution': (400, 300),
+    'fleet': (800, 400),
+}
+
+DAILY_VALUES = ['download_gb', 'upload_gb', 'total_gb', 'gaps', 'records']
+
+def _multiple_devices(df):
+    return 'device' in df and df['device'].nunique() > 1
+
+def throughput_series(df):
+    """
+    Séries de download e upload (Mbps) do gráfico de throughput
+    
+    Agrega por janela se houver mais pontos que pixels e reduz com LTTB; com
+    um único dispositivo, a linha é interrompida nos gaps (NaN entre segmentos).
+    Com vários dispositivos, a série é o throughput total da frota: a média de
+    cada dispositivo por janela, somada entre os dispositivos.
+    
+    Returns:
+        Tupla ((download_x, download_y), (upload_x, upload_y))
+    """
+    multiple = _multiple_devices(df)
+    if multiple:
+        # Um valor por dispositivo e janela: trechos (segment) de um mesmo
+        # dispositivo na mesma janela não podem ser somados como se fossem outro
+        df = df.drop(columns='segment', errors='ignore')
+    if len(df) > THROUGHPUT_CHART_WIDTH or multiple:
+        period = f"{format_flux_time(df['timestamp'].min())}:{format_flux_time(df['timestamp'].max())}"
+        every_seconds = get_chart_bucket_seconds(period, THROUGHPUT_CHART_WIDTH)
+        df = aggregate_windows(df, every_seconds, CHART_CONFIG["aggregate"])
+    
+    if multiple:
+        df = df.groupby('timestamp', sort=True)[['downlink_mbps', 'uplink_mbps']].sum().reset_index()
         
-        # Texto de métrica
-        self.styles.add(ParagraphStyle(
-            name='MetricText',
-            parent=self.styles['Normal'],
-            fontSize=12,
-            spaceAfter=4,
-            textColor=colors.darkred,
-            alignment=TA_CENTER
-        ))
+    # Gaps só são interrompidos com um único dispositivo
+    segments = df['segment'] if 'segment' in df else None
+    return (lttb(df['timestamp'], df['downlink_mbps'], segments=segments),
+            lttb(df['timestamp'], df['uplink_mbps'], segments=segments))
 
-    def plotly_to_image(self, fig, width=800, height=400):
-        """Converte gráfico Plotly para imagem."""
-        try:
-            # Converte para imagem PNG
-            img_bytes = pio.to_image(fig, format="png", width=width, height=height)
-            return Image(io.BytesIO(img_bytes), width=width*0.75, height=height*0.75)
-        except Exception as e:
-            print(f"Erro ao converter gráfico: {e}")
-            return None
+def daily_by_date(daily_df):
+    """Consumo diário somado entre os dispositivos (uma linha por data, em ordem)"""
+    if not _multiple_devices(daily_df):
+        return daily_df
+    return daily_df.groupby('date', sort=True)[DAILY_VALUES].sum().reset_index()
 
-    def create_throughput_chart(self, df, title="Throughput em Tempo Real"):
-        """Cria gráfico de throughput."""
+def cumulative_series(daily_df):
+    """Consumo acumulado (GB) de download, upload e total, na ordem de daily_df"""
+    return (daily_df['download_gb'].cumsum(),
+            daily_df['upload_gb'].cumsum(),
+            daily_df['total_gb'].cumsum())
+
+class ChartBackend:
+    """
+    Backend que desenha os gráficos do relatório em PNG
+    
+    Cada gráfico é pedido como (tipo, argumentos), com os mesmos argumentos
+    para todos os backends:
+    - throughput: (df, título)
+    - daily / cumulative: (daily_df, título)
+    - distribution: (df, coluna, título, cor)
+    - fleet: (resumo por dispositivo de DeviceGroups.summary, título)
+    """
+    
+    name = None
+    
+    @classmethod
+    def available(cls):
+        """True se as dependências do backend estão instaladas"""
+        return True
+    
+    def render(self, charts):
+        """
+        Desenha os gráficos
+        
+        Args:
+            charts: Dict nome -> (tipo, argumentos)
+        
+        Returns:
+            Dict nome -> PNG (bytes); None para gráficos sem dados ou que falharam
+        """
+        raise NotImplementedError
+
+class PlotlyChartBackend(ChartBackend):
+    """Figuras Plotly convertidas em PNG pelo kaleido (navegador headless compartilhado)"""
+    
+    name = "kaleido"
+    
+    @classmethod
+    def available(cls):
+        return importlib.util.find_spec("kaleido") is not None
+    
+    def render(self, charts):
+        figures = {name: getattr(self, f"{kind}_figure")(*args) for name, (kind, args) in charts.items()}
+        names = [name for name, fig in figures.items() if fig is not None]
+        
+        # As figuras do relatório vão juntas para o navegador e são renderizadas em paralelo
+        pngs = get_chart_renderer().render([(figures[name], *CHART_SIZES[charts[name][0]]) for name in names])
+        
+        result = dict.fromkeys(charts)
+        result.update(zip(names, pngs))
+        return result
+    
+    def throughput_figure(self, df, title="Throughput em Tempo Real"):
+        """Monta a figura de throughput."""
         if df.empty:
             return None
-            
+        
+        (download_x, download_y), (upload_x, upload_y) = throughput_series(df)
+        
         fig = go.Figure()
         
         # Adiciona linhas de throughput
         fig.add_trace(go.Scatter(
-            x=df['timestamp'], 
-            y=df['downlink_mbps'], 
+            x=download_x, 
+            y=download_y, 
             mode='lines',
             name='Download (Mbps)',
             line=dict(color='blue', width=2)
         ))
         
         fig.add_trace(go.Scatter(
-            x=df['timestamp'], 
-            y=df['uplink_mbps'], 
+            x=upload_x, 
+            y=upload_y, 
             mode='lines',
             name='Upload (Mbps)',
             line=dict(color='red', width=2)
@@ -114,16 +326,18 @@ class StarlinkPDFGenerator:
             yaxis_title='Throughput (Mbps)',
             hovermode='x unified',
             showlegend=True,
-            width=800,
+            width=THROUGHPUT_CHART_WIDTH,
             height=400
         )
         
-        return self.plotly_to_image(fig)
+        return fig
 
-    def create_daily_consumption_chart(self, daily_df, title="Consumo Diário de Dados"):
-        """Cria gráfico de consumo diário."""
+    def daily_figure(self, daily_df, title="Consumo Diário de Dados"):
+        """Monta a figura de consumo diário."""
         if daily_df.empty:
             return None
+        # Vários dispositivos: um valor por data (soma da frota)
+        daily_df = daily_by_date(daily_df)
             
         fig = go.Figure()
         
@@ -156,24 +370,23 @@ class StarlinkPDFGenerator:
             height=400
         )
         
-        return self.plotly_to_image(fig)
+        return fig
 
-    def create_cumulative_chart(self, daily_df, title="Consumo Acumulado"):
-        """Cria gráfico de consumo acumulado."""
+    def cumulative_figure(self, daily_df, title="Consumo Acumulado"):
+        """Monta a figura de consumo acumulado."""
         if daily_df.empty:
             return None
+        # Vários dispositivos: um valor por data (soma da frota)
+        daily_df = daily_by_date(daily_df)
             
         # Calcula valores acumulados
-        daily_df = daily_df.copy()
-        daily_df['download_cumulative'] = daily_df['download_gb'].cumsum()
-        daily_df['upload_cumulative'] = daily_df['upload_gb'].cumsum()
-        daily_df['total_cumulative'] = daily_df['total_gb'].cumsum()
+        download_cumulative, upload_cumulative, total_cumulative = cumulative_series(daily_df)
         
         fig = go.Figure()
         
         fig.add_trace(go.Scatter(
             x=daily_df['date'], 
-            y=daily_df['download_cumulative'], 
+            y=download_cumulative, 
             mode='lines+markers',
             name='Download Acumulado (GB)',
             line=dict(color='blue', width=3)
@@ -181,7 +394,7 @@ class StarlinkPDFGenerator:
         
         fig.add_trace(go.Scatter(
             x=daily_df['date'], 
-            y=daily_df['upload_cumulative'], 
+            y=upload_cumulative, 
             mode='lines+markers',
             name='Upload Acumulado (GB)',
             line=dict(color='red', width=3)
@@ -189,7 +402,7 @@ class StarlinkPDFGenerator:
         
         fig.add_trace(go.Scatter(
             x=daily_df['date'], 
-            y=daily_df['total_cumulative'], 
+            y=total_cumulative, 
             mode='lines+markers',
             name='Total Acumulado (GB)',
             line=dict(color='green', width=3)
@@ -204,10 +417,10 @@ class StarlinkPDFGenerator:
             height=400
         )
         
-        return self.plotly_to_image(fig)
+        return fig
 
-    def create_distribution_chart(self, df, column, title, color='blue'):
-        """Cria gráfico de distribuição."""
+    def distribution_figure(self, df, column, title, color='blue'):
+        """Monta a figura de distribuição."""
         if df.empty or column not in df.columns:
             return None
             
@@ -228,19 +441,563 @@ class StarlinkPDFGenerator:
             height=300
         )
         
-        return self.plotly_to_image(fig)
+        return fig
+
+    def fleet_figure(self, summary, title="Consumo por Dispositivo"):
+        """Monta a figura de comparação da frota (GB por dispositivo)."""
+        if summary.empty:
+            return None
+        
+        fig = go.Figure()
+        
+        fig.add_trace(go.Bar(
+            x=summary['name'], 
+            y=summary['download_gb'], 
+            name='Download (GB)',
+            marker_color='blue',
+            text=[f"{x:.2f}" for x in summary['download_gb']],
+            textposition='auto'
+        ))
+        
+        fig.add_trace(go.Bar(
+            x=summary['name'], 
+            y=summary['upload_gb'], 
+            name='Upload (GB)',
+            marker_color='red',
+            text=[f"{x:.2f}" for x in summary['upload_gb']],
+            textposition='auto'
+        ))
+        
+        fig.update_layout(
+            title=title,
+            xaxis_title='Dispositivo',
+            yaxis_title='Consumo (GB)',
+            barmode='group',
+            showlegend=True,
+            width=800,
+            height=400
+        )
+        
+        return fig
+
+def _naive_datetimes(values):
+    """Horários sem fuso (hora local do dado), como o Plotly exibe"""
+    index = pd.DatetimeIndex(values)
+    return (index.tz_localize(None) if index.tz is not None else index).to_numpy()
+
+class MatplotlibChartBackend(ChartBackend):
+    """
+    Gráficos desenhados pelo matplotlib (Agg) direto em PNG, no próprio processo
+    
+    Usa a API de objetos (Figure + FigureCanvasAgg) em vez do pyplot: não há
+    estado global, então relatórios em threads diferentes não interferem.
+    """
+    
+    name = "matplotlib"
+    dpi = 100
+    # Margens (px) à esquerda, direita, acima e abaixo do eixo
+    margins = (70, 20, 35, 55)
+    
+    @classmethod
+    def available(cls):
+        return importlib.util.find_spec("matplotlib") is not None
+    
+    def render(self, charts):
+        pngs = {}
+        for name, (kind, args) in charts.items():
+            try:
+                pngs[name] = getattr(self, f"draw_{kind}")(*args)
+            except Exception as e:
+                print(f"Erro ao desenhar gráfico: {e}")
+                pngs[name] = None
+        return pngs
+    
+    def _figure(self, kind):
+        from matplotlib.figure import Figure
+        
+        width, height = CHART_SIZES[kind]
+        fig = Figure(figsize=(width / self.dpi, height / self.dpi), dpi=self.dpi)
+        # Margens fixas em px: o layout automático (constrained/tight) custa mais que o desenho
+        left, right, top, bottom = self.margins
+        fig.subplots_adjust(left=left / width, right=1 - right / width, top=1 - top / height, bottom=bottom / height)
+        return fig, fig.add_subplot()
+    
+    def _png(self, fig):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        
+        buffer = io.BytesIO()
+        FigureCanvasAgg(fig).print_png(buffer)
+        return buffer.getvalue()
+    
+    def _date_axis(self, ax):
+        from matplotlib.dates import AutoDateLocator, ConciseDateFormatter
+        
+        locator = AutoDateLocator()
+        ax.xaxis.set_major_locator(locator)
+        ax.xaxis.set_major_formatter(ConciseDateFormatter(locator))
+    
+    def draw_throughput(self, df, title="Throughput em Tempo Real"):
+        """Desenha o gráfico de throughput."""
+        if df.empty:
+            return None
+        
+        (download_x, download_y), (upload_x, upload_y) = throughput_series(df)
+        
+        fig, ax = self._figure('throughput')
+        # NaN entre segmentos interrompe a linha, como no Plotly
+        ax.plot(_naive_datetimes(download_x), download_y, color='blue', linewidth=2, label='Download (Mbps)')
+        ax.plot(_naive_datetimes(upload_x), upload_y, color='red', linewidth=2, label='Upload (Mbps)')
+        ax.set_title(title, loc='left')
+        ax.set_xlabel('Timestamp')
+        ax.set_ylabel('Throughput (Mbps)')
+        ax.grid(alpha=0.3)
+        ax.legend(loc='upper right')
+        self._date_axis(ax)
+        return self._png(fig)
+    
+    def draw_daily(self, daily_df, title="Consumo Diário de Dados"):
+        """Desenha o gráfico de consumo diário."""
+        if daily_df.empty:
+            return None
+        # Vários dispositivos: um valor por data (soma da frota)
+        daily_df = daily_by_date(daily_df)
+        
+        from matplotlib.dates import date2num
+        
+        # Barras agrupadas: download à esquerda e upload à direita de cada dia
+        positions = date2num(pd.to_datetime(daily_df['date']))
+        width = 0.4
+        
+        fig, ax = self._figure('daily')
+        download = ax.bar(positions - width / 2, daily_df['download_gb'], width, color='blue', label='Download (GB)')
+        upload = ax.bar(positions + width / 2, daily_df['upload_gb'], width, color='red', label='Upload (GB)')
+        ax.bar_label(download, fmt='%.2f', fontsize=7)
+        ax.bar_label(upload, fmt='%.2f', fontsize=7)
+        ax.set_title(title, loc='left')
+        ax.set_xlabel('Data')
+        ax.set_ylabel('Consumo (GB)')
+        ax.grid(axis='y', alpha=0.3)
+        ax.margins(y=0.1)
+        ax.legend(loc='best')
+        ax.xaxis_date()
+        self._date_axis(ax)
+        return self._png(fig)
+    
+    def draw_cumulative(self, daily_df, title="Consumo Acumulado"):
+        """Desenha o gráfico de consumo acumulado."""
+        if daily_df.empty:
+            return None
+        # Vários dispositivos: um valor por data (soma da frota)
+        daily_df = daily_by_date(daily_df)
+        
+        download_cumulative, upload_cumulative, total_cumulative = cumulative_series(daily_df)
+        dates = pd.to_datetime(daily_df['date']).to_numpy()
+        
+        fig, ax = self._figure('cumulative')
+        ax.plot(dates, download_cumulative, color='blue', linewidth=3, marker='o', label='Download Acumulado (GB)')
+        ax.plot(dates, upload_cumulative, color='red', linewidth=3, marker='o', label='Upload Acumulado (GB)')
+        ax.plot(dates, total_cumulative, color='green', linewidth=3, marker='o', label='Total Acumulado (GB)')
+        ax.set_title(title, loc='left')
+        ax.set_xlabel('Data')
+        ax.set_ylabel('Consumo Acumulado (GB)')
+        ax.grid(alpha=0.3)
+        ax.legend(loc='upper left')
+        self._date_axis(ax)
+        return self._png(fig)
+    
+    def draw_distribution(self, df, column, title, color='blue'):
+        """Desenha o histograma de uma coluna."""
+        if df.empty or column not in df.columns:
+            return None
+        
+        fig, ax = self._figure('distribution')
+        ax.hist(df[column].dropna(), bins=20, color=color)
+        ax.set_title(title, loc='left', fontsize=10)
+        ax.set_xlabel(column.replace('_', ' ').title())
+        ax.set_ylabel('Frequência')
+        return self._png(fig)
+
+    def draw_fleet(self, summary, title="Consumo por Dispositivo"):
+        """Desenha a comparação da frota (GB por dispositivo)."""
+        if summary.empty:
+            return None
+        
+        positions = np.arange(len(summary))
+        width = 0.4
+        
+        fig, ax = self._figure('fleet')
+        download = ax.bar(positions - width / 2, summary['download_gb'], width, color='blue', label='Download (GB)')
+        upload = ax.bar(positions + width / 2, summary['upload_gb'], width, color='red', label='Upload (GB)')
+        ax.bar_label(download, fmt='%.2f', fontsize=7)
+        ax.bar_label(upload, fmt='%.2f', fontsize=7)
+        ax.set_xticks(positions, summary['name'], rotation=30 if len(summary) > 6 else 0,
+                      ha='right' if len(summary) > 6 else 'center', fontsize=8)
+        ax.set_title(title, loc='left')
+        ax.set_xlabel('Dispositivo')
+        ax.set_ylabel('Consumo (GB)')
+        ax.grid(axis='y', alpha=0.3)
+        ax.margins(y=0.1)
+        ax.legend(loc='best')
+        return self._png(fig)
+
+# Backends disponíveis, do mais rápido para o mais lento ("auto" usa o primeiro instalado)
+CHART_BACKENDS = {
+    MatplotlibChartBackend.name: MatplotlibChartBackend,
+    PlotlyChartBackend.name: PlotlyChartBackend,
+}
+
+def get_chart_backend(name=None):
+    """
+    Retorna o backend de gráficos do relatório
+    
+    Args:
+        name: "auto", "matplotlib" ou "kaleido" (padrão: REPORT_CONFIG["chart_backend"]);
+            um backend desconhecido ou não instalado cai no "auto"
+    
+    Returns:
+        Instância de ChartBackend
+    """
+    name = name or REPORT_CONFIG["chart_backend"]
+    backend = CHART_BACKENDS.get(name)
+    if backend is not None and backend.available():
+        return backend()
+    
+    if name != "auto":
+        print(f"Backend de gráficos '{name}' indisponível, usando o mais rápido instalado")
+    for backend in CHART_BACKENDS.values():
+        if backend.available():
+            return backend()
+    # Sem nenhum instalado: o kaleido ainda tenta pio.to_image e registra o erro por gráfico
+    return PlotlyChartBackend()
+
+class DeviceGroups:
+    """
+    Dados do relatório separados por dispositivo uma única vez
+    
+    Seções da frota e de cada dispositivo usam estes grupos (e o resumo
+    calculado sobre o mesmo groupby) em vez de filtrar os DataFrames de novo
+    para cada gráfico ou tabela.
+    """
+    
+    def __init__(self, df, daily_df, chart_df=None):
+        self.df = df
+        self.daily_df = daily_df
+        self.chart_df = chart_df if chart_df is not None else df
+        
+        self._grouped = df.groupby('device', sort=True, observed=True) if 'device' in df and not df.empty else None
+        self.frames = {device: frame for device, frame in self._grouped} if self._grouped is not None else {}
+        self.devices = list(self.frames)
+        self.daily = _split_by_device(daily_df)
+        self.charts = _split_by_device(self.chart_df)
+    
+    @property
+    def multiple(self):
+        return len(self.devices) > 1
+    
+    def device_daily(self, device):
+        """Consumo diário do dispositivo (vazio se não houver)"""
+        return self.daily.get(device, self.daily_df.iloc[:0])
+    
+    def device_chart(self, device):
+        """Throughput do gráfico do dispositivo (os dados completos, se não houver agregado)"""
+        return self.charts.get(device, self.frames[device])
+    
+    @cached_property
+    def fleet_daily(self):
+        """Consumo diário da frota: uma linha por data (o próprio daily_df com um dispositivo)"""
+        return daily_by_date(self.daily_df)
+    
+    @cached_property
+    def summary(self):
+        """
+        Resumo por dispositivo: registros, período, throughput médio/máximo
+        (Mbps) e consumo do período (GB e gaps, somados da tabela diária)
+        """
+        if self._grouped is None:
+            return pd.DataFrame()
+        
+        summary = self._grouped.agg(
+            records=('timestamp', 'size'),
+            period_start=('timestamp', 'min'),
+            period_end=('timestamp', 'max'),
+            avg_download_mbps=('downlink_mbps', 'mean'),
+            max_download_mbps=('downlink_mbps', 'max'),
+            avg_upload_mbps=('uplink_mbps', 'mean'),
+            max_upload_mbps=('uplink_mbps', 'max')
+        )
+        summary.index = summary.index.astype(str)
+        
+        # Colunas float explícitas: dispositivos sem tabela diária viram 0 no fillna
+        usage_columns = ['download_gb', 'upload_gb', 'total_gb', 'gaps']
+        if self.daily_df.empty:
+            usage = pd.DataFrame({column: pd.Series(dtype=np.float64) for column in usage_columns})
+        else:
+            usage = self.daily_df.groupby('device', sort=False, observed=True)[usage_columns].sum().astype(np.float64)
+        usage.index = usage.index.astype(str)
+        summary = summary.join(usage)
+        summary[usage_columns] = summary[usage_columns].fillna(0)
+        
+        summary = summary.rename_axis('device').reset_index()
+        summary.insert(1, 'name', summary['device'].map(get_device_display_name))
+        return summary
+
+def _split_by_device(frame):
+    """Dict dispositivo -> linhas, com um único groupby"""
+    if frame.empty or 'device' not in frame:
+        return {}
+    return {device: group for device, group in frame.groupby('device', sort=False, observed=True)}
+
+class StarlinkPDFGenerator:
+    def __init__(self, chart_backend=None):
+        """chart_backend: nome do backend de gráficos ("auto", "matplotlib" ou "kaleido")"""
+        self.chart_backend = get_chart_backend(chart_backend)
+        self.styles = getSampleStyleSheet()
+        self.setup_custom_styles()
+        
+    def setup_custom_styles(self):
+        """Configura estilos personalizados para o PDF."""
+        # Título principal
+        self.styles.add(ParagraphStyle(
+            name='CustomTitle',
+            parent=self.styles['Title'],
+            fontSize=24,
+            spaceAfter=30,
+            alignment=TA_CENTER,
+            textColor=colors.darkblue
+        ))
+        
+        # Subtítulo
+        self.styles.add(ParagraphStyle(
+            name='CustomHeading1',
+            parent=self.styles['Heading1'],
+            fontSize=16,
+            spaceAfter=12,
+            textColor=colors.darkblue
+        ))
+        
+        # Cabeçalho de seção
+        self.styles.add(ParagraphStyle(
+            name='CustomHeading2',
+            parent=self.styles['Heading2'],
+            fontSize=14,
+            spaceAfter=8,
+            textColor=colors.darkgreen
+        ))
+        
+        # Texto normal
+        self.styles.add(ParagraphStyle(
+            name='CustomNormal',
+            parent=self.styles['Normal'],
+            fontSize=10,
+            spaceAfter=6
+        ))
+        
+        # Texto de métrica
+        self.styles.add(ParagraphStyle(
+            name='MetricText',
+            parent=self.styles['Normal'],
+            fontSize=12,
+            spaceAfter=4,
+            textColor=colors.darkred,
+            alignment=TA_CENTER
+        ))
+
+    def plotly_to_image(self, fig, width=None, height=None):
+        """Converte gráfico Plotly para imagem."""
+        if fig is None:
+            return None
+        width = width or fig.layout.width or 800
+        height = height or fig.layout.height or 400
+        png = get_chart_renderer().render([(fig, width, height)])[0]
+        if png is None:
+            return None
+        return Image(io.BytesIO(png), width=width*0.75, height=height*0.75)
+
+    def render_charts(self, charts):
+        """
+        Desenha vários gráficos de uma vez com o backend do relatório
+        
+        Args:
+            charts: Dict nome -> (tipo, argumentos), tipo em CHART_SIZES
+        
+        Returns:
+            Dict nome -> Image do reportlab (None se o gráfico falhou ou não tinha dados)
+        """
+        pngs = self.chart_backend.render(charts)
+        
+        images = dict.fromkeys(charts)
+        for name, (kind, _) in charts.items():
+            if pngs.get(name) is not None:
+                width, height = CHART_SIZES[kind]
+                images[name] = Image(io.BytesIO(pngs[name]), width=width*0.75, height=height*0.75)
+        return images
+
+    def create_throughput_chart(self, df, title="Throughput em Tempo Real"):
+        """Cria gráfico de throughput."""
+        return self.render_charts({'chart': ('throughput', (df, title))})['chart']
+
+    def create_daily_consumption_chart(self, daily_df, title="Consumo Diário de Dados"):
+        """Cria gráfico de consumo diário."""
+        return self.render_charts({'chart': ('daily', (daily_df, title))})['chart']
+
+    def create_cumulative_chart(self, daily_df, title="Consumo Acumulado"):
+        """Cria gráfico de consumo acumulado."""
+        return self.render_charts({'chart': ('cumulative', (daily_df, title))})['chart']
+
+    def create_distribution_chart(self, df, column, title, color='blue'):
+        """Cria gráfico de distribuição."""
+        return self.render_charts({'chart': ('distribution', (df, column, title, color))})['chart']
+
+    def daily_table_rows(self, daily_df):
+        """Linhas da tabela diária já formatadas (coluna a coluna, sem iterrows)"""
+        columns = [
+            daily_df['date'].astype(str).to_numpy(),
+            np.char.mod('%.3f', daily_df['download_gb'].to_numpy(dtype=np.float64)),
+            np.char.mod('%.3f', daily_df['upload_gb'].to_numpy(dtype=np.float64)),
+            np.char.mod('%.3f', daily_df['total_gb'].to_numpy(dtype=np.float64)),
+            daily_df['gaps'].astype(str).to_numpy(),
+            daily_df['records'].astype(str).to_numpy()
+        ]
+        return np.column_stack(columns).tolist()
+
+    def create_daily_tables(self, daily_df, chunk_rows=DAILY_TABLE_CHUNK_ROWS):
+        """
+        Flowables da tabela de consumo diário
+        
+        Com vários dispositivos, cada um tem um subtítulo e a própria tabela.
+        Cada tabela é dividida em LongTables de até chunk_rows linhas, com
+        larguras fixas e cabeçalho repetido a cada página, o que mantém o
+        layout do reportlab linear no número de linhas.
+        
+        Returns:
+            Lista de flowables para o story
+        """
+        if 'device' in daily_df and daily_df['device'].nunique() > 1:
+            groups = daily_df.groupby('device', sort=False, observed=True)
+        else:
+            groups = [(None, daily_df)]
+        
+        flowables = []
+        for device, device_daily in groups:
+            if device is not None:
+                flowables.append(Paragraph(f"<b>{get_device_display_name(device)}</b>", self.styles['CustomNormal']))
+            
+            rows = self.daily_table_rows(device_daily)
+            for start in range(0, len(rows), chunk_rows):
+                table = LongTable([DAILY_TABLE_HEADER] + rows[start:start + chunk_rows],
+                                  colWidths=DAILY_TABLE_COL_WIDTHS, repeatRows=1)
+                table.setStyle(DAILY_TABLE_STYLE)
+                flowables.append(table)
+            
+            flowables.append(Spacer(1, 10))
+        return flowables
+
+    def create_fleet_section(self, groups, charts):
+        """Página de comparação entre os dispositivos (gráfico e tabela do resumo)"""
+        summary = groups.summary
+        
+        yield PageBreak()
+        yield Paragraph("🛰️ COMPARAÇÃO DA FROTA", self.styles['CustomHeading1'])
+        
+        if charts.get('fleet'):
+            yield charts['fleet']
+            yield Spacer(1, 20)
+        
+        rows = np.column_stack([
+            summary['name'].to_numpy(dtype=str),
+            np.char.mod('%.3f', summary['download_gb'].to_numpy(dtype=np.float64)),
+            np.char.mod('%.3f', summary['upload_gb'].to_numpy(dtype=np.float64)),
+            np.char.mod('%.3f', summary['total_gb'].to_numpy(dtype=np.float64)),
+            summary['gaps'].astype(np.int64).astype(str).to_numpy(),
+            summary['records'].astype(str).to_numpy(),
+            np.char.mod('%.2f', summary['avg_download_mbps'].to_numpy(dtype=np.float64)),
+            np.char.mod('%.2f', summary['max_download_mbps'].to_numpy(dtype=np.float64))
+        ]).tolist()
+        
+        table = LongTable([FLEET_TABLE_HEADER] + rows, colWidths=FLEET_TABLE_COL_WIDTHS, repeatRows=1)
+        table.setStyle(DAILY_TABLE_STYLE)
+        yield table
+        yield Paragraph("Throughput médio e máximo de download em Mbps.", self.styles['CustomNormal'])
+
+    def create_device_section(self, groups, device, charts):
+        """Seção de um dispositivo: métricas, gráficos e tabela diária próprios"""
+        info = groups.summary.set_index('device').loc[str(device)]
+        
+        yield PageBreak()
+        yield Paragraph(f"📡 {info['name']}", self.styles['CustomHeading1'])
+        yield Paragraph(f"<b>Período:</b> {info['period_start']:%d/%m/%Y %H:%M} - {info['period_end']:%d/%m/%Y %H:%M}",
+                        self.styles['CustomNormal'])
+        
+        metrics_table = Table([
+            ['Métrica', 'Valor'],
+            ['Download', f"{info['download_gb']:.2f} GB"],
+            ['Upload', f"{info['upload_gb']:.2f} GB"],
+            ['Total', f"{info['total_gb']:.2f} GB"],
+            ['Gaps Detectados', str(int(info['gaps']))],
+            ['Registros', f"{info['records']:,}"],
+            ['Download médio / máximo', f"{info['avg_download_mbps']:.2f} / {info['max_download_mbps']:.2f} Mbps"],
+            ['Upload médio / máximo', f"{info['avg_upload_mbps']:.2f} / {info['max_upload_mbps']:.2f} Mbps"]
+        ])
+        metrics_table.setStyle(DAILY_TABLE_STYLE)
+        yield metrics_table
+        yield Spacer(1, 20)
+        
+        for kind, heading in (('throughput', "Throughput ao Longo do Tempo"),
+                              ('daily', "Consumo Diário por Tipo"),
+                              ('cumulative', "Consumo Acumulado")):
+            chart = charts.get((device, kind))
+            if chart:
+                yield Paragraph(heading, self.styles['CustomHeading2'])
+                yield chart
+                yield Spacer(1, 20)
+        
+        device_daily = groups.device_daily(device)
+        if not device_daily.empty:
+            yield Paragraph("Tabela de Consumo Diário", self.styles['CustomHeading2'])
+            yield from self.create_daily_tables(device_daily)
 
     def generate_pdf_report(self, 
                           df: pd.DataFrame, 
                           daily_df: pd.DataFrame,
                           file_info: Dict,
                           total_usage: Dict = None,
-                          output_path: str = "starlink_report.pdf"):
-        """Gera relatório PDF completo."""
+                          output_path: Optional[str] = None,
+                          chart_df: pd.DataFrame = None):
+        """Gera relatório PDF completo.
         
-        doc = SimpleDocTemplate(output_path, pagesize=A4)
+        output_path: arquivo de saída; sem ele (padrão) o PDF é montado em
+        memória e os bytes são retornados (sem passar pelo disco).
+        chart_df: throughput já agregado para o gráfico (ex: aggregateWindow no
+        InfluxDB); sem ele o gráfico é agregado a partir de df.
+        """
+        
+        buffer = io.BytesIO() if output_path is None else None
+        doc = SimpleDocTemplate(buffer if buffer is not None else output_path, pagesize=A4)
         story = []
         
+        # Separação por dispositivo feita uma vez e usada por todas as seções;
+        # com vários dispositivos, gráficos e tabelas gerais usam os totais da frota
+        groups = DeviceGroups(df, daily_df, chart_df)
+        report_daily = groups.fleet_daily
+        
+        chart_requests = {
+            'throughput': ('throughput', (groups.chart_df, "Throughput Total da Frota" if groups.multiple else "Throughput em Tempo Real")),
+            'daily': ('daily', (report_daily, "Consumo Diário de Dados")),
+            'cumulative': ('cumulative', (report_daily, "Consumo Acumulado")),
+            'download_distribution': ('distribution', (df, 'downlink_mbps', 'Distribuição Download (Mbps)', 'blue')),
+            'upload_distribution': ('distribution', (df, 'uplink_mbps', 'Distribuição Upload (Mbps)', 'red'))
+        }
+        if groups.multiple:
+            chart_requests['fleet'] = ('fleet', (groups.summary, "Consumo por Dispositivo"))
+            for device in groups.devices:
+                name = get_device_display_name(device)
+                chart_requests[(device, 'throughput')] = ('throughput', (groups.device_chart(device), f"Throughput - {name}"))
+                chart_requests[(device, 'daily')] = ('daily', (groups.device_daily(device), f"Consumo Diário - {name}"))
+                chart_requests[(device, 'cumulative')] = ('cumulative', (groups.device_daily(device), f"Consumo Acumulado - {name}"))
+        
+        # Todos os gráficos são pedidos juntos (o kaleido os renderiza em paralelo)
+        charts = self.render_charts(chart_requests)
+        
         # Título principal
         story.append(Paragraph("🚀 RELATÓRIO DE ANÁLISE STARLINK", self.styles['CustomTitle']))
         story.append(Spacer(1, 20))
@@ -316,7 +1073,7 @@ class StarlinkPDFGenerator:
         story.append(Paragraph("Throughput ao Longo do Tempo", self.styles['CustomHeading2']))
         
         # Gráfico de throughput
-        throughput_chart = self.create_throughput_chart(df)
+        throughput_chart = charts['throughput']
         if throughput_chart:
             story.append(throughput_chart)
             story.append(Spacer(1, 20))
@@ -325,18 +1082,18 @@ class StarlinkPDFGenerator:
             story.append(Spacer(1, 20))
         
         # Seção: Aba Consumo Diário
-        if not daily_df.empty:
+        if not report_daily.empty:
             story.append(Paragraph("📅 ABA: CONSUMO DIÁRIO", self.styles['CustomHeading1']))
             
             # Gráfico de consumo diário
-            daily_chart = self.create_daily_consumption_chart(daily_df)
+            daily_chart = charts['daily']
             if daily_chart:
                 story.append(Paragraph("Consumo Diário por Tipo", self.styles['CustomHeading2']))
                 story.append(daily_chart)
                 story.append(Spacer(1, 20))
             
             # Gráfico acumulado
-            cumulative_chart = self.create_cumulative_chart(daily_df)
+            cumulative_chart = charts['cumulative']
             if cumulative_chart:
                 story.append(Paragraph("Consumo Acumulado", self.styles['CustomHeading2']))
                 story.append(cumulative_chart)
@@ -345,41 +1102,18 @@ class StarlinkPDFGenerator:
             # Tabela de consumo diário
             story.append(Paragraph("Tabela de Consumo Diário", self.styles['CustomHeading2']))
             
-            # Prepara dados da tabela
-            table_data = [['Data', 'Download (GB)', 'Upload (GB)', 'Total (GB)', 'Gaps', 'Registros']]
-            for _, row in daily_df.iterrows():
-                table_data.append([
-                    str(row['date']),
-                    f"{row['download_gb']:.3f}",
-                    f"{row['upload_gb']:.3f}",
-                    f"{row['total_gb']:.3f}",
-                    str(row['gaps']),
-                    str(row['records'])
-                ])
-            
-            daily_table = Table(table_data)
-            daily_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('FONTSIZE', (0, 1), (-1, -1), 8),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            
-            story.append(daily_table)
+            # LongTables em blocos, com cabeçalho repetido a cada página
+            # (com vários dispositivos, as tabelas de cada um ficam nas seções próprias)
+            story.extend(self.create_daily_tables(report_daily))
             story.append(Spacer(1, 20))
             
             # Estatísticas diárias
             story.append(Paragraph("📊 Estatísticas Diárias", self.styles['CustomHeading2']))
             daily_stats = [
-                f"<b>Maior consumo diário:</b> {daily_df['total_gb'].max():.2f} GB",
-                f"<b>Menor consumo diário:</b> {daily_df['total_gb'].min():.2f} GB",
-                f"<b>Média diária:</b> {daily_df['total_gb'].mean():.2f} GB",
-                f"<b>Total de dias analisados:</b> {len(daily_df)} dias"
+                f"<b>Maior consumo diário:</b> {report_daily['total_gb'].max():.2f} GB",
+                f"<b>Menor consumo diário:</b> {report_daily['total_gb'].min():.2f} GB",
+                f"<b>Média diária:</b> {report_daily['total_gb'].mean():.2f} GB",
+                f"<b>Total de dias analisados:</b> {len(report_daily)} dias"
             ]
             
             for stat in daily_stats:
@@ -392,8 +1126,8 @@ class StarlinkPDFGenerator:
             story.append(Paragraph("📊 ABA: DISTRIBUIÇÃO", self.styles['CustomHeading1']))
             
             # Cria duas colunas para os gráficos de distribuição
-            col1_data = self.create_distribution_chart(df, 'downlink_mbps', 'Distribuição Download (Mbps)', 'blue')
-            col2_data = self.create_distribution_chart(df, 'uplink_mbps', 'Distribuição Upload (Mbps)', 'red')
+            col1_data = charts['download_distribution']
+            col2_data = charts['upload_distribution']
             
             if col1_data and col2_data:
                 # Tabela com duas colunas para os gráficos
@@ -408,9 +1142,9 @@ class StarlinkPDFGenerator:
         # Resumo final
         story.append(Paragraph("📋 Resumo Executivo", self.styles['CustomHeading1']))
         
-        if not daily_df.empty:
-            total_download = daily_df['download_gb'].sum()
-            total_upload = daily_df['upload_gb'].sum()
+        if not report_daily.empty:
+            total_download = report_daily['download_gb'].sum()
+            total_upload = report_daily['upload_gb'].sum()
             total_consumption = total_download + total_upload
             
             summary_text = f"""
@@ -419,8 +1153,8 @@ class StarlinkPDFGenerator:
             • Upload: {total_upload:.2f} GB<br/>
             • Total: {total_consumption:.2f} GB<br/><br/>
             
-            <b>Período de Análise:</b> {len(daily_df)} dias<br/>
-            <b>Média Diária:</b> {total_consumption/len(daily_df):.2f} GB/dia<br/>
+            <b>Período de Análise:</b> {len(report_daily)} dias<br/>
+            <b>Média Diária:</b> {total_consumption/len(report_daily):.2f} GB/dia<br/>
             <b>Arquivo Analisado:</b> {file_info.get('filename', 'N/A')}
             """
         else:
@@ -432,6 +1166,12 @@ class StarlinkPDFGenerator:
         
         story.append(Paragraph(summary_text, self.styles['CustomNormal']))
         
+        # Comparação da frota e uma seção por dispositivo
+        if groups.multiple:
+            story.extend(self.create_fleet_section(groups, charts))
+            for device in groups.devices:
+                story.extend(self.create_device_section(groups, device, charts))
+        
         # Rodapé
         story.append(Spacer(1, 30))
         story.append(Paragraph("Relatório gerado automaticamente pelo Starlink Data Analyzer", 
@@ -439,9 +1179,10 @@ class StarlinkPDFGenerator:
         
         # Gera o PDF
         doc.build(story)
-        return output_path
+        return buffer.getvalue() if buffer is not None else output_path
 
-def generate_pdf_report(df, daily_df, file_info, total_usage=None, output_path="starlink_report.pdf"):
-    """Função de conveniência para gerar relatório PDF."""
-    generator = StarlinkPDFGenerator()
-    return generator.generate_pdf_report(df, daily_df, file_info, total_usage, output_path)
+def generate_pdf_report(df, daily_df, file_info, total_usage=None, output_path=None, chart_df=None,
+                        chart_backend=None):
+    """Função de conveniência para gerar relatório PDF (bytes em memória, ou o caminho com output_path)."""
+    generator = StarlinkPDFGenerator(chart_backend)
+    return generator.generate_pdf_report(df, daily_df, file_info, total_usage, output_path, chart_df)
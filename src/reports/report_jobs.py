@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Fila de relatórios PDF gerados em segundo plano
+
+generate_pdf_report roda em um pool limitado de threads, fora da thread do
+script do Streamlit: a página envia o pedido, guarda o id do job na sessão e
+consulta o status nos reruns. O PDF é montado em memória e fica no próprio
+job (nada é gravado em disco, e sessões simultâneas não disputam arquivo); os
+jobs concluídos ficam guardados pelo hash das entradas, então o mesmo pedido
+devolve o PDF já gerado.
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'config'))
+from influx_config import REPORT_CONFIG
+
+PENDING = "pendente"
+RUNNING = "gerando"
+DONE = "pronto"
+FAILED = "erro"
+
+# Intervalo (s) entre consultas de status pela página
+POLL_SECONDS = 2
+
+class ReportJob:
+    """Pedido de relatório e seu status"""
+
+    def __init__(self, job_id):
+        self.id = job_id
+        self.status = PENDING
+        self.pdf = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+
+    @property
+    def done(self):
+        return self.status in (DONE, FAILED)
+
+    @property
+    def elapsed_seconds(self):
+        return (self.finished_at or time.time()) - self.submitted_at
+
+    def read(self):
+        """Bytes do PDF; None se o job não terminou ou já foi descartado"""
+        return self.pdf if self.status == DONE else None
+
+def report_hash(df, daily_df, file_info, total_usage=None, chart_df=None, chart_backend=None):
+    """Hash das entradas de generate_pdf_report (conteúdo dos DataFrames e dicts)"""
+    digest = hashlib.sha1()
+    for frame in (df, daily_df, chart_df):
+        if frame is None:
+            digest.update(b"-")
+            continue
+        digest.update(",".join(map(str, frame.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    digest.update(json.dumps([file_info, total_usage, chart_backend], sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+class ReportQueue:
+    """
+    Pool de threads que gera os relatórios e guarda os jobs por hash das entradas
+
+    Os jobs ficam em ordem LRU; passando de max_reports, os concluídos menos
+    usados são descartados junto com o PDF. Jobs com erro são refeitos no
+    próximo pedido igual.
+    """
+
+    def __init__(self, workers=None, max_reports=None):
+        self.max_reports = max_reports or REPORT_CONFIG["job_max_reports"]
+        self._executor = ThreadPoolExecutor(max_workers=workers or REPORT_CONFIG["job_workers"],
+                                            thread_name_prefix="pdf-report")
+        self._jobs = OrderedDict()  # id -> ReportJob
+        self._lock = threading.Lock()
+
+    def submit(self, df, daily_df, file_info, total_usage=None, chart_df=None, chart_backend=None):
+        """
+        Enfileira um relatório (mesmos argumentos de generate_pdf_report, sem output_path)
+
+        Os DataFrames são usados pela thread do job e não devem ser alterados depois.
+
+        Returns:
+            ReportJob novo, ou o já existente para as mesmas entradas
+        """
+        job_id = report_hash(df, daily_df, file_info, total_usage, chart_df, chart_backend)
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.status != FAILED:
+                self._jobs.move_to_end(job_id)
+                return job
+
+            job = ReportJob(job_id)
+            self._jobs[job_id] = job
+            self._evict()
+
+        self._executor.submit(self._run, job, df, daily_df, file_info, total_usage, chart_df, chart_backend)
+        return job
+
+    def get(self, job_id):
+        """Job pelo id; None se não existe ou já foi descartado"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                self._jobs.move_to_end(job_id)
+            return job
+
+    def _run(self, job, df, daily_df, file_info, total_usage, chart_df, chart_backend):
+        # reportlab e os backends de gráficos só são carregados no primeiro relatório
+        from pdf_generator import generate_pdf_report
+
+        job.status = RUNNING
+        try:
+            job.pdf = generate_pdf_report(df, daily_df, file_info, total_usage, None, chart_df, chart_backend)
+        except Exception as e:
+            print(f"Erro ao gerar relatório {job.id[:12]}: {e}")
+            job.error = str(e)
+            job.status = FAILED
+        else:
+            job.status = DONE
+        finally:
+            job.finished_at = time.time()
+
+    def _evict(self):
+        # Só jobs concluídos saem; os em andamento continuam até terminar
+        while len(self._jobs) > self.max_reports:
+            job_id = next((job_id for job_id, job in self._jobs.items() if job.done), None)
+            if job_id is None:
+                break
+            self._jobs.pop(job_id).pdf = None
+
+    def close(self):
+        """Cancela os jobs na fila e descarta os PDFs gerados"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            self._jobs.clear()
+
+# Fila única do processo, compartilhada pelas sessões
+_report_queue = None
+_report_queue_lock = threading.Lock()
+
+def get_report_queue():
+    """Retorna a ReportQueue do processo"""
+    global _report_queue
+
+    with _report_queue_lock:
+        if _report_queue is None:
+            _report_queue = ReportQueue()
+            atexit.register(_report_queue.close)
+        return _report_queue
@@ -6,7 +6,6 @@ Versão com integração direta ao InfluxDB e comparação entre dispositivos
 
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import sys
@@ -15,9 +14,12 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'reports'))
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'database'))
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'config'))
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'auth'))
-from pdf_generator import generate_pdf_report
-from influx_client import StarlinkInfluxClient
-from influx_config import TIME_PERIODS, BIT_STAR_DEVICES, get_device_display_name
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'analysis'))
+from influx_client import StarlinkDataResult
+from data_cache import get_shared_cached_client
+from downsampling import lttb
+from influx_config import TIME_PERIODS, REPORT_CONFIG, get_device_display_name
+from report_jobs import get_report_queue, FAILED, POLL_SECONDS
 from authentication import check_password, show_logout_button
 
 # Configuração da página
@@ -38,10 +40,11 @@ st.title("🚀 Starlink Data Analyzer")
 st.markdown("---")
 
 def initialize_influx_client():
-    """Inicializa cliente InfluxDB"""
-    if 'influx_client' not in st.session_state:
-        st.session_state.influx_client = StarlinkInfluxClient()
-    return st.session_state.influx_client
+    """
+    Retorna o cliente InfluxDB compartilhado pelo processo (com cache).
+    A sessão guarda apenas as escolhas do usuário.
+    """
+    return get_shared_cached_client()
 
 def get_available_devices(days_back=30, custom_time_range=None):
     """Retorna dispositivos disponíveis no InfluxDB"""
@@ -52,89 +55,71 @@ def get_available_devices(days_back=30, custom_time_range=None):
     devices = client.get_available_devices(days_back, custom_time_range)
     return devices
 
-def load_influx_data(devices, time_range, max_gap_minutes=5):
-    """Carrega dados do InfluxDB"""
+def get_device_index(days_back=30, custom_time_range=None):
+    """Retorna primeiro/último registro e IP de cada dispositivo"""
     client = initialize_influx_client()
     if not client:
-        return pd.DataFrame()
+        return {}
+    
+    return client.get_device_index(days_back, custom_time_range)
+
+def load_influx_data(devices, time_range, max_gap_minutes=5):
+    """Carrega dados do InfluxDB uma única vez por renderização"""
+    client = initialize_influx_client()
     
     # Testa conexão
     if not client.test_connection():
         st.error("❌ Não foi possível conectar ao InfluxDB")
-        return pd.DataFrame()
+        return StarlinkDataResult(client, pd.DataFrame(), time_range, max_gap_minutes)
     
-    # Busca dados
-    df = client.get_starlink_data(devices, time_range, max_gap_minutes)
+    # Busca dados; consumo diário e resumos são derivados deste resultado
+    data = client.load_data(devices, time_range, max_gap_minutes)
     
-    if not df.empty:
-        st.success(f"✅ {len(df)} registros carregados do InfluxDB")
-        st.info(f"📊 Dispositivos: {', '.join(df['device'].unique())}")
+    if not data.empty:
+        st.success(f"✅ {len(data.df)} registros carregados do InfluxDB")
+        st.info(f"📊 Dispositivos: {', '.join(data.df['device'].unique())}")
     else:
         st.warning("⚠️ Nenhum dado encontrado para os parâmetros selecionados")
     
-    return df
-
-def calculate_usage(df, max_gap_minutes=5):
-    """Calcula uso de dados."""
-    if df.empty:
-        return 0, 0, 0, 0
-    
-    total_download = 0
-    total_upload = 0
-    gaps = 0
-    
-    for i in range(len(df) - 1):
-        current = df.iloc[i]
-        next_row = df.iloc[i + 1]
-        
-        time_diff = next_row['timestamp'] - current['timestamp']
-        time_diff_minutes = time_diff.total_seconds() / 60
-        
-        if time_diff_minutes > max_gap_minutes:
-            gaps += 1
-            continue
-        
-        time_diff_seconds = time_diff.total_seconds()
-        download_gb = (current['downlink_bps'] * time_diff_seconds) / 8 / (1024 ** 3)
-        upload_gb = (current['uplink_bps'] * time_diff_seconds) / 8 / (1024 ** 3)
-        
-        total_download += download_gb
-        total_upload += upload_gb
-    
-    return total_download, total_upload, gaps, len(df)
+    return data
 
-def calculate_daily_usage(df, max_gap_minutes=5, time_range=None):
-    """Calcula uso de dados diariamente por dispositivo."""
-    if df.empty:
-        return pd.DataFrame()
-    
-    client = initialize_influx_client()
-    if not client:
-        return pd.DataFrame()
-    
-    # Usa método do cliente InfluxDB para cálculo diário
-    devices = df['device'].unique().tolist()
-    
-    # Se não foi fornecido time_range, usa período padrão
-    if not time_range:
-        time_range = "-30d"
-    
-    daily_df = client.get_daily_consumption(devices, time_range, max_gap_minutes)
-    return daily_df
+@st.fragment(run_every=POLL_SECONDS)
+def wait_report_job(job_id):
+    """Acompanha o relatório em geração; ao terminar, recarrega a página para oferecer o download"""
+    job = get_report_queue().get(job_id)
+    if job is None or job.done:
+        st.rerun()
+    st.info(f"⏳ Gerando relatório PDF... ({job.elapsed_seconds:.0f} s)")
 
-def get_device_summary(df):
-    """Retorna resumo dos dispositivos"""
-    if df.empty:
-        return {}
-    
-    client = initialize_influx_client()
-    if not client:
-        return {}
+def show_report_job():
+    """Status do relatório pedido nesta sessão: em geração, pronto para baixar ou com erro"""
+    job_id = st.session_state.get('report_job')
+    if not job_id:
+        return
     
-    devices = df['device'].unique().tolist()
-    time_range = "-30d"  # Usa período padrão
+    job = get_report_queue().get(job_id)
+    if job is None:
+        # Descartado da fila (muitos relatórios depois deste)
+        del st.session_state['report_job']
+        return
     
-    return client.get_device_summary(devices, time_range)
+    if not job.done:
+        wait_report_job(job_id)
+    elif job.status == FAILED:
+        st.error(f"❌ Erro ao gerar PDF: {job.error}")
+    else:
+        pdf_bytes = job.read()
+        if pdf_bytes is None:
+            del st.session_state['report_job']
+            return
+        
+        st.success("✅ Relatório PDF gerado!")
+        st.download_button(
+            label="📥 Baixar PDF",
+            data=pdf_bytes,
+            file_name=f"starlink_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
+            mime="application/pdf"
+        )
 
 # Interface
 st.sidebar.header("📡 Conexão InfluxDB")
@@ -194,6 +179,9 @@ available_devices = get_available_devices(30, time_range)
 
 if not available_devices:
     st.sidebar.warning("⚠️ Nenhum dispositivo encontrado no período selecionado")
+    # Diagnóstico do bucket só sob demanda
+    if st.sidebar.button("🔍 Executar diagnóstico"):
+        initialize_influx_client().run_device_diagnostic(30)
     st.stop()
 
 # Seleção múltipla de dispositivos (dinâmica)
@@ -214,6 +202,17 @@ if available_devices:
     # Mostra informações sobre dispositivos encontrados
     if len(available_devices) > 0:
         st.sidebar.success(f"✅ {len(available_devices)} dispositivo(s) detectado(s)")
+    
+    # Primeiro/último registro e IP (consulta extra, só quando pedido)
+    if st.sidebar.checkbox("Mostrar detalhes dos dispositivos"):
+        device_index = get_device_index(30, time_range)
+        for device in selected_devices or available_devices:
+            info = device_index.get(device)
+            if info:
+                st.sidebar.caption(
+                    f"**{device_options[device]}** · IP {info['ip'] or '-'} · "
+                    f"{info['first_seen'].strftime('%d/%m/%Y %H:%M')} a {info['last_seen'].strftime('%d/%m/%Y %H:%M')}"
+                )
 else:
     selected_devices = []
     st.sidebar.warning("⚠️ Nenhum dispositivo encontrado")
@@ -227,11 +226,12 @@ if selected_devices:
     st.header("📊 Análise de Dados Starlink")
     
     # Carrega dados do InfluxDB
-    df = load_influx_data(selected_devices, time_range, max_gap)
+    data = load_influx_data(selected_devices, time_range, max_gap)
+    df = data.mbps
     
     if not df.empty:
         # Calcula uso total
-        download_gb, upload_gb, gaps, records = calculate_usage(df, max_gap)
+        download_gb, upload_gb, gaps, records = data.usage
         
         # Métricas principais
         col1, col2, col3, col4 = st.columns(4)
@@ -269,7 +269,7 @@ if selected_devices:
         
         with col2:
             # Estatísticas Diárias
-            daily_df = calculate_daily_usage(df, max_gap, time_range)
+            daily_df = data.daily
             if not daily_df.empty:
                 st.markdown("**📊 Estatísticas Diárias**")
                 daily_stats = {
@@ -293,7 +293,7 @@ if selected_devices:
         # Resumo por dispositivo
         if len(selected_devices) > 1:
             st.subheader("📱 Resumo por Dispositivo")
-            device_summary = get_device_summary(df)
+            device_summary = data.summary
             
             if device_summary:
                 summary_data = []
@@ -317,26 +317,34 @@ if selected_devices:
         
         with tab1:
             # Throughput ao longo do tempo com múltiplos dispositivos
+            # (agregado por janela: no máximo ~1 ponto por pixel)
+            chart_df = data.chart()
             fig = go.Figure()
             
             # Cores para diferentes dispositivos
             colors = ['blue', 'red', 'green', 'orange', 'purple', 'brown']
             
-            for i, device in enumerate(df['device'].unique()):
-                device_df = df[df['device'] == device]
+            for i, device in enumerate(chart_df['device'].unique()):
+                device_df = chart_df[chart_df['device'] == device]
                 device_name = get_device_display_name(device)
                 color = colors[i % len(colors)]
                 
+                # LTTB: só os pontos visualmente relevantes vão para o navegador;
+                # a linha é interrompida nos gaps quando há segmentos
+                segments = device_df['segment'] if 'segment' in device_df else None
+                download_x, download_y = lttb(device_df['timestamp'], device_df['downlink_mbps'], segments=segments)
+                upload_x, upload_y = lttb(device_df['timestamp'], device_df['uplink_mbps'], segments=segments)
+                
                 fig.add_trace(go.Scatter(
-                    x=device_df['timestamp'], 
-                    y=device_df['downlink_mbps'], 
+                    x=download_x, 
+                    y=download_y, 
                     name=f'{device_name} - Download',
                     line=dict(color=color, width=2),
                     mode='lines'
                 ))
                 fig.add_trace(go.Scatter(
-                    x=device_df['timestamp'], 
-                    y=device_df['uplink_mbps'], 
+                    x=upload_x, 
+                    y=upload_y, 
                     name=f'{device_name} - Upload',
                     line=dict(color=color, width=2, dash='dash'),
                     mode='lines'
@@ -352,7 +360,7 @@ if selected_devices:
             
         with tab2:
             # Consumo diário por dispositivo
-            daily_df = calculate_daily_usage(df, max_gap, time_range)
+            daily_df = data.daily
             
             if not daily_df.empty:
                 # Gráfico de barras do consumo diário por dispositivo
@@ -466,16 +474,14 @@ if selected_devices:
                 
                 # Gráfico de comparação de throughput médio
                 device_stats = []
-                for device in df['device'].unique():
-                    device_df = df[df['device'] == device]
-                    device_name = get_device_display_name(device)
+                for device, info in data.summary.items():
                     device_stats.append({
-                        'Dispositivo': device_name,
-                        'Download Médio (Mbps)': device_df['downlink_mbps'].mean(),
-                        'Upload Médio (Mbps)': device_df['uplink_mbps'].mean(),
-                        'Download Máximo (Mbps)': device_df['downlink_mbps'].max(),
-                        'Upload Máximo (Mbps)': device_df['uplink_mbps'].max(),
-                        'Registros': len(device_df)
+                        'Dispositivo': info['name'],
+                        'Download Médio (Mbps)': info['avg_download_mbps'],
+                        'Upload Médio (Mbps)': info['avg_upload_mbps'],
+                        'Download Máximo (Mbps)': info['max_download_mbps'],
+                        'Upload Máximo (Mbps)': info['max_upload_mbps'],
+                        'Registros': info['records']
                     })
                 
                 stats_df = pd.DataFrame(device_stats)
@@ -519,16 +525,17 @@ if selected_devices:
             # Gráficos de distribuição
             col1, col2 = st.columns(2)
             
+            # go.Histogram em vez de plotly.express, que pesa no carregamento da página
             with col1:
-                fig_hist = px.histogram(df, x='downlink_mbps', 
-                                      title='Distribuição Download (Mbps) por Dispositivo', 
-                                      nbins=20)
+                fig_hist = go.Figure(go.Histogram(x=df['downlink_mbps'], nbinsx=20))
+                fig_hist.update_layout(title='Distribuição Download (Mbps) por Dispositivo',
+                                       xaxis_title='downlink_mbps', yaxis_title='count')
                 st.plotly_chart(fig_hist, use_container_width=True)
             
             with col2:
-                fig_hist = px.histogram(df, x='uplink_mbps', 
-                                      title='Distribuição Upload (Mbps) por Dispositivo', 
-                                      nbins=20)
+                fig_hist = go.Figure(go.Histogram(x=df['uplink_mbps'], nbinsx=20))
+                fig_hist.update_layout(title='Distribuição Upload (Mbps) por Dispositivo',
+                                       xaxis_title='uplink_mbps', yaxis_title='count')
                 st.plotly_chart(fig_hist, use_container_width=True)
         
         # Botão de exportação PDF
@@ -536,48 +543,38 @@ if selected_devices:
         st.sidebar.header("📄 Exportar Relatório")
         
         # Botão de exportação PDF
+        # O PDF é gerado em segundo plano; a página só acompanha o status
         if st.sidebar.button("📄 Gerar Relatório PDF", type="primary"):
-            with st.spinner("Gerando relatório PDF..."):
-                try:
-                    # Calcula dados diários para o PDF
-                    daily_df = calculate_daily_usage(df, max_gap, time_range)
-                    
-                    # Informações dos dispositivos
-                    device_names = [get_device_display_name(d) for d in selected_devices]
-                    file_info = {
-                        'filename': f"Dispositivos: {', '.join(device_names)}",
-                        'period': f"{df['timestamp'].min().strftime('%d/%m/%Y')} - {df['timestamp'].max().strftime('%d/%m/%Y')}",
-                        'total_records': len(df)
-                    }
-                    
-                    # Informações de uso total
-                    total_usage_info = {
-                        'download_gb': download_gb,
-                        'upload_gb': upload_gb,
-                        'total_gb': download_gb + upload_gb,
-                        'gaps': gaps
-                    }
-                    
-                    # Gera PDF
-                    pdf_path = generate_pdf_report(df, daily_df, file_info, total_usage_info)
-                    
-                    # Lê o arquivo PDF e oferece download
-                    with open(pdf_path, "rb") as pdf_file:
-                        pdf_bytes = pdf_file.read()
-                    
-                    st.sidebar.success("✅ Relatório PDF gerado!")
-                    st.sidebar.download_button(
-                        label="📥 Baixar PDF",
-                        data=pdf_bytes,
-                        file_name=f"starlink_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
-                        mime="application/pdf"
-                    )
-                    
-                    # Remove arquivo temporário
-                    os.remove(pdf_path)
-                    
-                except Exception as e:
-                    st.sidebar.error(f"❌ Erro ao gerar PDF: {str(e)}")
+            try:
+                # Reaproveita o consumo diário já calculado nesta renderização
+                daily_df = data.daily
+                
+                # Informações dos dispositivos
+                device_names = [get_device_display_name(d) for d in selected_devices]
+                file_info = {
+                    'filename': f"Dispositivos: {', '.join(device_names)}",
+                    'period': f"{df['timestamp'].min().strftime('%d/%m/%Y')} - {df['timestamp'].max().strftime('%d/%m/%Y')}",
+                    'total_records': len(df)
+                }
+                
+                # Informações de uso total
+                total_usage_info = {
+                    'download_gb': download_gb,
+                    'upload_gb': upload_gb,
+                    'total_gb': download_gb + upload_gb,
+                    'gaps': gaps
+                }
+                
+                # Enfileira o PDF (o mesmo pedido reaproveita o relatório já gerado)
+                job = get_report_queue().submit(df, daily_df, file_info, total_usage_info,
+                                                chart_df=data.chart(REPORT_CONFIG["throughput_chart_width"]))
+                st.session_state['report_job'] = job.id
+                
+            except Exception as e:
+                st.sidebar.error(f"❌ Erro ao gerar PDF: {str(e)}")
+        
+        with st.sidebar:
+            show_report_job()
     else:
         st.warning("⚠️ Nenhum dado encontrado para os parâmetros selecionados")
 else:
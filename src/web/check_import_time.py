@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Verifica o tempo de importação das páginas Streamlit
+
+Executa os imports de nível de módulo de cada página em um processo novo com
+python -X importtime e falha se algum módulo de uso raro (PDF, kaleido,
+plotly.express) for carregado na abertura da página. O tempo total é só
+informado; o orçamento em ms é opcional, porque varia muito com a máquina
+(use com folga sobre a medição local).
+
+Uso:
+    python src/web/check_import_time.py [--budget-ms 2500] [--repeat 3]
+"""
+
+import argparse
+import ast
+import os
+import subprocess
+import sys
+
+PAGES = ['app_simple.py', 'daily_gb_viewer.py']
+
+# Só devem ser importados no ponto de uso (ex: botão de gerar PDF)
+LAZY_MODULES = ('pdf_generator', 'reportlab', 'kaleido', 'matplotlib', 'seaborn', 'plotly.express')
+
+def page_import_source(path):
+    """Código com os sys.path.append e imports de nível de módulo da página"""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    statements = []
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            statements.append(node)
+        elif isinstance(node, ast.Expr) and 'sys.path' in ast.unparse(node):
+            statements.append(node)
+
+    return f"__file__ = {os.path.abspath(path)!r}\n" + "\n".join(ast.unparse(node) for node in statements)
+
+def measure(source):
+    """
+    Executa source com -X importtime
+
+    Returns:
+        Tupla (total em ms dos imports de primeiro nível, nomes de todos os módulos carregados)
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', source],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    total_us = 0
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        modules.append(name.strip())
+        # Nível 0: um único espaço antes do nome
+        if not name[1:].startswith(' '):
+            total_us += int(cumulative)
+    return total_us / 1000, modules
+
+def main():
+    parser = argparse.ArgumentParser(description="Orçamento de tempo de importação das páginas")
+    parser.add_argument("--budget-ms", type=float, help="Tempo máximo por página (padrão: sem limite, só informa)")
+    parser.add_argument("--repeat", type=int, default=3, help="Execuções por página; vale a mais rápida (padrão: 3)")
+    args = parser.parse_args()
+
+    web_dir = os.path.dirname(os.path.abspath(__file__))
+    failed = False
+
+    for page in PAGES:
+        source = page_import_source(os.path.join(web_dir, page))
+        runs = [measure(source) for _ in range(args.repeat)]
+        total_ms = min(total for total, _ in runs)
+        modules = runs[0][1]
+
+        loaded = sorted({lazy for lazy in LAZY_MODULES
+                         if any(module == lazy or module.startswith(lazy + '.') for module in modules)})
+
+        over_budget = args.budget_ms is not None and total_ms > args.budget_ms
+        status = "✅" if not over_budget and not loaded else "❌"
+        budget = f" (orçamento {args.budget_ms:.0f} ms)" if args.budget_ms is not None else ""
+        print(f"{status} {page}: {total_ms:.0f} ms{budget}")
+        if loaded:
+            print(f"   módulos que deveriam ser carregados só no uso: {', '.join(loaded)}")
+        failed = failed or status == "❌"
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
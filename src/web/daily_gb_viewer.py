@@ -6,7 +6,6 @@ Foca especificamente no consumo diário de dados com comparação entre disposit
 
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import sys
@@ -15,9 +14,10 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'reports'))
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'database'))
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'config'))
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'auth'))
-from pdf_generator import generate_pdf_report
-from influx_client import StarlinkInfluxClient
-from influx_config import TIME_PERIODS, BIT_STAR_DEVICES, get_device_display_name
+from influx_client import StarlinkDataResult
+from data_cache import get_shared_cached_client
+from influx_config import TIME_PERIODS, REPORT_CONFIG, get_device_display_name
+from report_jobs import get_report_queue, FAILED, POLL_SECONDS
 from authentication import check_password, show_logout_button
 
 # Configuração da página
@@ -38,10 +38,11 @@ st.title("📊 Consumo Diário de Dados Starlink (GB)")
 st.markdown("---")
 
 def initialize_influx_client():
-    """Inicializa cliente InfluxDB"""
-    if 'influx_client' not in st.session_state:
-        st.session_state.influx_client = StarlinkInfluxClient()
-    return st.session_state.influx_client
+    """
+    Retorna o cliente InfluxDB compartilhado pelo processo (com cache).
+    A sessão guarda apenas as escolhas do usuário.
+    """
+    return get_shared_cached_client()
 
 def get_available_devices(days_back=30, custom_time_range=None):
     """Retorna dispositivos disponíveis no InfluxDB"""
@@ -52,75 +53,71 @@ def get_available_devices(days_back=30, custom_time_range=None):
     devices = client.get_available_devices(days_back, custom_time_range)
     return devices
 
-def load_influx_data(devices, time_range, max_gap_minutes=5):
-    """Carrega dados do InfluxDB"""
+def get_device_index(days_back=30, custom_time_range=None):
+    """Retorna primeiro/último registro e IP de cada dispositivo"""
     client = initialize_influx_client()
     if not client:
-        return pd.DataFrame()
+        return {}
+    
+    return client.get_device_index(days_back, custom_time_range)
+
+def load_influx_data(devices, time_range, max_gap_minutes=5):
+    """Carrega dados do InfluxDB uma única vez por renderização"""
+    client = initialize_influx_client()
     
     # Testa conexão
     if not client.test_connection():
         st.error("❌ Não foi possível conectar ao InfluxDB")
-        return pd.DataFrame()
+        return StarlinkDataResult(client, pd.DataFrame(), time_range, max_gap_minutes)
     
-    # Busca dados
-    df = client.get_starlink_data(devices, time_range, max_gap_minutes)
+    # Busca dados; consumo diário e resumos são derivados deste resultado
+    data = client.load_data(devices, time_range, max_gap_minutes)
     
-    if not df.empty:
-        st.success(f"✅ {len(df)} registros carregados do InfluxDB")
-        st.info(f"📊 Dispositivos: {', '.join(df['device'].unique())}")
+    if not data.empty:
+        st.success(f"✅ {len(data.df)} registros carregados do InfluxDB")
+        st.info(f"📊 Dispositivos: {', '.join(data.df['device'].unique())}")
     else:
         st.warning("⚠️ Nenhum dado encontrado para os parâmetros selecionados")
     
-    return df
+    return data
 
-def calculate_usage(df, max_gap_minutes=5):
-    """Calcula uso total de dados."""
-    if df.empty:
-        return 0, 0, 0, 0
-    
-    total_download = 0
-    total_upload = 0
-    gaps = 0
-    
-    for i in range(len(df) - 1):
-        current = df.iloc[i]
-        next_row = df.iloc[i + 1]
-        
-        time_diff = next_row['timestamp'] - current['timestamp']
-        time_diff_minutes = time_diff.total_seconds() / 60
-        
-        if time_diff_minutes > max_gap_minutes:
-            gaps += 1
-            continue
-        
-        time_diff_seconds = time_diff.total_seconds()
-        download_gb = (current['downlink_bps'] * time_diff_seconds) / 8 / (1024 ** 3)
-        upload_gb = (current['uplink_bps'] * time_diff_seconds) / 8 / (1024 ** 3)
-        
-        total_download += download_gb
-        total_upload += upload_gb
-    
-    return total_download, total_upload, gaps, len(df)
+@st.fragment(run_every=POLL_SECONDS)
+def wait_report_job(job_id):
+    """Acompanha o relatório em geração; ao terminar, recarrega a página para oferecer o download"""
+    job = get_report_queue().get(job_id)
+    if job is None or job.done:
+        st.rerun()
+    st.info(f"⏳ Gerando relatório... ({job.elapsed_seconds:.0f} s)")
 
-def calculate_daily_usage(df, max_gap_minutes=5, time_range=None):
-    """Calcula uso de dados diariamente por dispositivo."""
-    if df.empty:
-        return pd.DataFrame()
-    
-    client = initialize_influx_client()
-    if not client:
-        return pd.DataFrame()
-    
-    # Usa método do cliente InfluxDB para cálculo diário
-    devices = df['device'].unique().tolist()
+def show_report_job():
+    """Status do relatório pedido nesta sessão: em geração, pronto para baixar ou com erro"""
+    job_id = st.session_state.get('report_job')
+    if not job_id:
+        return
     
-    # Se não foi fornecido time_range, usa período padrão
-    if not time_range:
-        time_range = "-30d"
+    job = get_report_queue().get(job_id)
+    if job is None:
+        # Descartado da fila (muitos relatórios depois deste)
+        del st.session_state['report_job']
+        return
     
-    daily_df = client.get_daily_consumption(devices, time_range, max_gap_minutes)
-    return daily_df
+    if not job.done:
+        wait_report_job(job_id)
+    elif job.status == FAILED:
+        st.error(f"❌ Erro ao gerar relatório: {job.error}")
+    else:
+        pdf_bytes = job.read()
+        if pdf_bytes is None:
+            del st.session_state['report_job']
+            return
+        
+        st.success("✅ Relatório gerado!")
+        st.download_button(
+            label="📥 Baixar Relatório PDF",
+            data=pdf_bytes,
+            file_name=f"starlink_daily_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
+            mime="application/pdf"
+        )
 
 # Interface
 st.sidebar.header("📡 Conexão InfluxDB")
@@ -180,6 +177,9 @@ available_devices = get_available_devices(30, time_range)
 
 if not available_devices:
     st.sidebar.warning("⚠️ Nenhum dispositivo encontrado no período selecionado")
+    # Diagnóstico do bucket só sob demanda
+    if st.sidebar.button("🔍 Executar diagnóstico"):
+        initialize_influx_client().run_device_diagnostic(30)
     st.stop()
 
 # Seleção múltipla de dispositivos (dinâmica)
@@ -200,6 +200,17 @@ if available_devices:
     # Mostra informações sobre dispositivos encontrados
     if len(available_devices) > 0:
         st.sidebar.success(f"✅ {len(available_devices)} dispositivo(s) detectado(s)")
+    
+    # Primeiro/último registro e IP (consulta extra, só quando pedido)
+    if st.sidebar.checkbox("Mostrar detalhes dos dispositivos"):
+        device_index = get_device_index(30, time_range)
+        for device in selected_devices or available_devices:
+            info = device_index.get(device)
+            if info:
+                st.sidebar.caption(
+                    f"**{device_options[device]}** · IP {info['ip'] or '-'} · "
+                    f"{info['first_seen'].strftime('%d/%m/%Y %H:%M')} a {info['last_seen'].strftime('%d/%m/%Y %H:%M')}"
+                )
 else:
     selected_devices = []
     st.sidebar.warning("⚠️ Nenhum dispositivo encontrado")
@@ -210,14 +221,15 @@ max_gap = st.sidebar.slider("Gap máximo (min):", 1, 60, 5)
 
 # Carrega dados
 if selected_devices:
-    df = load_influx_data(selected_devices, time_range, max_gap)
+    data = load_influx_data(selected_devices, time_range, max_gap)
+    df = data.mbps
     
     if not df.empty:
         # Mostra informações sobre dispositivos encontrados
         st.success(f"✅ {len(available_devices)} dispositivo(s) encontrado(s)")
         
         # Consumo diário
-        daily_df = calculate_daily_usage(df, max_gap, time_range)
+        daily_df = data.daily
         
         if not daily_df.empty:
             # Gráfico de consumo diário
@@ -352,42 +364,33 @@ if selected_devices:
                 avg_daily = daily_df.groupby('date')['total_gb'].sum().mean()
                 st.metric("Média Diária", f"{avg_daily:.3f} GB")
             
-            # Botão para gerar relatório PDF
+            # Botão para gerar relatório PDF (gerado em segundo plano; a página acompanha o status)
             if st.button("📄 Gerar Relatório PDF"):
-                with st.spinner("Gerando relatório..."):
-                    try:
-                        # Informações dos dispositivos
-                        device_names = [get_device_display_name(d) for d in daily_df['device'].unique()]
-                        file_info = {
-                            'filename': f"Dispositivos: {', '.join(device_names)}",
-                            'period': f"{df['timestamp'].min().strftime('%d/%m/%Y')} - {df['timestamp'].max().strftime('%d/%m/%Y')}",
-                            'total_records': len(df)
-                        }
-                        
-                        # Informações de uso total
-                        total_usage_info = {
-                            'download_gb': total_download,
-                            'upload_gb': total_upload,
-                            'total_gb': total_consumption,
-                            'gaps': 0  # Não calculamos gaps no daily viewer
-                        }
-                        
-                        pdf_path = generate_pdf_report(df, daily_df, file_info, total_usage_info)
-                        if pdf_path:
-                            st.success(f"✅ Relatório gerado: {pdf_path}")
-                            
-                            # Botão para download
-                            with open(pdf_path, "rb") as pdf_file:
-                                st.download_button(
-                                    label="📥 Baixar Relatório PDF",
-                                    data=pdf_file.read(),
-                                    file_name=f"starlink_daily_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
-                                    mime="application/pdf"
-                                )
-                        else:
-                            st.error("❌ Erro ao gerar relatório")
-                    except Exception as e:
-                        st.error(f"❌ Erro ao gerar relatório: {str(e)}")
+                try:
+                    # Informações dos dispositivos
+                    device_names = [get_device_display_name(d) for d in daily_df['device'].unique()]
+                    file_info = {
+                        'filename': f"Dispositivos: {', '.join(device_names)}",
+                        'period': f"{df['timestamp'].min().strftime('%d/%m/%Y')} - {df['timestamp'].max().strftime('%d/%m/%Y')}",
+                        'total_records': len(df)
+                    }
+                    
+                    # Informações de uso total
+                    total_usage_info = {
+                        'download_gb': total_download,
+                        'upload_gb': total_upload,
+                        'total_gb': total_consumption,
+                        'gaps': 0  # Não calculamos gaps no daily viewer
+                    }
+                    
+                    # Enfileira o PDF (o mesmo pedido reaproveita o relatório já gerado)
+                    job = get_report_queue().submit(df, daily_df, file_info, total_usage_info,
+                                                    chart_df=data.chart(REPORT_CONFIG["throughput_chart_width"]))
+                    st.session_state['report_job'] = job.id
+                except Exception as e:
+                    st.error(f"❌ Erro ao gerar relatório: {str(e)}")
+            
+            show_report_job()
         else:
             st.warning("Não foi possível calcular o consumo diário")
     else:
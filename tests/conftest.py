@@ -0,0 +1,13 @@
+"""
+Configuração dos testes
+
+Os módulos de src são importados como no aplicativo, pelos diretórios de
+cada pacote no sys.path.
+"""
+
+import os
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(__file__), '..', 'src')
+for package in ('config', 'analysis', 'database', 'reports'):
+    sys.path.append(os.path.join(SRC_DIR, package))
@@ -0,0 +1,158 @@
+"""Integração vetorizada do consumo comparada aos laços originais (iloc)"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from consumption import integrate_usage, integrate_daily_usage, segment_gaps, add_segments, append_segments
+
+def loop_usage(df, max_gap_minutes=5):
+    """calculate_usage original: percorre os registros de um dispositivo"""
+    total_download = 0
+    total_upload = 0
+    gaps = 0
+
+    for i in range(len(df) - 1):
+        current = df.iloc[i]
+        next_row = df.iloc[i + 1]
+
+        time_diff = next_row['timestamp'] - current['timestamp']
+        if time_diff.total_seconds() / 60 > max_gap_minutes:
+            gaps += 1
+            continue
+
+        time_diff_seconds = time_diff.total_seconds()
+        total_download += (current['downlink_bps'] * time_diff_seconds) / 8 / (1024 ** 3)
+        total_upload += (current['uplink_bps'] * time_diff_seconds) / 8 / (1024 ** 3)
+
+    return total_download, total_upload, gaps
+
+def loop_daily_usage(df, max_gap_minutes=5):
+    """get_daily_consumption original: laço por dispositivo, dia e registro"""
+    df = df.copy()
+    df['date'] = df['timestamp'].dt.date
+    rows = []
+
+    for device in df['device'].unique():
+        device_df = df[df['device'] == device]
+        for day in device_df['date'].unique():
+            day_df = device_df[device_df['date'] == day].sort_values('timestamp')
+            if len(day_df) < 2:
+                continue
+
+            download, upload, gaps = loop_usage(day_df, max_gap_minutes)
+            rows.append({
+                'date': day,
+                'device': device,
+                'download_gb': round(download, 3),
+                'upload_gb': round(upload, 3),
+                'total_gb': round(download + upload, 3),
+                'gaps': gaps,
+                'valid_intervals': len(day_df) - 1 - gaps,
+                'records': len(day_df)
+            })
+
+    return pd.DataFrame(rows).sort_values(['date', 'device']).reset_index(drop=True)
+
+def make_throughput(devices=('d1', 'd2', 'd3'), rows_per_device=400, seed=7):
+    """Registros de vários dispositivos intercalados, com intervalos irregulares e gaps"""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2026-10-10 20:00', tz='UTC')
+    frames = []
+    for device in devices:
+        seconds = rng.choice([15, 30, 60, 90], size=rows_per_device)
+        # Alguns intervalos longos (antena desligada)
+        seconds[rng.choice(rows_per_device, size=6, replace=False)] = 3600
+        frames.append(pd.DataFrame({
+            'timestamp': start + pd.to_timedelta(np.cumsum(seconds), unit='s'),
+            'device': device,
+            'downlink_bps': rng.uniform(0, 200e6, rows_per_device),
+            'uplink_bps': rng.uniform(0, 20e6, rows_per_device)
+        }))
+    return pd.concat(frames).sort_values('timestamp', kind='mergesort').reset_index(drop=True)
+
+def test_usage_matches_loop_per_device():
+    df = make_throughput()
+    expected = [loop_usage(df[df['device'] == device]) for device in df['device'].unique()]
+
+    download, upload, gaps, records = integrate_usage(df)
+
+    assert download == pytest.approx(sum(e[0] for e in expected), rel=1e-9)
+    assert upload == pytest.approx(sum(e[1] for e in expected), rel=1e-9)
+    assert gaps == sum(e[2] for e in expected)
+    assert records == len(df)
+
+def test_usage_single_device_matches_loop():
+    df = make_throughput(devices=('d1',))
+    download, upload, gaps, _ = integrate_usage(df)
+    assert (download, upload, gaps) == pytest.approx(loop_usage(df), rel=1e-9)
+
+def test_usage_ignores_row_order():
+    df = make_throughput()
+    shuffled = df.sample(frac=1, random_state=1)
+    assert integrate_usage(shuffled) == pytest.approx(integrate_usage(df), rel=1e-9)
+
+def test_usage_with_segments_matches_max_gap():
+    df = make_throughput()
+    segmented = add_segments(df.copy(), max_gap_minutes=5)
+    assert integrate_usage(segmented, max_gap_minutes=5) == pytest.approx(integrate_usage(df, 5), rel=1e-9)
+
+def test_daily_usage_matches_loop():
+    # Começa às 20h: os dados atravessam a meia-noite
+    df = make_throughput()
+    expected = loop_daily_usage(df)
+
+    daily = integrate_daily_usage(df)
+
+    assert list(daily['date']) == list(expected['date'])
+    assert list(daily['device']) == list(expected['device'])
+    for column in ('gaps', 'valid_intervals', 'records'):
+        assert list(daily[column]) == list(expected[column])
+    for column in ('download_gb', 'upload_gb', 'total_gb'):
+        np.testing.assert_allclose(daily[column], expected[column], atol=1e-3)
+
+def test_daily_usage_skips_days_with_one_record():
+    df = pd.DataFrame({
+        'timestamp': pd.to_datetime(['2026-10-10 23:59', '2026-10-11 00:01', '2026-10-11 00:02'], utc=True),
+        'device': 'd1',
+        'downlink_bps': 8.0 * 1024 ** 3,
+        'uplink_bps': 0.0
+    })
+
+    daily = integrate_daily_usage(df)
+
+    assert list(daily['date'].astype(str)) == ['2026-10-11']
+    assert daily['download_gb'].iloc[0] == pytest.approx(60.0)
+    assert daily['records'].iloc[0] == 2
+
+def test_empty_frames():
+    empty = pd.DataFrame(columns=['timestamp', 'device', 'downlink_bps', 'uplink_bps'])
+    assert integrate_usage(empty) == (0, 0, 0, 0)
+    assert integrate_daily_usage(empty).empty
+
+def test_segments_are_per_device():
+    # d2 fica 20 min sem dados enquanto d1 continua: só d2 ganha um segmento novo
+    times = pd.to_datetime(['2026-10-10 00:00', '2026-10-10 00:01', '2026-10-10 00:02',
+                            '2026-10-10 00:04', '2026-10-10 00:21'], utc=True)
+    df = pd.DataFrame({'timestamp': times, 'device': ['d1', 'd2', 'd1', 'd1', 'd2']})
+
+    segments = segment_gaps(df, max_gap_minutes=5)
+
+    assert segments[0] == segments[2] == segments[3]
+    assert segments[1] != segments[4]
+    assert len(set(segments)) == 3
+
+def test_append_segments_matches_full_segmentation():
+    df = make_throughput()
+    split = len(df) * 2 // 3
+    head = add_segments(df.iloc[:split].copy())
+    tail = df.iloc[split:]
+    last_rows = head.groupby('device', observed=True).tail(1)
+
+    appended = append_segments(last_rows, tail, 5, next_segment=head['segment'].max() + 1)
+
+    # Mesma partição em trechos que a segmentação completa (números podem diferir)
+    full = segment_gaps(df)
+    combined = np.concatenate([head['segment'].to_numpy(), appended])
+    pairs = set(zip(full, combined))
+    assert len(pairs) == len(set(full)) == len(set(combined))
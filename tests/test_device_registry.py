@@ -0,0 +1,77 @@
+"""Registro de dispositivos compartilhado entre sessões"""
+
+import json
+import threading
+
+import pytest
+
+from device_registry import DeviceRegistry, default_display_name, load_name_overrides
+
+def test_display_name_uses_override_or_id():
+    registry = DeviceRegistry({'bit1015star': 'Fazenda Norte'})
+
+    assert registry.display_name('bit1015star') == 'Fazenda Norte'
+    assert registry.display_name('bit2020star') == 'Bit Star 2020'
+    assert default_display_name('bit2020star') == 'Bit Star 2020'
+
+def test_update_replaces_snapshot():
+    registry = DeviceRegistry({'bit1star': 'Sede'})
+    registry.update(['bit1star', 'bit2star'])
+    before = registry.snapshot()
+
+    registry.update(['bit3star'])
+
+    # O snapshot antigo não muda: quem estava lendo continua com a lista anterior
+    assert list(before) == ['bit1star', 'bit2star']
+    assert before['bit1star']['name'] == 'Sede'
+    assert registry.devices() == ('bit3star',)
+    assert registry.snapshot()['bit3star']['tags']['device'] == 'bit3star'
+
+def test_snapshot_is_read_only():
+    registry = DeviceRegistry()
+    registry.update(['bit1star'])
+
+    with pytest.raises(TypeError):
+        registry.snapshot()['bit2star'] = {}
+    with pytest.raises(TypeError):
+        registry.snapshot()['bit1star']['name'] = 'Outro'
+
+def test_concurrent_updates_and_reads():
+    registry = DeviceRegistry()
+    lists = [[f'bit{i}{j}star' for j in range(20)] for i in range(8)]
+    errors = []
+
+    def worker(devices):
+        try:
+            for _ in range(200):
+                registry.update(devices)
+                snapshot = registry.snapshot()
+                # Cada snapshot é uma lista completa de uma única atualização
+                assert list(snapshot) in lists
+                for device_id in snapshot:
+                    assert registry.display_name(device_id) == default_display_name(device_id)
+        except AssertionError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(devices,)) for devices in lists]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert list(registry.devices()) in lists
+
+def test_load_name_overrides(tmp_path):
+    path = tmp_path / 'nomes.json'
+    path.write_text(json.dumps({'bit1star': 'Sede', 2: 'Depósito'}), encoding='utf-8')
+    assert load_name_overrides(str(path)) == {'bit1star': 'Sede', '2': 'Depósito'}
+
+    path.write_text('["bit1star"]', encoding='utf-8')
+    assert load_name_overrides(str(path)) == {}
+
+    path.write_text('{inválido', encoding='utf-8')
+    assert load_name_overrides(str(path)) == {}
+
+    assert load_name_overrides(str(tmp_path / 'ausente.json')) == {}
+    assert load_name_overrides(None) == {}
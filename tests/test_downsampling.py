@@ -0,0 +1,95 @@
+"""Redução de pontos (LTTB e agregação por janela) para os gráficos"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from downsampling import aggregate_windows, lttb, lttb_indices
+
+def reference_lttb(x, y, n_out):
+    """LTTB na forma original (um bucket por vez, em Python puro)"""
+    n = len(x)
+    every = (n - 2) / (n_out - 2)
+    selected = [0]
+    a = 0
+    for i in range(n_out - 2):
+        next_start = int((i + 1) * every) + 1
+        next_stop = min(int((i + 2) * every) + 1, n)
+        avg_x = sum(x[next_start:next_stop]) / (next_stop - next_start)
+        avg_y = sum(y[next_start:next_stop]) / (next_stop - next_start)
+
+        best, best_area = None, -1.0
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return selected
+
+@pytest.mark.parametrize('n, n_out', [(1000, 100), (1001, 37), (50, 3), (10_000, 1500)])
+def test_lttb_matches_reference(n, n_out):
+    rng = np.random.default_rng(n)
+    x = np.cumsum(rng.uniform(0.5, 1.5, n))
+    y = rng.normal(0, 1, n).cumsum()
+
+    assert list(lttb_indices(x, y, n_out)) == reference_lttb(list(x), list(y), n_out)
+
+def test_lttb_keeps_endpoints_and_order():
+    x = np.arange(5000, dtype=float)
+    y = np.sin(x / 50)
+
+    indices = lttb_indices(x, y, 200)
+
+    assert len(indices) == 200
+    assert indices[0] == 0 and indices[-1] == 4999
+    assert (np.diff(indices) > 0).all()
+
+def test_lttb_preserves_spike():
+    x = np.arange(10_000, dtype=float)
+    y = np.zeros(10_000)
+    y[6543] = 500.0
+
+    assert 6543 in lttb_indices(x, y, 100)
+
+def test_lttb_small_series_is_unchanged():
+    x = np.arange(10)
+    assert list(lttb_indices(x, x, 10)) == list(range(10))
+    assert list(lttb_indices(x, x, 2)) == list(range(10))
+
+def test_lttb_datetime_series_keeps_type():
+    times = pd.Series(pd.date_range('2026-10-10', periods=3000, freq='1s', tz='UTC'))
+    values = pd.Series(np.random.default_rng(1).uniform(0, 100, 3000))
+
+    x, y = lttb(times, values, n_out=300)
+
+    assert isinstance(x, pd.Series) and len(x) == len(y) == 300
+    assert x.is_monotonic_increasing
+
+def test_lttb_breaks_line_between_segments():
+    x = np.arange(6)
+    y = np.ones(6)
+    segments = np.array([0, 0, 0, 1, 1, 2])
+
+    x_out, y_out = lttb(x, y, n_out=100, segments=segments)
+
+    assert list(x_out) == [0, 1, 2, 3, 3, 4, 5, 5]
+    assert np.isnan(y_out[[3, 6]]).all()
+    assert not np.isnan(np.delete(y_out, [3, 6])).any()
+
+def test_aggregate_windows_per_device():
+    times = pd.date_range('2026-10-10', periods=120, freq='30s', tz='UTC')
+    df = pd.DataFrame({
+        'timestamp': times.repeat(2),
+        'device': ['d1', 'd2'] * 120,
+        'downlink_bps': np.tile([1e6, 3e6], 120),
+        'uplink_bps': 1e5
+    })
+
+    chart = aggregate_windows(df, 600, 'mean')
+
+    assert len(chart) == 2 * 6
+    assert chart['timestamp'].is_monotonic_increasing
+    means = chart.groupby('device')['downlink_mbps'].unique()
+    assert list(means['d1']) == [1.0] and list(means['d2']) == [3.0]
@@ -0,0 +1,74 @@
+"""Leitura em streaming do CSV do InfluxDB para o esquema compacto"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from flux_stream import (THROUGHPUT_COLUMNS, THROUGHPUT_DTYPE, concat_throughput, read_extracted_throughput,
+                         read_json_throughput, with_mbps)
+
+HEADER = ['', 'result', 'table', '_time', 'device', 'downlink_bps', 'uplink_bps']
+
+def extracted_rows():
+    return [
+        HEADER,
+        ['', '_result', '0', '2026-10-10T00:00:00Z', 'd1', '1000000', '50000'],
+        ['', '_result', '0', '2026-10-10T00:00:01.5Z', 'd1', '', '60000'],
+        # Sem nenhum dos campos: descartado
+        ['', '_result', '0', '2026-10-10T00:00:02Z', 'd1', '', ''],
+        [],
+        HEADER,
+        ['', '_result', '1', '2026-10-10T00:00:00.25Z', 'd2', '2000000', '70000'],
+    ]
+
+def assert_compact(df):
+    assert list(df.columns) == THROUGHPUT_COLUMNS
+    assert str(df['timestamp'].dtype) == 'datetime64[ns, UTC]'
+    assert isinstance(df['device'].dtype, pd.CategoricalDtype)
+    assert df['downlink_bps'].dtype == THROUGHPUT_DTYPE
+    assert df['uplink_bps'].dtype == THROUGHPUT_DTYPE
+
+def test_extracted_rows_are_read_in_batches():
+    df = read_extracted_throughput(iter(extracted_rows()), batch_rows=2)
+
+    assert_compact(df)
+    assert list(df['device']) == ['d1', 'd1', 'd2']
+    assert list(df['downlink_bps']) == [1e6, 0.0, 2e6]
+    assert df['timestamp'].iloc[1] == pd.Timestamp('2026-10-10 00:00:01.5', tz='UTC')
+
+def test_json_rows_use_the_decoder():
+    header = ['', 'result', 'table', '_time', '_field', '_value', 'device']
+    status = json.dumps({'downlinkThroughputBps': 3e6, 'uplinkThroughputBps': 1e5})
+    rows = [
+        header,
+        ['', '_result', '0', '2026-10-10T00:00:00Z', 'status_json', status, 'd1'],
+        ['', '_result', '0', '2026-10-10T00:00:01Z', 'outro', status, 'd1'],
+    ]
+
+    df = read_json_throughput(iter(rows), json.loads, batch_rows=10)
+
+    assert_compact(df)
+    assert len(df) == 1 and df['downlink_bps'].iloc[0] == 3e6
+
+def test_empty_result_keeps_schema():
+    # Sem linhas, a página ainda encontra as colunas (chart_df['device'], Mbps)
+    df = read_extracted_throughput(iter([HEADER]), batch_rows=10)
+    assert_compact(df)
+    assert df.empty
+
+    chart_df = with_mbps(df)
+    assert {'downlink_mbps', 'uplink_mbps'} <= set(chart_df.columns)
+    assert list(chart_df['device'].unique()) == []
+
+    assert_compact(concat_throughput([df, df]))
+
+def test_concat_unifies_device_categories():
+    first = read_extracted_throughput(iter(extracted_rows()[:3]), batch_rows=10)
+    second = read_extracted_throughput(iter(extracted_rows()[4:]), batch_rows=10)
+
+    df = concat_throughput([first, second])
+
+    assert_compact(df)
+    assert sorted(df['device'].cat.categories) == ['d1', 'd2']
+    np.testing.assert_array_equal(with_mbps(df)['downlink_mbps'], [1.0, 0.0, 2.0])
@@ -0,0 +1,134 @@
+"""Cache Parquet por dispositivo e dia: leitura do disco, faltas e dias provisórios"""
+
+import os
+
+import pandas as pd
+import pytest
+
+from flux_stream import compact_throughput, empty_throughput
+from influx_config import parse_time_range
+from parquet_store import ParquetThroughputStore
+
+pytest.importorskip('pyarrow')
+
+class FakeInflux:
+    """fetch(devices, time_range) com um registro a cada 10 min por dispositivo ('idle' não tem dados)"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, devices, time_range):
+        self.calls.append((tuple(devices), time_range))
+        start, stop, _ = parse_time_range(time_range)
+        times = pd.date_range(pd.Timestamp(start), pd.Timestamp(stop), freq='10min', inclusive='left')
+        frames = [pd.DataFrame({'timestamp': times, 'device': device, 'downlink_bps': 1e6, 'uplink_bps': 1e5})
+                  for device in devices if device != 'idle']
+        return compact_throughput(pd.concat(frames)) if frames else empty_throughput()
+
+def closed_range(first_days_ago=6, last_days_ago=3):
+    """Período de dias inteiros bem antes de hoje (já definitivos)"""
+    today = pd.Timestamp.now(tz='UTC').normalize()
+    start = today - pd.Timedelta(days=first_days_ago)
+    stop = today - pd.Timedelta(days=last_days_ago)
+    return f"{start:%Y-%m-%dT%H:%M:%SZ}:{stop:%Y-%m-%dT%H:%M:%SZ}", start
+
+def stored_files(store):
+    return sorted(os.path.relpath(os.path.join(root, name), store.base_dir)
+                  for root, _, names in os.walk(store.base_dir) for name in names)
+
+@pytest.fixture
+def store(tmp_path):
+    return ParquetThroughputStore(str(tmp_path), max_size_mb=100, settle_hours=24, provisional_ttl_minutes=60)
+
+def test_closed_days_are_served_from_disk(store):
+    fetch = FakeInflux()
+    time_range, _ = closed_range()
+
+    first = store.read_range(['d1', 'd2', 'idle'], time_range, fetch)
+    assert len(fetch.calls) == 1
+    # Um arquivo por dispositivo e dia (o fim à meia-noite inclui o dia seguinte),
+    # inclusive os marcadores vazios do idle
+    assert len(stored_files(store)) == 3 * 4
+
+    fetch.calls.clear()
+    second = store.read_range(['d1', 'd2', 'idle'], time_range, fetch)
+
+    assert fetch.calls == []
+    pd.testing.assert_frame_equal(first, second)
+    assert len(second) == 2 * (3 * 144 + 1)
+    assert second['timestamp'].is_monotonic_increasing
+
+def test_partition_removed_during_read_is_refetched(store, monkeypatch):
+    fetch = FakeInflux()
+    time_range, start = closed_range()
+    expected = store.read_range(['d1', 'd2'], time_range, fetch)
+
+    removed_day = (start + pd.Timedelta(days=1)).date()
+    read_day = store.read_day
+
+    def racing_read_day(device, day, now=None):
+        # Outra sessão remove o arquivo (evict/purge) entre a listagem e a leitura
+        if device == 'd2' and day == removed_day:
+            os.remove(store.day_path(device, day))
+        return read_day(device, day, now)
+
+    monkeypatch.setattr(store, 'read_day', racing_read_day)
+    fetch.calls.clear()
+    result = store.read_range(['d1', 'd2'], time_range, fetch)
+
+    assert [devices for devices, _ in fetch.calls] == [('d2',)]
+    pd.testing.assert_frame_equal(result, expected)
+
+def test_partition_without_fetch_time_is_refetched(store):
+    fetch = FakeInflux()
+    time_range, start = closed_range()
+    expected = store.read_range(['d1'], time_range, fetch)
+
+    # Arquivo de uma versão anterior, sem o instante da busca
+    day = start.date()
+    pd.read_parquet(store.day_path('d1', day)).to_parquet(store.day_path('d1', day))
+    fetch.calls.clear()
+    result = store.read_range(['d1'], time_range, fetch)
+
+    assert len(fetch.calls) == 1
+    pd.testing.assert_frame_equal(result, expected)
+    assert store.read_day('d1', day) is not None
+
+def test_provisional_partition_expires(store):
+    day = pd.Timestamp('2026-10-10').date()
+    day_end = pd.Timestamp('2026-10-11', tz='UTC')
+    df = FakeInflux()(['d1'], '2026-10-10T00:00:00Z:2026-10-11T00:00:00Z')
+
+    # Buscado 1h após o fim do dia: ainda pode receber envios atrasados
+    store.write_day('d1', day, df, fetched_at=day_end + pd.Timedelta(hours=1))
+    assert store.read_day('d1', day, now=day_end + pd.Timedelta(minutes=90)) is not None
+    assert store.read_day('d1', day, now=day_end + pd.Timedelta(hours=3)) is None
+
+    # Buscado depois do prazo: definitivo
+    store.write_day('d1', day, df, fetched_at=day_end + pd.Timedelta(hours=25))
+    assert store.read_day('d1', day, now=day_end + pd.Timedelta(days=300)) is not None
+
+def test_empty_markers_wait_for_the_settle_time(tmp_path):
+    store = ParquetThroughputStore(str(tmp_path), max_size_mb=100, settle_hours=24 * 365, provisional_ttl_minutes=60)
+    fetch = FakeInflux()
+    time_range, _ = closed_range()
+
+    store.read_range(['d1', 'idle'], time_range, fetch)
+    # Dias provisórios: o idle vazio não vira marcador
+    assert all(path.startswith('device=d1') for path in stored_files(store))
+
+    fetch.calls.clear()
+    store.read_range(['d1', 'idle'], time_range, fetch)
+    assert [devices for devices, _ in fetch.calls] == [('idle',)]
+
+def test_evict_keeps_results_correct(tmp_path):
+    store = ParquetThroughputStore(str(tmp_path), max_size_mb=0, settle_hours=24, provisional_ttl_minutes=60)
+    fetch = FakeInflux()
+    time_range, _ = closed_range()
+
+    first = store.read_range(['d1', 'd2'], time_range, fetch)
+    assert stored_files(store) == []
+
+    second = store.read_range(['d1', 'd2'], time_range, fetch)
+    assert len(fetch.calls) == 2
+    pd.testing.assert_frame_equal(first, second)
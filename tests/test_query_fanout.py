@@ -0,0 +1,89 @@
+"""Divisão das consultas em blocos dispositivo x fatia de tempo"""
+
+import pandas as pd
+import pytest
+
+from flux_stream import compact_throughput
+from influx_client import StarlinkInfluxClient
+from influx_config import FANOUT_CONFIG, parse_time_range
+
+@pytest.fixture
+def client(monkeypatch):
+    # Sem conexão: só o planejamento e a junção dos blocos são testados
+    monkeypatch.setitem(FANOUT_CONFIG, 'slice_hours', 24)
+    monkeypatch.setitem(FANOUT_CONFIG, 'retry_backoff_seconds', 0)
+    client = StarlinkInfluxClient.__new__(StarlinkInfluxClient)
+    client.store = None
+    return client
+
+def slice_bounds(chunks):
+    return [parse_time_range(time_range)[:2] for _, time_range in chunks]
+
+def test_single_device_short_range_is_not_split(client):
+    assert client._plan_chunks(['d1'], '-6h') == [(['d1'], '-6h')]
+
+def test_unparseable_range_is_not_split(client):
+    assert client._plan_chunks(['d1', 'd2'], 'ontem') == [(['d1', 'd2'], 'ontem')]
+
+def test_closed_range_is_split_per_device_and_slice(client):
+    chunks = client._plan_chunks(['d1', 'd2'], '2026-10-01T00:00:00Z:2026-10-03T06:00:00Z')
+
+    assert [devices for devices, _ in chunks] == [['d1']] * 3 + [['d2']] * 3
+    bounds = slice_bounds(chunks[:3])
+    assert bounds[0][0] == pd.Timestamp('2026-10-01', tz='UTC')
+    assert bounds[-1][1] == pd.Timestamp('2026-10-03 06:00', tz='UTC')
+    # Fatias contíguas, a última parcial
+    assert all(previous[1] == following[0] for previous, following in zip(bounds, bounds[1:]))
+    assert bounds[-1][1] - bounds[-1][0] == pd.Timedelta(hours=6)
+    assert slice_bounds(chunks[3:]) == bounds
+
+def test_relative_range_keeps_open_end(client):
+    chunks = client._plan_chunks(['d1'], '-50h')
+
+    assert len(chunks) == 3
+    # Última fatia sem fim: inclui o que chegar até a consulta rodar
+    assert parse_time_range(chunks[-1][1])[1] is None
+    assert all(parse_time_range(time_range)[1] is not None for _, time_range in chunks[:-1])
+
+def test_chunks_are_merged_in_time_order(client, monkeypatch):
+    def query_single(devices, time_range):
+        start, stop, _ = parse_time_range(time_range)
+        times = pd.date_range(pd.Timestamp(start), pd.Timestamp(stop), freq='1h', inclusive='left')
+        return compact_throughput(pd.DataFrame({
+            'timestamp': times, 'device': devices[0], 'downlink_bps': 1e6, 'uplink_bps': 1e5
+        }))
+
+    monkeypatch.setattr(client, '_query_single', query_single)
+    df = client.fetch_throughput(['d1', 'd2'], '2026-10-01T00:00:00Z:2026-10-04T00:00:00Z')
+
+    assert len(df) == 2 * 72
+    assert df['timestamp'].is_monotonic_increasing
+    assert isinstance(df['device'].dtype, pd.CategoricalDtype)
+    assert sorted(df['device'].cat.categories) == ['d1', 'd2']
+
+def test_failed_chunk_is_retried(client, monkeypatch):
+    monkeypatch.setitem(FANOUT_CONFIG, 'retries', 2)
+    attempts = []
+
+    def flaky_query(devices, time_range):
+        attempts.append(time_range)
+        if len(attempts) <= 2:
+            raise ConnectionError('timeout')
+        return compact_throughput(pd.DataFrame())
+
+    monkeypatch.setattr(client, '_query_single', flaky_query)
+    client._query_chunk(['d1'], '-1h')
+    assert len(attempts) == 3
+
+def test_chunk_error_is_raised_after_last_retry(client, monkeypatch):
+    monkeypatch.setitem(FANOUT_CONFIG, 'retries', 1)
+    attempts = []
+
+    def failing_query(devices, time_range):
+        attempts.append(time_range)
+        raise ConnectionError('timeout')
+
+    monkeypatch.setattr(client, '_query_single', failing_query)
+    with pytest.raises(ConnectionError):
+        client._query_chunk(['d1'], '-1h')
+    assert len(attempts) == 2
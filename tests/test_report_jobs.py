@@ -0,0 +1,108 @@
+"""Fila de relatórios em segundo plano: hash das entradas, LRU e novas tentativas"""
+
+import sys
+import threading
+import time
+import types
+
+import pandas as pd
+import pytest
+
+from report_jobs import DONE, FAILED, ReportQueue, report_hash
+
+class FakeGenerator:
+    """generate_pdf_report de mentira: registra as chamadas e pode falhar ou esperar"""
+
+    def __init__(self):
+        self.calls = []
+        self.failures = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, df, daily_df, file_info, total_usage=None, output_path=None, chart_df=None, chart_backend=None):
+        self.calls.append(file_info['name'])
+        self.release.wait(5)
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError('kaleido indisponível')
+        return f"%PDF {file_info['name']}".encode()
+
+@pytest.fixture
+def generator(monkeypatch):
+    generator = FakeGenerator()
+    # _run importa pdf_generator só na primeira geração
+    monkeypatch.setitem(sys.modules, 'pdf_generator',
+                        types.SimpleNamespace(generate_pdf_report=generator))
+    return generator
+
+@pytest.fixture
+def queue():
+    queue = ReportQueue(workers=2, max_reports=2)
+    yield queue
+    queue.close()
+
+def wait(job, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not job.done:
+        assert time.monotonic() < deadline, f"job {job.id[:12]} não terminou"
+        time.sleep(0.01)
+    return job
+
+def make_inputs(name, value=1.0):
+    df = pd.DataFrame({'timestamp': pd.date_range('2026-10-10', periods=3, freq='1min', tz='UTC'),
+                       'device': 'd1', 'downlink_bps': value, 'uplink_bps': 0.0})
+    daily_df = pd.DataFrame({'date': ['2026-10-10'], 'device': ['d1'], 'total_gb': [value]})
+    return df, daily_df, {'name': name}
+
+def test_report_hash_depends_on_content():
+    df, daily_df, info = make_inputs('a')
+
+    assert report_hash(df, daily_df, info) == report_hash(df.copy(), daily_df.copy(), dict(info))
+    assert report_hash(df, daily_df, info) != report_hash(*make_inputs('a', value=2.0))
+    assert report_hash(df, daily_df, info) != report_hash(df, daily_df, {'name': 'b'})
+    assert report_hash(df, daily_df, info) != report_hash(df.rename(columns={'device': 'antena'}), daily_df, info)
+    assert report_hash(df, daily_df, info) != report_hash(df, daily_df, info, chart_df=df)
+    assert report_hash(df, daily_df, info) != report_hash(df, daily_df, info, chart_backend='kaleido')
+
+def test_same_request_reuses_job(queue, generator):
+    job = wait(queue.submit(*make_inputs('a')))
+
+    assert job.status == DONE and job.read() == b'%PDF a'
+    assert queue.submit(*make_inputs('a')) is job
+    assert queue.get(job.id) is job
+    assert generator.calls == ['a']
+
+def test_least_recently_used_report_is_dropped(queue, generator):
+    job_a = wait(queue.submit(*make_inputs('a')))
+    job_b = wait(queue.submit(*make_inputs('b')))
+    queue.get(job_a.id)
+
+    job_c = wait(queue.submit(*make_inputs('c')))
+
+    assert queue.get(job_b.id) is None and job_b.read() is None
+    assert queue.get(job_a.id) is job_a and job_a.read() == b'%PDF a'
+    assert queue.get(job_c.id) is job_c
+
+def test_running_jobs_are_not_dropped(queue, generator):
+    generator.release.clear()
+    jobs = [queue.submit(*make_inputs(name)) for name in 'abc']
+
+    # Nenhum terminou: a fila passa do limite em vez de descartar jobs em andamento
+    assert all(queue.get(job.id) is job for job in jobs)
+
+    generator.release.set()
+    for job in jobs:
+        assert wait(job).status == DONE
+
+def test_failed_job_is_retried(queue, generator):
+    generator.failures = 1
+    failed = wait(queue.submit(*make_inputs('a')))
+    assert failed.status == FAILED and failed.read() is None
+    assert 'kaleido' in failed.error
+
+    retried = wait(queue.submit(*make_inputs('a')))
+
+    assert retried is not failed and retried.id == failed.id
+    assert retried.status == DONE and retried.read() == b'%PDF a'
+    assert queue.get(failed.id) is retried
+    assert generator.calls == ['a', 'a']
@@ -0,0 +1,179 @@
+"""Atualização incremental da TailWindow comparada ao recálculo completo"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_cache
+from consumption import integrate_usage, integrate_daily_usage, segment_gaps
+from flux_stream import compact_throughput
+from influx_config import parse_time_range
+
+class Clock:
+    def __init__(self):
+        self.now = pd.Timestamp('2026-10-10 23:30', tz='UTC').to_pydatetime()
+
+    def advance(self, **kwargs):
+        self.now += pd.Timedelta(**kwargs)
+
+class FakeClient:
+    """Cliente com os registros já "gravados" no InfluxDB; registra as consultas"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.rows = []
+        self.queries = []
+
+    def ingest(self, device, start, stop, seconds=10, offset_ms=0):
+        times = pd.date_range(start, stop, freq=f'{seconds}s', inclusive='left') + pd.Timedelta(milliseconds=offset_ms)
+        self.rows.append(pd.DataFrame({
+            'timestamp': times,
+            'device': device,
+            'downlink_bps': (np.arange(len(times)) % 17 + 1) * 1e6,
+            'uplink_bps': 1e5
+        }))
+
+    def fetch_throughput(self, devices, time_range):
+        start, stop, _ = parse_time_range(time_range, self.clock.now)
+        self.queries.append((tuple(devices), pd.Timestamp(start)))
+        stop = pd.Timestamp(stop or self.clock.now)
+
+        df = pd.concat(self.rows, ignore_index=True) if self.rows else pd.DataFrame(columns=['timestamp', 'device'])
+        df = df[df['device'].isin(devices) & (df['timestamp'] >= start) & (df['timestamp'] < stop)]
+        return compact_throughput(df.sort_values('timestamp', kind='mergesort').reset_index(drop=True))
+
+    def get_daily_consumption_from_df(self, df, max_gap_minutes=5, time_range=None):
+        return integrate_daily_usage(df, max_gap_minutes)
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(data_cache, 'parse_time_range',
+                        lambda time_range, now=None: parse_time_range(time_range, now or clock.now))
+    return clock
+
+@pytest.fixture
+def client(clock):
+    return FakeClient(clock)
+
+def make_window(client, devices=('d1', 'd2'), time_range='-1h'):
+    window = data_cache.TailWindow(client, devices, time_range, 5)
+    window.rebuilds = 0
+    rebuild = window._rebuild
+
+    def counting_rebuild(raw):
+        window.rebuilds += 1
+        rebuild(raw)
+
+    window._rebuild = counting_rebuild
+    return window
+
+def assert_matches_full_recompute(data):
+    df = data.df
+    assert df['timestamp'].is_monotonic_increasing
+
+    expected_usage = integrate_usage(df.drop(columns='segment'), 5)
+    assert data.usage[:2] == pytest.approx(expected_usage[:2], rel=1e-9)
+    assert data.usage[2:] == expected_usage[2:]
+
+    expected_daily = integrate_daily_usage(df.drop(columns='segment'), 5)
+    pd.testing.assert_frame_equal(data.daily.reset_index(drop=True), expected_daily, check_dtype=False)
+
+    # Mesma partição em trechos que a segmentação completa
+    pairs = set(zip(segment_gaps(df, 5), df['segment']))
+    assert len(pairs) == df['segment'].nunique()
+
+def test_each_device_is_fetched_from_its_own_last_seen(clock, client):
+    start = pd.Timestamp(clock.now) - pd.Timedelta(minutes=50)
+    client.ingest('d1', start, clock.now)
+    client.ingest('d2', start, pd.Timestamp(clock.now) - pd.Timedelta(minutes=20))
+    window = make_window(client, devices=('d1', 'd2', 'idle'))
+    window.refresh()
+
+    last_seen = dict(window.last_seen)
+    assert last_seen['d1'] > last_seen['d2']
+
+    client.queries.clear()
+    clock.advance(minutes=1)
+    window.refresh()
+
+    fetched_from = {device: query_start for devices, query_start in client.queries for device in devices}
+    assert fetched_from['d1'] == last_seen['d1']
+    assert fetched_from['d2'] == last_seen['d2']
+    # Dispositivo sem dados busca desde o início da janela, sozinho
+    assert ('idle',) in [devices for devices, _ in client.queries]
+    assert fetched_from['idle'] == pd.Timestamp(clock.now) - pd.Timedelta(hours=1)
+
+def test_interleaved_tail_is_merged_without_rebuild(clock, client):
+    start = pd.Timestamp(clock.now) - pd.Timedelta(minutes=40)
+    client.ingest('d1', start, clock.now)
+    client.ingest('d2', start, clock.now, offset_ms=300)
+    window = make_window(client)
+    window.refresh()
+
+    for _ in range(3):
+        previous = pd.Timestamp(clock.now)
+        clock.advance(minutes=2)
+        client.ingest('d1', previous, clock.now)
+        client.ingest('d2', previous, clock.now, offset_ms=300)
+        data = window.refresh()
+        assert_matches_full_recompute(data)
+
+    assert window.rebuilds == 1
+    assert len(data.df) == 2 * 46 * 6
+
+def test_tail_crossing_midnight_updates_both_days(clock, client):
+    start = pd.Timestamp(clock.now) - pd.Timedelta(minutes=30)
+    client.ingest('d1', start, clock.now)
+    window = make_window(client)
+    window.refresh()
+
+    previous = pd.Timestamp(clock.now)
+    clock.advance(hours=1)
+    client.ingest('d1', previous, clock.now)
+    data = window.refresh()
+
+    assert sorted(data.daily['date'].astype(str)) == ['2026-10-10', '2026-10-11']
+    assert_matches_full_recompute(data)
+    assert window.rebuilds == 1
+
+def test_rows_before_cached_window_trigger_rebuild(clock, client):
+    start = pd.Timestamp(clock.now) - pd.Timedelta(minutes=30)
+    client.ingest('d1', start, clock.now)
+    window = make_window(client)
+    window.refresh()
+
+    # d2 aparece com registros anteriores ao primeiro em cache (envio atrasado)
+    client.ingest('d2', start - pd.Timedelta(minutes=10), clock.now)
+    clock.advance(seconds=30)
+    data = window.refresh()
+
+    assert window.rebuilds == 2
+    assert data.df['timestamp'].iloc[0] == start - pd.Timedelta(minutes=10)
+    assert_matches_full_recompute(data)
+
+def test_expired_rows_leave_the_window(clock, client):
+    start = pd.Timestamp(clock.now) - pd.Timedelta(minutes=55)
+    client.ingest('d1', start, clock.now)
+    client.ingest('d2', start, clock.now, offset_ms=300)
+    window = make_window(client)
+    window.refresh()
+
+    previous = pd.Timestamp(clock.now)
+    clock.advance(minutes=15)
+    client.ingest('d1', previous, clock.now)
+    data = window.refresh()
+
+    window_start = pd.Timestamp(clock.now) - pd.Timedelta(hours=1)
+    assert data.df['timestamp'].iloc[0] >= window_start
+    assert_matches_full_recompute(data)
+    assert window.rebuilds == 1
+
+def test_empty_tail_keeps_result(clock, client):
+    client.ingest('d1', pd.Timestamp(clock.now) - pd.Timedelta(minutes=10), clock.now)
+    window = make_window(client)
+    data = window.refresh()
+
+    clock.advance(seconds=5)
+    assert window.refresh() is data
+    assert window.rebuilds == 1